@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard'
+
+    def ready(self):
+        from globaltit_site import timing
+        from main import invalidation
+        from . import slow_queries
+
+        invalidation.connect_app_signals(self)
+        timing.add_slow_query_listener(slow_queries.capture)
@@ -0,0 +1,190 @@
+"""
+Téléchargement protégé des CV des candidatures.
+
+Les CV ne sont plus liés par leur adresse de média : le dashboard et
+l'admin passent par la vue download_cv, qui exige soit la session d'un
+utilisateur connecté, soit une adresse signée (paramètre ?t=) valable
+CV_URL_MAX_AGE secondes. L'adresse signée est liée à l'utilisateur qui l'a
+obtenue et à la candidature ; elle sert aux lecteurs PDF et gestionnaires de
+téléchargement qui rejouent la requête (requêtes Range) sans les cookies.
+
+Les adresses signées sont mises en cache pour la moitié de leur durée de
+validité : la liste des candidatures les obtient en un get_many au lieu de
+signer à chaque ligne, et une adresse servie reste valable au moins
+CV_URL_MAX_AGE / 2 secondes.
+
+La réponse gère ETag / Last-Modified (304), les plages d'octets simples
+(206, 416) et If-Range. Si un proxy frontal sait servir les fichiers
+lui-même (CV_DOWNLOAD_OFFLOAD, ou en-tête X-Sendfile-Type envoyé par le
+proxy), la vue ne renvoie que l'en-tête X-Accel-Redirect (nginx) ou
+X-Sendfile (Apache, lighttpd) et le proxy se charge du transfert et des
+plages.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.http import FileResponse, HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+SALT = 'dashboard.cv_download'
+PARAM = 't'
+KINDS = ('normal', 'spontaneous')
+OFFLOAD_HEADERS = {'x-accel-redirect': 'X-Accel-Redirect', 'x-sendfile': 'X-Sendfile'}
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _cache_key(user, kind, pk):
+    return f'cv-url:{user.pk}:{kind}:{pk}'
+
+
+def _sign(user, kind, pk):
+    token = signing.dumps({'u': user.pk, 'k': kind, 'p': pk}, salt=SALT)
+    return f"{reverse('dashboard:download_cv', args=[pk, kind])}?{PARAM}={token}"
+
+
+def signed_cv_urls(user, items):
+    """{(type, pk): adresse signée} pour des candidatures [(type, pk)], en un aller-retour de cache"""
+    keys = {_cache_key(user, kind, pk): (kind, pk) for kind, pk in items}
+    urls = {keys[key]: url for key, url in cache.get_many(list(keys)).items()}
+    missing = {key: _sign(user, *item) for key, item in keys.items() if item not in urls}
+    if missing:
+        cache.set_many(missing, settings.CV_URL_MAX_AGE // 2)
+        urls.update({keys[key]: url for key, url in missing.items()})
+    return urls
+
+
+def signed_cv_url(user, kind, pk):
+    return signed_cv_urls(user, [(kind, pk)])[(kind, pk)]
+
+
+def token_user_id(request, kind, pk):
+    """Utilisateur de l'adresse signée si elle est valable pour cette candidature, sinon None"""
+    token = request.GET.get(PARAM)
+    if not token:
+        return None
+    try:
+        data = signing.loads(token, salt=SALT, max_age=settings.CV_URL_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    if data.get('k') != kind or data.get('p') != pk:
+        return None
+    return data.get('u')
+
+
+class _RangeFile:
+    """Lecture limitée à `length` octets à partir de la position courante"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _local_path(fieldfile):
+    try:
+        return fieldfile.storage.path(fieldfile.name)
+    except NotImplementedError:
+        return None
+
+
+def _parse_range(header, size):
+    """(début, fin incluse) d'une plage simple, None si absente ou multiple, False si impossible"""
+    match = _RANGE.match(header.replace(' ', ''))
+    if not match:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        return None
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _offload(request):
+    mode = settings.CV_DOWNLOAD_OFFLOAD or request.headers.get('X-Sendfile-Type', '')
+    return OFFLOAD_HEADERS.get(mode.lower())
+
+
+def file_response(request, fieldfile, filename):
+    """Réponse de téléchargement de fieldfile : conditionnelle, par plages ou déléguée au proxy"""
+    storage = fieldfile.storage
+    size = fieldfile.size
+    try:
+        modified = storage.get_modified_time(fieldfile.name)
+    except (NotImplementedError, OSError):
+        modified = None
+    last_modified = modified.timestamp() if modified else None
+    etag = '"%s"' % hashlib.md5(f'{fieldfile.name}:{size}:{last_modified}'.encode()).hexdigest()
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified and int(last_modified))
+    if response is not None:
+        return response
+
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    path = _local_path(fieldfile)
+    header = _offload(request)
+    if header and path:
+        response = HttpResponse(content_type=content_type)
+        if header == 'X-Accel-Redirect':
+            response[header] = settings.CV_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(fieldfile.name)
+        else:
+            response[header] = path
+    else:
+        byte_range = None
+        if_range = request.headers.get('If-Range')
+        if 'Range' in request.headers and (
+            if_range is None
+            or if_range == etag
+            or (last_modified and parse_http_date_safe(if_range) == int(last_modified))
+        ):
+            byte_range = _parse_range(request.headers['Range'], size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        file = storage.open(fieldfile.name, 'rb')
+        if byte_range:
+            start, end = byte_range
+            file.seek(start)
+            response = FileResponse(_RangeFile(file, end - start + 1), content_type=content_type, status=206)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = end - start + 1
+        else:
+            response = FileResponse(file, content_type=content_type)
+            response['Content-Length'] = size
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(filename)}"
+    response['Cache-Control'] = 'private, no-transform'
+    return response
+
+
+def download_name(application):
+    extension = os.path.splitext(application.cv.name)[1]
+    return f'CV_{application.prenom}_{application.nom}{extension}'.replace(' ', '_')
@@ -0,0 +1,316 @@
+"""
+Exports en flux du dashboard : tableaux CSV / XLSX et archive ZIP de CV.
+
+Les lignes sont lues avec .iterator() (curseur serveur sur PostgreSQL) et
+envoyées au fil de l'eau par une StreamingHttpResponse : la mémoire reste
+constante quelle que soit la taille de l'export, et l'en-tête du fichier
+part avant même l'exécution de la requête.
+
+Le XLSX est écrit à la main (SpreadsheetML minimal, chaînes en ligne, sans
+table de chaînes partagées) dans un zipfile qui écrit sur un tampon non
+seekable : openpyxl, même en mode write_only, construit le classeur dans un
+fichier avant de pouvoir l'envoyer. L'archive des CV suit le même principe,
+fichier par fichier, par morceaux de CHUNK_SIZE octets.
+"""
+import csv
+import os
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from globaltit_site.storage import cv_storage
+
+CHUNK_SIZE = 64 * 1024
+ITERATOR_CHUNK = 2000
+XLSX_MAX_ROWS = 1048576  # limite d'Excel, ligne d'en-tête comprise
+XLSX_MAX_CELL = 32767
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'zip': 'application/zip',
+}
+
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class Column:
+    """Colonne exportée : en-tête, champ lu par values_list() et mise en forme éventuelle"""
+
+    def __init__(self, header, field, format=None):
+        self.header = header
+        self.field = field
+        self.format = format
+
+
+def choices(model, field):
+    """Mise en forme par le libellé d'un champ à choix"""
+    labels = dict(model._meta.get_field(field).choices)
+    return lambda value: labels.get(value, value)
+
+
+def yes_no(value):
+    return 'Oui' if value else 'Non'
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'tzinfo'):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%d/%m/%Y %H:%M')
+    return value
+
+
+def rows(queryset, columns):
+    """Valeurs mises en forme des lignes du queryset, lues par paquets"""
+    formats = [column.format for column in columns]
+    for values in queryset.values_list(*[column.field for column in columns]).iterator(chunk_size=ITERATOR_CHUNK):
+        yield [_cell(fmt(value) if fmt else value) for fmt, value in zip(formats, values)]
+
+
+class Pipe:
+    """Tampon non seekable : csv et zipfile y écrivent, le générateur de la réponse le vide"""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(data)
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+class _TextPipe(Pipe):
+    """Variante texte pour csv.writer, encodée en UTF-8"""
+
+    def write(self, text):
+        return super().write(text.encode('utf-8'))
+
+
+def _spreadsheet_safe(value):
+    # Une cellule qui commence par =, +, - ou @ serait interprétée comme une formule par le tableur
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+
+def csv_stream(columns, values):
+    """CSV (séparateur ; et BOM, pour Excel en français) ligne par ligne"""
+    pipe = _TextPipe()
+    writer = csv.writer(pipe, delimiter=';')
+    pipe.write('\ufeff')
+    writer.writerow([column.header for column in columns])
+    yield pipe.drain()
+    for row in values:
+        writer.writerow([_spreadsheet_safe(value) for value in row])
+        if pipe.size >= CHUNK_SIZE:
+            yield pipe.drain()
+    yield pipe.drain()
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font/><font><b/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        '<cellXfs count="2"><xf/><xf fontId="1" applyFont="1"/></cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+
+def _xlsx_row(values, style=''):
+    cells = []
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            text = _XML_ILLEGAL.sub('', str(value))[:XLSX_MAX_CELL]
+            cells.append(f'<c t="inlineStr"{style}><is><t xml:space="preserve">{escape(text)}</t></is></c>')
+        else:
+            cells.append(f'<c{style}><v>{value}</v></c>')
+    return f'<row>{"".join(cells)}</row>'.encode('utf-8')
+
+
+def xlsx_stream(columns, values, sheet='Export'):
+    """Classeur XLSX d'une feuille, la ligne d'en-tête en gras ; tronqué à la limite de lignes d'Excel"""
+    pipe = Pipe()
+    with zipfile.ZipFile(pipe, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet[:31])}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as part:
+            part.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            part.write(_xlsx_row([column.header for column in columns], style=' s="1"'))
+            yield pipe.drain()
+            for count, row in enumerate(values, start=2):
+                if count > XLSX_MAX_ROWS:
+                    break
+                part.write(_xlsx_row(row))
+                if pipe.size >= CHUNK_SIZE:
+                    yield pipe.drain()
+            part.write(b'</sheetData></worksheet>')
+    yield pipe.drain()
+
+
+def zip_stream(files):
+    """Archive ZIP de fichiers du stockage des CV [(nom dans l'archive, nom dans le stockage)]"""
+    pipe = Pipe()
+    missing = []
+    with zipfile.ZipFile(pipe, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        for arcname, name in files:
+            try:
+                source = cv_storage().open(name, 'rb')
+            except (FileNotFoundError, OSError):
+                missing.append(arcname)
+                continue
+            with source, archive.open(arcname, 'w') as target:
+                while True:
+                    data = source.read(CHUNK_SIZE)
+                    if not data:
+                        break
+                    target.write(data)
+                    if pipe.size >= CHUNK_SIZE:
+                        yield pipe.drain()
+            yield pipe.drain()
+        if missing:
+            archive.writestr('fichiers_manquants.txt', '\n'.join(missing) + '\n')
+    yield pipe.drain()
+
+
+def cv_files(applications):
+    """Noms dans l'archive et dans le stockage des CV de candidatures [(dossier, pk, prénom, nom, cv)]"""
+    for folder, pk, prenom, nom, cv in applications:
+        if cv:
+            extension = os.path.splitext(cv)[1]
+            yield f'{folder}/{pk}_{get_valid_filename(f"{prenom}_{nom}")}{extension}', cv
+
+
+def response(stream, basename, fmt):
+    """Réponse en flux, en pièce jointe datée"""
+    filename = f'{basename}_{timezone.localdate():%Y%m%d}.{fmt}'
+    response = StreamingHttpResponse(stream, content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Pas de mise en tampon par nginx : les premiers octets partent tout de suite
+    response['X-Accel-Buffering'] = 'no'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def _datasets():
+    from main.models import Candidature, CandidatureSpontanee
+
+    return {
+        'candidatures': ('Candidatures', [
+            Column('N°', 'pk'),
+            Column('Date', 'date_candidature'),
+            Column('Prénom', 'prenom'),
+            Column('Nom', 'nom'),
+            Column('Email', 'email'),
+            Column('Téléphone', 'telephone'),
+            Column('Offre', 'offre_emploi__titre'),
+            Column('Statut', 'statut', choices(Candidature, 'statut')),
+            Column('Notes internes', 'notes_admin'),
+            Column('Lettre de motivation', 'motivation'),
+            Column('CV', 'cv'),
+        ]),
+        'candidatures-spontanees': ('Candidatures spontanées', [
+            Column('N°', 'pk'),
+            Column('Date', 'date_candidature'),
+            Column('Prénom', 'prenom'),
+            Column('Nom', 'nom'),
+            Column('Email', 'email'),
+            Column('Téléphone', 'telephone'),
+            Column('Poste souhaité', 'poste_souhaite'),
+            Column('Statut', 'statut', choices(CandidatureSpontanee, 'statut')),
+            Column('Notes internes', 'notes_admin'),
+            Column('Lettre de motivation', 'motivation'),
+            Column('CV', 'cv'),
+        ]),
+        'demandes': ('Demandes', [
+            Column('N°', 'pk'),
+            Column('Date', 'date_creation'),
+            Column('Nom', 'nom'),
+            Column('Email', 'email'),
+            Column('Téléphone', 'telephone'),
+            Column('Sujet', 'sujet'),
+            Column('Message', 'message'),
+            Column('Service', 'service_interesse__titre'),
+            Column('Formation', 'formation_interessee__titre'),
+            Column('Traitée', 'traite', yes_no),
+        ]),
+        'activite': ('Activité', [
+            Column('Date', 'timestamp'),
+            Column('Utilisateur', 'user__username'),
+            Column('Action', 'action'),
+            Column("Type d'objet", 'object_type'),
+            Column('Objet', 'object_id'),
+            Column('Description', 'description'),
+            Column('Adresse IP', 'ip_address'),
+        ]),
+    }
+
+
+DATASETS = ('candidatures', 'candidatures-spontanees', 'demandes', 'activite')
+
+
+def table_response(dataset, queryset, fmt):
+    """Export en flux d'un jeu de données (voir _datasets) au format csv ou xlsx"""
+    title, columns = _datasets()[dataset]
+    values = rows(queryset, columns)
+    stream = csv_stream(columns, values) if fmt == 'csv' else xlsx_stream(columns, values, sheet=title)
+    return response(stream, dataset.replace('-', '_'), fmt)
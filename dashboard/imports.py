@@ -0,0 +1,423 @@
+"""
+Import en masse de services, formations et offres d'emploi (CSV, JSON).
+
+Le fichier envoyé est enregistré avec son ImportJob, puis traité par un
+thread d'arrière-plan du worker :
+- il est lu en flux, jamais chargé en entier. Les formats acceptés sont le
+  CSV (séparateur deviné parmi ; , et tabulation), un tableau JSON et le
+  JSON Lines ;
+- les lignes sont validées par paquets de IMPORT_CHUNK_ROWS avec le
+  formulaire du modèle ;
+- chaque paquet est enregistré en un seul bulk_create(update_conflicts=True).
+  Une ligne avec un `id` connu met à jour l'élément existant, une ligne sans
+  `id` en crée un nouveau. Les colonnes absentes du fichier gardent la
+  valeur actuelle de l'élément, ou la valeur par défaut du modèle ;
+- les images référencées par URL (colonne `image`) sont téléchargées par un
+  pool de IMPORT_IMAGE_WORKERS threads. Elles sont contrôlées comme un envoi
+  (taille, type reconnu aux premiers octets). Une colonne `image` vide garde
+  l'image actuelle. Seules les adresses publiques sont contactées, y compris
+  après une redirection : loopback, réseaux privés et link-local (métadonnées
+  du cloud) sont refusés.
+
+L'avancement (octets lus, lignes créées, mises à jour ou refusées, premières
+erreurs) est écrit dans l'ImportJob après chaque paquet. La page Imports du
+dashboard l'interroge pendant le traitement.
+"""
+import csv
+import http.client
+import io
+import ipaddress
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import urlsplit
+
+from django import forms
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, close_old_connections, transaction
+from django.forms import model_to_dict, modelform_factory
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from globaltit_site import tracing
+from globaltit_site.uploads import SNIFF_SIZE, detect_type
+from main.forms import OffreEmploiForm
+from main.models import Formation, OffreEmploi, Service
+
+from .models import DashboardActivity, ImportJob
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+EXTENSIONS = {'jpeg': 'jpg', 'png': 'png', 'gif': 'gif', 'webp': 'webp'}
+FALSE_VALUES = {'', '0', 'false', 'faux', 'non', 'no', 'off'}
+
+
+class ImportFormatError(ValueError):
+    """Fichier illisible : format non reconnu ou JSON invalide"""
+
+
+class Kind:
+    """Contenu importable : modèle, formulaire de validation et libellé du journal"""
+
+    def __init__(self, model, form, label):
+        self.model = model
+        self.form = form
+        self.label = label
+
+
+KINDS = {
+    'service': Kind(Service, modelform_factory(Service, fields=[
+        'titre', 'categorie', 'description', 'description_courte', 'icone', 'ordre', 'est_actif',
+    ]), 'Service'),
+    'formation': Kind(Formation, modelform_factory(Formation, fields=[
+        'titre', 'categorie', 'niveau', 'description', 'objectifs', 'programme', 'duree', 'prix', 'disponible',
+    ]), 'Formation'),
+    'offre': Kind(OffreEmploi, modelform_factory(
+        OffreEmploi, form=OffreEmploiForm,
+        fields=[field for field in OffreEmploiForm._meta.fields if field != 'image'],
+    ), 'OffreEmploi'),
+}
+
+
+# --- Lecture du fichier -------------------------------------------------------
+
+def _json_records(text, array):
+    """(numéro d'élément, valeur) d'un tableau JSON ou de JSON Lines, décodés au fil de la lecture"""
+    decoder = json.JSONDecoder()
+    buffer, eof, index = '', False, 0
+    if array:
+        # Le '[' d'ouverture a déjà été repéré par read_records
+        buffer = text.read(READ_SIZE).lstrip()[1:]
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,')
+        if array and buffer.startswith(']'):
+            return
+        if buffer:
+            try:
+                record, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ImportFormatError(f"JSON invalide après l'élément {index} : {e.msg}")
+            else:
+                index += 1
+                yield index, record
+                buffer = buffer[end:]
+                continue
+        elif eof:
+            if array:
+                raise ImportFormatError("Tableau JSON non terminé")
+            return
+        # Élément incomplet : lire la suite
+        chunk = text.read(READ_SIZE)
+        eof = not chunk
+        buffer += chunk
+
+
+def _csv_records(text):
+    sample = text.read(READ_SIZE)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample.partition('\n')[0], delimiters=';,\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(text, dialect=dialect)
+    for row in reader:
+        # Numéro de la ligne du fichier, en-tête compris
+        yield reader.line_num, row
+
+
+def read_records(raw):
+    """(numéro de ligne ou d'élément, enregistrement) d'un fichier binaire CSV, JSON ou JSON Lines"""
+    text = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+    try:
+        head = text.read(SNIFF_SIZE).lstrip()
+        text.seek(0)
+        if head.startswith('['):
+            yield from _json_records(text, array=True)
+        elif head.startswith('{'):
+            yield from _json_records(text, array=False)
+        else:
+            yield from _csv_records(text)
+    finally:
+        # Le fichier reste ouvert pour l'appelant, qui suit l'avancement avec tell()
+        text.detach()
+
+
+# --- Images -----------------------------------------------------------------
+
+def _is_url(value):
+    return urlsplit(value).scheme in ('http', 'https')
+
+
+def _public_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    """Connexion à l'hôte si toutes ses adresses sont publiques ; le socket vise l'adresse contrôlée"""
+    host, port = address
+    infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    for *_, sockaddr in infos:
+        ip = ipaddress.ip_address(sockaddr[0])
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"adresse non publique refusée : {host} ({ip})")
+    error = None
+    for family, kind, proto, _, sockaddr in infos:
+        try:
+            # Adresse déjà résolue : pas de seconde résolution DNS qui pourrait viser un autre hôte
+            return socket.create_connection(sockaddr[:2], timeout, source_address)
+        except OSError as e:
+            error = e
+    raise error or OSError(f"aucune adresse pour {host}")
+
+
+class _PublicHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _public_connection
+
+
+class _PublicHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _public_connection
+
+
+class _PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_PublicHTTPConnection, req)
+
+
+class _PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_PublicHTTPSConnection, req, context=self._context)
+
+
+class _RedirectHandler(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        # La cible est contrôlée à la connexion comme l'URL d'origine ; ici on n'accepte que http(s)
+        if not _is_url(newurl):
+            raise ValueError(f"redirection refusée : {newurl}")
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# Pas de proxy : il serait contacté à la place de l'hôte contrôlé
+_opener = urllib.request.build_opener(
+    urllib.request.ProxyHandler({}), _PublicHTTPHandler, _PublicHTTPSHandler, _RedirectHandler,
+)
+
+
+def download_image(model, url):
+    """Télécharge une image, la contrôle comme un envoi et l'enregistre ; renvoie son nom dans le stockage"""
+    rule = settings.UPLOAD_RULES['image']
+    if not _is_url(url):
+        raise ValueError(f"URL refusée : {url}")
+    request = urllib.request.Request(url, headers={'User-Agent': 'GlobalTit-import'})
+    with _opener.open(request, timeout=settings.IMPORT_IMAGE_TIMEOUT) as response:
+        data = response.read(rule['max_size'] + 1)
+    if len(data) > rule['max_size']:
+        raise ValueError("image trop volumineuse")
+    kind = detect_type(data[:SNIFF_SIZE])
+    if kind not in rule['types']:
+        raise ValueError(f"format d'image non accepté ({', '.join(rule['types'])})")
+    stem = os.path.splitext(os.path.basename(urlsplit(url).path))[0] or 'image'
+    upload_to = model._meta.get_field('image').upload_to
+    return default_storage.save(f"{upload_to}{get_valid_filename(stem)}.{EXTENSIONS[kind]}", ContentFile(data))
+
+
+class ImageFetcher:
+    """Pool de téléchargement ; une même URL n'est téléchargée qu'une fois par import"""
+
+    def __init__(self, model):
+        self.model = model
+        self.pool = ThreadPoolExecutor(settings.IMPORT_IMAGE_WORKERS, thread_name_prefix='import-image')
+        self.results = {}
+
+    def fetch(self, urls):
+        """{url: nom dans le stockage, ou exception} pour les URL demandées"""
+        futures = {url: self.pool.submit(download_image, self.model, url) for url in urls if url not in self.results}
+        for url, future in futures.items():
+            try:
+                self.results[url] = future.result()
+            except Exception as e:
+                self.results[url] = e
+        return {url: self.results[url] for url in urls}
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+# --- Validation et enregistrement --------------------------------------------
+
+def _form_data(kind, row, instance):
+    """Données du formulaire : les colonnes absentes gardent la valeur actuelle (ou celle par défaut du modèle)"""
+    current = model_to_dict(instance, fields=kind.form.base_fields) if instance is not None else {}
+    data = {}
+    for name, field in kind.form.base_fields.items():
+        model_field = kind.model._meta.get_field(name)
+        if name not in row:
+            if name in current:
+                data[name] = current[name]
+            elif model_field.has_default():
+                data[name] = model_field.get_default()
+            continue
+        value = row[name]
+        if isinstance(field, forms.BooleanField):
+            value = value if isinstance(value, bool) else str(value).strip().lower() not in FALSE_VALUES
+        elif isinstance(field, (forms.DecimalField, forms.FloatField)) and isinstance(value, str):
+            value = value.replace(' ', '').replace(',', '.')
+        data[name] = '' if value is None else value
+    return data
+
+
+def import_chunk(kind, records, fetcher):
+    """Valide et enregistre un paquet ; renvoie (créés, mis à jour, refusés, erreurs)"""
+    errors = []
+    rows = []
+    for line, record in records:
+        if not isinstance(record, dict):
+            errors.append({'ligne': line, 'erreurs': {'__all__': ["Enregistrement invalide (objet attendu)"]}})
+            continue
+        rows.append((line, {str(key).strip().lower(): value for key, value in record.items() if key is not None}))
+    ids = {str(row.get('id', '')).strip() for _, row in rows} - {''}
+    existing = kind.model.objects.in_bulk([int(pk) for pk in ids if pk.isdigit()])
+
+    prepared = {}
+    for line, row in rows:
+        pk = str(row.get('id') or '').strip()
+        instance = None
+        if pk:
+            instance = existing.get(int(pk)) if pk.isdigit() else None
+            if instance is None:
+                errors.append({'ligne': line, 'erreurs': {'id': [f"Aucun élément avec l'identifiant {pk}"]}})
+                continue
+        form = kind.form(data=_form_data(kind, row, instance), instance=instance)
+        if not form.is_valid():
+            errors.append({'ligne': line, 'erreurs': {field: list(messages) for field, messages in form.errors.items()}})
+            continue
+        # Un même id cité deux fois dans le paquet : la dernière ligne l'emporte
+        key = instance.pk if instance is not None else ('new', line)
+        prepared[key] = (line, form.instance, str(row.get('image') or '').strip())
+    failed = len(errors)
+
+    images = fetcher.fetch({image for _, _, image in prepared.values() if _is_url(image)})
+    for line, obj, image in prepared.values():
+        if not image:
+            continue
+        stored = images.get(image, image)
+        if isinstance(stored, Exception):
+            errors.append({'ligne': line, 'erreurs': {'image': [f"Image ignorée : {stored}"]}, 'avertissement': True})
+        elif _is_url(image) or default_storage.exists(image):
+            obj.image = stored
+        else:
+            errors.append({'ligne': line, 'erreurs': {'image': [f"Image ignorée : {image} introuvable"]}, 'avertissement': True})
+
+    objects = [obj for _, obj, _ in prepared.values()]
+    updated = sum(1 for obj in objects if obj.pk is not None)
+    if objects:
+        # date_creation n'est pas dans update_fields : une mise à jour garde la date d'origine
+        kind.model.objects.bulk_create(
+            objects,
+            update_conflicts=True,
+            unique_fields=['id'],
+            update_fields=[*kind.form.base_fields, 'image', 'date_modification'],
+        )
+    return len(objects) - updated, updated, failed, errors
+
+
+def _chunks(records, size):
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run(job):
+    """Traite un ImportJob jusqu'au bout ; l'avancement est enregistré après chaque paquet"""
+    kind = KINDS[job.kind]
+    job.status, job.started_at = 'running', timezone.now()
+    job.rows = job.created = job.updated = job.failed = job.position = 0
+    job.errors, job.message = [], ''
+    job.save()
+    progress = ['position', 'rows', 'created', 'updated', 'failed', 'errors']
+    fetcher = ImageFetcher(kind.model)
+    raw = default_storage.open(job.file.name, 'rb')
+    try:
+        job.size = raw.size
+        for chunk in _chunks(read_records(raw.file), settings.IMPORT_CHUNK_ROWS):
+            try:
+                with transaction.atomic():
+                    created, updated, failed, errors = import_chunk(kind, chunk, fetcher)
+            except DatabaseError as e:
+                created, updated, failed = 0, 0, len(chunk)
+                errors = [{'ligne': chunk[0][0], 'erreurs': {'__all__': [f"Paquet refusé par la base : {e}"]}}]
+            job.rows += len(chunk)
+            job.created += created
+            job.updated += updated
+            job.failed += failed
+            job.errors += errors[:max(0, settings.IMPORT_MAX_ERRORS - len(job.errors))]
+            job.position = raw.tell()
+            job.save(update_fields=progress)
+        job.status = 'done'
+    except (ImportFormatError, UnicodeDecodeError, csv.Error) as e:
+        job.status, job.message = 'failed', f"Fichier illisible : {e}"
+    except Exception as e:
+        logger.exception("Échec de l'import %s", job.pk)
+        job.status, job.message = 'failed', str(e)
+    finally:
+        raw.close()
+        fetcher.close()
+    job.finished_at = timezone.now()
+    job.save()
+    # Sans utilisateur (commande import_content), l'import est noté comme action du système
+    DashboardActivity.objects.create(
+        user_id=job.user_id,
+        action='upload',
+        object_type='ImportJob',
+        object_id=job.pk,
+        description=(
+            f"Import {job.get_kind_display().lower()} ({job.file_name}) : {job.created} créé(s), "
+            f"{job.updated} mis à jour, {job.failed} refusé(s)"
+            + (f" - {job.message}" if job.message else "")
+        ),
+    )
+    return job
+
+
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def enqueue(job_id):
+    _queue.put(job_id)
+    _ensure_worker()
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='content-import', daemon=True)
+            _worker.start()
+
+
+def _run():
+    while True:
+        job_id = _queue.get()
+        close_old_connections()
+        try:
+            job = ImportJob.objects.get(pk=job_id)
+            with tracing.span('job.content_import', **{'import.kind': job.kind}):
+                run(job)
+        except Exception:
+            logger.exception("Impossible de traiter l'import %s", job_id)
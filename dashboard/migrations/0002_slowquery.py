@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:28
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, unique=True, verbose_name='Empreinte')),
+                ('normalized_sql', models.TextField(verbose_name='SQL normalisé')),
+                ('params_fingerprint', models.CharField(blank=True, max_length=40, verbose_name='Empreinte des paramètres')),
+                ('view', models.CharField(blank=True, max_length=200, verbose_name='Vue')),
+                ('call_site', models.CharField(blank=True, max_length=300, verbose_name="Point d'appel")),
+                ('database', models.CharField(default='default', max_length=50, verbose_name='Base')),
+                ('calls', models.PositiveIntegerField(default=0, verbose_name='Appels')),
+                ('total_time_ms', models.FloatField(default=0, verbose_name='Temps total (ms)')),
+                ('max_time_ms', models.FloatField(default=0, verbose_name='Temps maximal (ms)')),
+                ('last_time_ms', models.FloatField(default=0, verbose_name='Dernière durée (ms)')),
+                ('explain', models.TextField(blank=True, verbose_name="Plan d'exécution")),
+                ('first_seen', models.DateTimeField(auto_now_add=True, verbose_name='Première occurrence')),
+                ('last_seen', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Dernière occurrence')),
+            ],
+            options={
+                'verbose_name': 'Requête lente',
+                'verbose_name_plural': 'Requêtes lentes',
+                'ordering': ['-total_time_ms'],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('dashboard', '0002_slowquery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10, verbose_name='Méthode')),
+                ('path', models.CharField(max_length=500, verbose_name='Chemin')),
+                ('view', models.CharField(blank=True, max_length=200, verbose_name='Vue')),
+                ('status_code', models.PositiveIntegerField(default=0, verbose_name='Statut HTTP')),
+                ('duration_ms', models.FloatField(default=0, verbose_name='Durée (ms)')),
+                ('sql_count', models.PositiveIntegerField(default=0, verbose_name='Requêtes SQL')),
+                ('sql_time_ms', models.FloatField(default=0, verbose_name='Temps SQL (ms)')),
+                ('memory_peak_kb', models.FloatField(default=0, verbose_name='Pic mémoire tracée (Ko)')),
+                ('stats_text', models.TextField(blank=True, verbose_name='Statistiques cProfile')),
+                ('stats_data', models.BinaryField(blank=True, verbose_name='Données cProfile (pstats)')),
+                ('sql_timeline', models.JSONField(blank=True, default=list, verbose_name='Chronologie SQL')),
+                ('allocations', models.JSONField(blank=True, default=list, verbose_name='Principales allocations')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Demandé par')),
+            ],
+            options={
+                'verbose_name': 'Profil de requête',
+                'verbose_name_plural': 'Profils de requêtes',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
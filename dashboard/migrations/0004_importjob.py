@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('dashboard', '0003_requestprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('service', 'Services'), ('formation', 'Formations'), ('offre', "Offres d'emploi")], max_length=20, verbose_name='Contenu')),
+                ('file', models.FileField(upload_to='imports/', verbose_name='Fichier')),
+                ('file_name', models.CharField(blank=True, max_length=255, verbose_name='Nom du fichier')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Terminé'), ('failed', 'Échec')], default='pending', max_length=20, verbose_name='Statut')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='Taille (octets)')),
+                ('position', models.PositiveBigIntegerField(default=0, verbose_name='Octets lus')),
+                ('rows', models.PositiveIntegerField(default=0, verbose_name='Lignes lues')),
+                ('created', models.PositiveIntegerField(default=0, verbose_name='Créés')),
+                ('updated', models.PositiveIntegerField(default=0, verbose_name='Mis à jour')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='Lignes refusées')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Erreurs')),
+                ('message', models.TextField(blank=True, verbose_name='Message')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Démarré le')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminé le')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Lancé par')),
+            ],
+            options={
+                'verbose_name': 'Import de contenus',
+                'verbose_name_plural': 'Imports de contenus',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('dashboard', '0004_importjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dashboardactivity',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur'),
+        ),
+    ]
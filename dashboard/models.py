@@ -50,7 +50,8 @@ class DashboardActivity(models.Model):
         ('deactivate', 'Désactivation'),
     ]
     
-    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Utilisateur")
+    # Sans utilisateur : action automatique (tâche planifiée, commande)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, verbose_name="Utilisateur")
     action = models.CharField(max_length=20, choices=ACTION_TYPES, verbose_name="Action")
     object_type = models.CharField(max_length=50, verbose_name="Type d'objet")
     object_id = models.CharField(max_length=100, blank=True, verbose_name="ID de l'objet")
@@ -64,7 +65,7 @@ class DashboardActivity(models.Model):
         ordering = ['-timestamp']
 
     def __str__(self):
-        return f"{self.user.username} - {self.get_action_display()} - {self.object_type}"
+        return f"{self.user.username if self.user else 'Système'} - {self.get_action_display()} - {self.object_type}"
 
 
 class SiteSettings(models.Model):
@@ -116,4 +117,103 @@ class ImageCategory(models.Model):
         ordering = ['name']
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class SlowQuery(models.Model):
+    """Requête SQL lente, agrégée par forme normalisée, vue et point d'appel"""
+    fingerprint = models.CharField(max_length=40, unique=True, verbose_name="Empreinte")
+    normalized_sql = models.TextField(verbose_name="SQL normalisé")
+    params_fingerprint = models.CharField(max_length=40, blank=True, verbose_name="Empreinte des paramètres")
+    view = models.CharField(max_length=200, blank=True, verbose_name="Vue")
+    call_site = models.CharField(max_length=300, blank=True, verbose_name="Point d'appel")
+    database = models.CharField(max_length=50, default='default', verbose_name="Base")
+    calls = models.PositiveIntegerField(default=0, verbose_name="Appels")
+    total_time_ms = models.FloatField(default=0, verbose_name="Temps total (ms)")
+    max_time_ms = models.FloatField(default=0, verbose_name="Temps maximal (ms)")
+    last_time_ms = models.FloatField(default=0, verbose_name="Dernière durée (ms)")
+    explain = models.TextField(blank=True, verbose_name="Plan d'exécution")
+    first_seen = models.DateTimeField(auto_now_add=True, verbose_name="Première occurrence")
+    last_seen = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="Dernière occurrence")
+
+    class Meta:
+        verbose_name = "Requête lente"
+        verbose_name_plural = "Requêtes lentes"
+        ordering = ['-total_time_ms']
+
+    def __str__(self):
+        return f"{self.view} - {self.normalized_sql[:60]}"
+
+    @property
+    def avg_time_ms(self):
+        return self.total_time_ms / self.calls if self.calls else 0
+
+
+class RequestProfile(models.Model):
+    """Profil détaillé d'une requête demandée par un membre du staff"""
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Demandé par")
+    method = models.CharField(max_length=10, verbose_name="Méthode")
+    path = models.CharField(max_length=500, verbose_name="Chemin")
+    view = models.CharField(max_length=200, blank=True, verbose_name="Vue")
+    status_code = models.PositiveIntegerField(default=0, verbose_name="Statut HTTP")
+    duration_ms = models.FloatField(default=0, verbose_name="Durée (ms)")
+    sql_count = models.PositiveIntegerField(default=0, verbose_name="Requêtes SQL")
+    sql_time_ms = models.FloatField(default=0, verbose_name="Temps SQL (ms)")
+    memory_peak_kb = models.FloatField(default=0, verbose_name="Pic mémoire tracée (Ko)")
+    stats_text = models.TextField(blank=True, verbose_name="Statistiques cProfile")
+    stats_data = models.BinaryField(blank=True, verbose_name="Données cProfile (pstats)")
+    sql_timeline = models.JSONField(default=list, blank=True, verbose_name="Chronologie SQL")
+    allocations = models.JSONField(default=list, blank=True, verbose_name="Principales allocations")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
+
+    class Meta:
+        verbose_name = "Profil de requête"
+        verbose_name_plural = "Profils de requêtes"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+
+class ImportJob(models.Model):
+    """Import en arrière-plan d'un fichier CSV ou JSON de contenus (dashboard/imports.py)"""
+    KIND_CHOICES = [
+        ('service', 'Services'),
+        ('formation', 'Formations'),
+        ('offre', "Offres d'emploi"),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'Échec'),
+    ]
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Lancé par")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Contenu")
+    file = models.FileField(upload_to='imports/', verbose_name="Fichier")
+    file_name = models.CharField(max_length=255, blank=True, verbose_name="Nom du fichier")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Statut")
+    size = models.PositiveBigIntegerField(default=0, verbose_name="Taille (octets)")
+    position = models.PositiveBigIntegerField(default=0, verbose_name="Octets lus")
+    rows = models.PositiveIntegerField(default=0, verbose_name="Lignes lues")
+    created = models.PositiveIntegerField(default=0, verbose_name="Créés")
+    updated = models.PositiveIntegerField(default=0, verbose_name="Mis à jour")
+    failed = models.PositiveIntegerField(default=0, verbose_name="Lignes refusées")
+    errors = models.JSONField(default=list, blank=True, verbose_name="Erreurs")
+    message = models.TextField(blank=True, verbose_name="Message")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Démarré le")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Terminé le")
+
+    class Meta:
+        verbose_name = "Import de contenus"
+        verbose_name_plural = "Imports de contenus"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.file_name}"
+
+    @property
+    def progress(self):
+        if self.status == 'done':
+            return 100
+        return min(99, int(self.position * 100 / self.size)) if self.size else 0
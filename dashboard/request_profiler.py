@@ -0,0 +1,225 @@
+"""
+Profil détaillé d'une requête, à la demande d'un membre du staff.
+
+Une requête est profilée lorsqu'elle porte un jeton signé, dans le
+paramètre ?_profile=<jeton> ou l'en-tête X-Profile-Token. Le jeton est
+produit par le dashboard (make_token), lié à l'utilisateur qui l'a demandé
+et valable REQUEST_PROFILE_TOKEN_MAX_AGE secondes ; il n'est accepté que si
+cet utilisateur, membre du staff, est celui de la session.
+
+Pour une telle requête, RequestProfilerMiddleware relève :
+- les statistiques cProfile de la suite des middlewares et de la vue ;
+- la chronologie des requêtes SQL (via globaltit_site.timing) ;
+- les principales allocations mémoire (différence de deux instantanés
+  tracemalloc) et le pic de mémoire tracée.
+
+Le résultat est enregistré dans RequestProfile et l'adresse de sa fiche est
+renvoyée dans l'en-tête X-Request-Profile. Les autres requêtes ne paient
+qu'une recherche dans la chaîne de requête et les en-têtes.
+
+tracemalloc trace tout le processus : les allocations d'autres requêtes
+servies en même temps par le worker peuvent apparaître dans le relevé. En
+ASGI, cProfile ne voit que le thread de la boucle d'événements.
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import time
+import tracemalloc
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+
+from globaltit_site import timing
+from globaltit_site.timing import view_label
+
+PARAM = '_profile'
+HEADER = 'HTTP_X_PROFILE_TOKEN'
+SALT = 'dashboard.request_profile'
+TRACE_FRAMES = 10
+TOP_FUNCTIONS = 60
+TOP_ALLOCATIONS = 25
+MAX_TIMELINE = 500
+
+_IGNORED_TRACES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, __file__),
+)
+
+
+def make_token(user):
+    return signing.dumps({'u': user.pk}, salt=SALT, compress=True)
+
+
+def profile_url(user, url):
+    """url complétée du jeton de profilage de user"""
+    separator = '&' if '?' in url else '?'
+    return f"{url}{separator}{PARAM}={make_token(user)}"
+
+
+def _token(request):
+    """Jeton fourni par la requête, None dans le cas courant"""
+    if f'{PARAM}=' in request.META.get('QUERY_STRING', ''):
+        return request.GET.get(PARAM)
+    return request.META.get(HEADER)
+
+
+def _authorized(request, token):
+    try:
+        data = signing.loads(token, salt=SALT, max_age=settings.REQUEST_PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    user = request.user
+    return user.is_authenticated and user.is_staff and data.get('u') == user.pk
+
+
+def _short_path(filename):
+    if filename.startswith(str(settings.BASE_DIR)):
+        return os.path.relpath(filename, settings.BASE_DIR)
+    marker = filename.rfind('site-packages' + os.sep)
+    if marker >= 0:
+        return filename[marker + len('site-packages') + 1:]
+    return filename
+
+
+class ProfileSession:
+    """Mesures d'une requête profilée, de start() à stop()"""
+
+    def __init__(self, request):
+        self.request = request
+        self.profile = cProfile.Profile()
+        self.stats = timing.current()
+        self.own_tracing = False
+        self.before = None
+        self.snapshot = None
+        self.peak = 0
+        self.duration = 0.0
+
+    def start(self):
+        if tracemalloc.is_tracing():
+            self.before = tracemalloc.take_snapshot()
+        else:
+            tracemalloc.start(TRACE_FRAMES)
+            self.own_tracing = True
+        tracemalloc.reset_peak()
+        if self.stats is not None:
+            self.stats.timeline = []
+        self.started = time.perf_counter()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        self.duration = (time.perf_counter() - self.started) * 1000
+        if self.stats is not None:
+            self.timeline, self.stats.timeline = self.stats.timeline, None
+        else:
+            self.timeline = []
+        self.snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED_TRACES)
+        self.peak = tracemalloc.get_traced_memory()[1]
+        if self.own_tracing:
+            tracemalloc.stop()
+
+    def stats_text(self):
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        return stream.getvalue()
+
+    def stats_data(self):
+        """Même format que Profile.dump_stats(), lisible par pstats ou snakeviz"""
+        self.profile.create_stats()
+        return marshal.dumps(self.profile.stats)
+
+    def allocations(self):
+        if self.before is not None:
+            statistics = self.snapshot.compare_to(self.before.filter_traces(_IGNORED_TRACES), 'lineno')
+            rows = [(stat, stat.size_diff, stat.count_diff) for stat in statistics if stat.size_diff > 0]
+        else:
+            rows = [(stat, stat.size, stat.count) for stat in self.snapshot.statistics('lineno')]
+        return [
+            {
+                'location': f"{_short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                'size_kb': round(size / 1024, 1),
+                'count': count,
+            }
+            for stat, size, count in rows[:TOP_ALLOCATIONS]
+        ]
+
+    def sql_timeline(self):
+        return [
+            {
+                'start_ms': round(offset * 1000, 2),
+                'duration_ms': round(duration * 1000, 2),
+                'sql': sql[:2000],
+                'many': many,
+                'database': alias,
+            }
+            for offset, duration, sql, many, alias in self.timeline[:MAX_TIMELINE]
+        ]
+
+    def save(self, response):
+        from .models import RequestProfile
+
+        profile = RequestProfile.objects.create(
+            user=self.request.user,
+            method=self.request.method,
+            path=self.request.get_full_path()[:500],
+            view=view_label(self.request)[:200],
+            status_code=response.status_code,
+            duration_ms=self.duration,
+            sql_count=len(self.timeline),
+            sql_time_ms=sum(duration for _, duration, *_ in self.timeline) * 1000,
+            memory_peak_kb=self.peak / 1024,
+            stats_text=self.stats_text(),
+            stats_data=self.stats_data(),
+            sql_timeline=self.sql_timeline(),
+            allocations=self.allocations(),
+        )
+        stale = RequestProfile.objects.values_list('pk', flat=True)[settings.REQUEST_PROFILE_MAX_ENTRIES:]
+        stale_ids = list(stale[:1000])
+        if stale_ids:
+            RequestProfile.objects.filter(pk__in=stale_ids).delete()
+        response['X-Request-Profile'] = reverse('dashboard:request_profile_detail', args=[profile.pk])
+        return response
+
+
+class RequestProfilerMiddleware:
+    """À placer après AuthenticationMiddleware"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = _token(request)
+        if token is None or not _authorized(request, token):
+            return self.get_response(request)
+        session = ProfileSession(request)
+        session.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            session.stop()
+        return session.save(response)
+
+    async def __acall__(self, request):
+        token = _token(request)
+        if token is None or not await sync_to_async(_authorized)(request, token):
+            return await self.get_response(request)
+        session = ProfileSession(request)
+        session.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            session.stop()
+        return await sync_to_async(session.save)(response)
@@ -0,0 +1,164 @@
+"""
+Journal des requêtes SQL lentes.
+
+capture() est appelé par globaltit_site.timing pour chaque requête plus
+lente que SLOW_QUERY_THRESHOLD_MS. Il ne fait que normaliser la requête,
+repérer le point d'appel et déposer le tout dans une file bornée : un
+thread d'arrière-plan par worker agrège ensuite les occurrences dans
+SlowQuery (une ligne par forme de requête, vue et point d'appel), calcule le
+plan d'exécution à la première occurrence et limite la table aux
+SLOW_QUERY_MAX_ROWS formes les plus récentes.
+"""
+import hashlib
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from globaltit_site import tracing
+from globaltit_site.timing import view_label
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIRS = tuple(str(settings.BASE_DIR / app) + os.sep for app in ('main', 'dashboard'))
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+_queue = queue.Queue(maxsize=1000)
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def normalize_sql(sql):
+    """Remplace littéraux et listes IN par des marqueurs pour regrouper les requêtes de même forme"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql.replace('%s', '?')).strip()
+
+
+def _call_site():
+    """Première frame du code de l'application (main/ ou dashboard/) qui a déclenché la requête"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PROJECT_DIRS) and not filename.endswith(('slow_queries.py', 'managers.py')):
+            return f"{os.path.relpath(filename, settings.BASE_DIR)}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return ''
+
+
+def capture(stats, sql, params, many, duration_ms, connection):
+    if many or not settings.SLOW_QUERY_LOG:
+        return
+    normalized = normalize_sql(sql)
+    call_site = _call_site()
+    view = view_label(stats.request) if stats.request is not None else ''
+    item = {
+        'fingerprint': hashlib.sha1(f'{normalized}|{view}|{call_site}'.encode()).hexdigest(),
+        'normalized_sql': normalized,
+        'params_fingerprint': hashlib.sha1(repr(params).encode()).hexdigest(),
+        'view': view,
+        'call_site': call_site,
+        'database': connection.alias,
+        'duration_ms': duration_ms,
+        'sql': sql,
+        'params': params,
+    }
+    try:
+        _queue.put_nowait(item)
+    except queue.Full:
+        return
+    _ensure_worker()
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='slow-query-log', daemon=True)
+            _worker.start()
+
+
+def explain(alias, sql, params):
+    """Plan d'exécution d'une requête SELECT, texte vide sinon"""
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return ''
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+    except Exception as e:
+        return f"Plan indisponible : {e}"
+
+
+def record(item):
+    from .models import SlowQuery
+
+    now = timezone.now()
+    duration = item['duration_ms']
+    changes = {
+        'calls': F('calls') + 1,
+        'total_time_ms': F('total_time_ms') + duration,
+        'max_time_ms': Greatest('max_time_ms', duration),
+        'last_time_ms': duration,
+        'params_fingerprint': item['params_fingerprint'],
+        'last_seen': now,
+    }
+    if SlowQuery.objects.filter(fingerprint=item['fingerprint']).update(**changes):
+        return
+    try:
+        SlowQuery.objects.create(
+            fingerprint=item['fingerprint'],
+            normalized_sql=item['normalized_sql'],
+            params_fingerprint=item['params_fingerprint'],
+            view=item['view'][:200],
+            call_site=item['call_site'][:300],
+            database=item['database'],
+            calls=1,
+            total_time_ms=duration,
+            max_time_ms=duration,
+            last_time_ms=duration,
+            explain=explain(item['database'], item['sql'], item['params']),
+            last_seen=now,
+        )
+    except IntegrityError:
+        # Créée entre-temps par un autre worker
+        SlowQuery.objects.filter(fingerprint=item['fingerprint']).update(**changes)
+
+
+def trim():
+    """Ne garde que les SLOW_QUERY_MAX_ROWS formes vues le plus récemment"""
+    from .models import SlowQuery
+
+    stale = SlowQuery.objects.order_by('-last_seen').values_list('pk', flat=True)[settings.SLOW_QUERY_MAX_ROWS:]
+    stale_ids = list(stale[:1000])
+    if stale_ids:
+        SlowQuery.objects.filter(pk__in=stale_ids).delete()
+
+
+def _run():
+    while True:
+        item = _queue.get()
+        close_old_connections()
+        try:
+            with tracing.span('job.slow_query_log', **{'db.name': item['database']}):
+                record(item)
+                if _queue.empty():
+                    trim()
+        except Exception:
+            logger.exception("Impossible d'enregistrer une requête lente")
@@ -0,0 +1,217 @@
+"""
+Tri groupé des candidatures (offres et spontanées).
+
+Le corps JSON de la vue bulk_triage_applications décrit les candidatures
+visées et ce qu'il faut en faire :
+
+    {"items": [{"type": "normal", "id": 12}, {"type": "spontaneous", "id": 7, "notes": "..."}],
+     "status": "rejetee", "notes": "...", "delete": false}
+
+Les clés status, notes et delete du niveau supérieur s'appliquent aux
+éléments qui ne les précisent pas. Tout passe dans une seule transaction :
+- les changements identiques sont regroupés en un UPDATE ... WHERE id IN ;
+- les changements propres à une seule candidature passent par bulk_update ;
+- les suppressions se font en un DELETE par type de candidature ;
+- le journal DashboardActivity est écrit en un bulk_create ;
+- les invalidations de cache sont regroupées, une par table.
+
+Les fichiers CV des candidatures supprimées sont effacés après le commit,
+par un thread d'arrière-plan, et seulement si plus aucune candidature ne
+pointe vers eux.
+"""
+import logging
+import queue
+import threading
+from collections import defaultdict
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from globaltit_site import tracing
+from globaltit_site.storage import cv_storage
+from main import invalidation
+from main.models import Candidature, CandidatureSpontanee
+
+from .models import DashboardActivity
+
+logger = logging.getLogger(__name__)
+
+MAX_ITEMS = 1000
+BATCH_SIZE = 500
+KINDS = {
+    'normal': (Candidature, 'Candidature'),
+    'spontaneous': (CandidatureSpontanee, 'CandidatureSpontanee'),
+}
+STATUSES = dict(Candidature.STATUT_CHOICES)
+
+
+class TriageError(ValueError):
+    """Corps de requête invalide"""
+
+
+class Operation:
+    """Ce qu'il faut faire d'une candidature : changements de champs ou suppression"""
+
+    def __init__(self, kind, pk, changes, delete):
+        self.kind = kind
+        self.pk = pk
+        self.changes = changes
+        self.delete = delete
+
+
+def parse(payload):
+    """Liste d'opérations à partir du corps JSON décodé ; lève TriageError s'il est invalide"""
+    if not isinstance(payload, dict) or not isinstance(payload.get('items'), list):
+        raise TriageError("Liste 'items' requise")
+    items = payload['items']
+    if not items:
+        raise TriageError("Aucune candidature sélectionnée")
+    if len(items) > MAX_ITEMS:
+        raise TriageError(f"{MAX_ITEMS} candidatures au plus par requête")
+    operations = {}
+    for item in items:
+        if not isinstance(item, dict):
+            raise TriageError("Élément invalide")
+        kind = item.get('type', 'normal')
+        if kind not in KINDS:
+            raise TriageError(f"Type de candidature inconnu : {kind}")
+        try:
+            pk = int(item.get('id'))
+        except (TypeError, ValueError):
+            raise TriageError("Identifiant de candidature invalide")
+        changes = {}
+        status = item.get('status', payload.get('status'))
+        if status is not None:
+            if status not in STATUSES:
+                raise TriageError(f"Statut inconnu : {status}")
+            changes['statut'] = status
+        notes = item.get('notes', payload.get('notes'))
+        if notes is not None:
+            changes['notes_admin'] = str(notes)
+        delete = bool(item.get('delete', payload.get('delete', False)))
+        if not changes and not delete:
+            raise TriageError("Rien à faire : statut, notes ou suppression attendus")
+        # Une candidature citée deux fois : la dernière mention l'emporte
+        operations[(kind, pk)] = Operation(kind, pk, changes, delete)
+    return list(operations.values())
+
+
+def _update(model, operations, now):
+    """Applique les changements : un UPDATE par jeu de valeurs partagé, bulk_update pour le reste"""
+    groups = defaultdict(list)
+    for operation in operations:
+        groups[tuple(sorted(operation.changes.items()))].append(operation.pk)
+    singles = defaultdict(list)
+    for changes, pks in groups.items():
+        if len(pks) > 1:
+            model.objects.filter(pk__in=pks).update(**dict(changes), date_modification=now)
+        else:
+            # update() et bulk_update() ignorent auto_now : la date est posée ici
+            fields = tuple(field for field, _ in changes)
+            singles[fields].append(model(pk=pks[0], **dict(changes), date_modification=now))
+    for fields, objects in singles.items():
+        model.objects.bulk_update(objects, [*fields, 'date_modification'], batch_size=BATCH_SIZE)
+
+
+def _description(operation, name):
+    if operation.delete:
+        return f"Candidature de {name} supprimée (tri groupé)"
+    if 'statut' in operation.changes:
+        return f"Statut candidature de {name} mis à jour : {operation.changes['statut']} (tri groupé)"
+    return f"Notes de la candidature de {name} mises à jour (tri groupé)"
+
+
+def apply(user, operations):
+    """Applique les opérations en une transaction ; renvoie les compteurs et les candidatures introuvables"""
+    now = timezone.now()
+    by_kind = defaultdict(list)
+    for operation in operations:
+        by_kind[operation.kind].append(operation)
+    result = {'updated': 0, 'deleted': 0, 'missing': []}
+    activities = []
+    files = set()
+    with transaction.atomic(), invalidation.coalesced():
+        for kind, kind_operations in by_kind.items():
+            model, label = KINDS[kind]
+            found = {
+                pk: (f"{prenom} {nom}", cv)
+                for pk, prenom, nom, cv in model.objects.select_for_update().filter(
+                    pk__in=[operation.pk for operation in kind_operations]
+                ).values_list('pk', 'prenom', 'nom', 'cv')
+            }
+            result['missing'] += [{'type': kind, 'id': op.pk} for op in kind_operations if op.pk not in found]
+            kind_operations = [operation for operation in kind_operations if operation.pk in found]
+            deleted = [operation.pk for operation in kind_operations if operation.delete]
+            updated = [operation for operation in kind_operations if not operation.delete]
+            if updated:
+                _update(model, updated, now)
+            if deleted:
+                model.objects.filter(pk__in=deleted).delete()
+                files.update(found[pk][1] for pk in deleted if found[pk][1])
+            # Candidature et CandidatureSpontanee n'ont pas le manager versionné : update() ne publie rien
+            invalidation.invalidate_model(model)
+            result['updated'] += len(updated)
+            result['deleted'] += len(deleted)
+            activities += [
+                DashboardActivity(
+                    user=user,
+                    action='delete' if operation.delete else 'edit',
+                    object_type=label,
+                    object_id=operation.pk,
+                    description=_description(operation, found[operation.pk][0]),
+                )
+                for operation in kind_operations
+            ]
+        DashboardActivity.objects.bulk_create(activities, batch_size=BATCH_SIZE)
+        if files:
+            transaction.on_commit(lambda: delete_files_later(files))
+    return result
+
+
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def delete_files_later(names):
+    """Efface en arrière-plan les fichiers CV qui ne sont plus référencés"""
+    _queue.put(sorted(names))
+    _ensure_worker()
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='cv-cleanup', daemon=True)
+            _worker.start()
+
+
+def delete_unreferenced(names):
+    """Supprime du stockage ceux des fichiers qu'aucune candidature ne référence ; renvoie leur nombre"""
+    referenced = set()
+    for model, _ in KINDS.values():
+        referenced.update(model.objects.filter(cv__in=names).values_list('cv', flat=True))
+    deleted = 0
+    for name in names:
+        if name in referenced:
+            continue
+        try:
+            cv_storage().delete(name)
+            deleted += 1
+        except Exception:
+            logger.exception("Impossible de supprimer le fichier CV %s", name)
+    return deleted
+
+
+def _run():
+    while True:
+        names = _queue.get()
+        close_old_connections()
+        try:
+            with tracing.span('job.cv_cleanup', **{'cv.files': len(names)}):
+                delete_unreferenced(names)
+        except Exception:
+            logger.exception("Échec du nettoyage de %d fichier(s) CV", len(names))
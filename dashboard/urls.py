@@ -110,13 +110,38 @@ urlpatterns = [
     path('recruitment/jobs/add/', views.add_job_offer, name='add_job_offer'),
     path('recruitment/jobs/<int:pk>/edit/', views.edit_job_offer, name='edit_job_offer'),
     path('recruitment/jobs/<int:pk>/delete/', views.delete_job_offer, name='delete_job_offer'),
+    path('recruitment/jobs/<int:pk>/matches/', views.job_offer_matches, name='job_offer_matches'),
     path('recruitment/jobs/<int:pk>/toggle/', views.toggle_job_offer_status, name='toggle_job_offer_status'),
+    path('recruitment/search/', views.candidate_search, name='recruitment_search'),
     path('recruitment/applications/<int:pk>/', views.view_application, name='view_application'),
     path('recruitment/applications/<int:pk>/<str:type>/', views.view_application, name='view_application'),
+    path('recruitment/applications/<int:pk>/<str:type>/cv/', views.download_cv, name='download_cv'),
     path('recruitment/applications/<int:pk>/status/', views.update_application_status, name='update_application_status'),
     path('recruitment/applications/<int:pk>/delete/', views.delete_application, name='delete_application'),
+    path('recruitment/applications/bulk/', views.bulk_triage_applications, name='bulk_triage_applications'),
+    path('recruitment/applications/cv.zip', views.export_cvs, name='export_cvs'),
+    path('exports/<str:dataset>.<str:fmt>', views.export_data, name='export_data'),
+
+    # Imports en masse (CSV, JSON)
+    path('imports/', views.import_manager, name='import_manager'),
+    path('imports/<int:pk>/status/', views.import_status, name='import_status'),
     
     # Gestion des demandes (Services/Formations/Contact)
     path('requests/', views.request_manager, name='request_manager'),
     path('requests/<int:pk>/', views.request_detail, name='request_detail'),
+
+    # Requêtes SQL lentes
+    path('sql/', views.sql_insights, name='sql_insights'),
+
+    # Profileur par échantillonnage
+    path('profiler/', views.profiler_panel, name='profiler_panel'),
+    path('profiler/export/', views.profiler_export, name='profiler_export'),
+
+    # Profils de requêtes à la demande
+    path('request-profiles/', views.request_profiles, name='request_profiles'),
+    path('request-profiles/<int:pk>/', views.request_profile_detail, name='request_profile_detail'),
+    path('request-profiles/<int:pk>/download/', views.request_profile_download, name='request_profile_download'),
+
+    # Performances en direct (tampon circulaire des workers)
+    path('performance/', views.performance_panel, name='performance_panel'),
 ]
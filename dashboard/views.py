@@ -1,5 +1,6 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
@@ -8,11 +9,14 @@ from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from django.conf import settings
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q
 from django.core.paginator import Paginator
 import os
 import json
 import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
 from PIL import Image
 from io import BytesIO
 
@@ -624,25 +628,29 @@ def content_manager(request):
     return render(request, 'dashboard/content_manager.html', context)
 
 
-@login_required
-def activity_log(request):
-    """Journal d'activité"""
+def activity_queryset(params):
+    """Activités filtrées selon les paramètres GET du journal"""
     activities = DashboardActivity.objects.select_related('user').order_by('-timestamp')
     
     # Filtrage
-    action = request.GET.get('action')
+    action = params.get('action')
     if action:
         activities = activities.filter(action=action)
     
-    object_type = request.GET.get('object_type')
+    object_type = params.get('object_type')
     if object_type:
         activities = activities.filter(object_type=object_type)
-    
+    return activities
+
+
+@login_required
+def activity_log(request):
+    """Journal d'activité"""
     context = {
-        'activities': activities,
+        'activities': activity_queryset(request.GET),
         'current_filters': {
-            'action': action,
-            'object_type': object_type,
+            'action': request.GET.get('action'),
+            'object_type': request.GET.get('object_type'),
         }
     }
     return render(request, 'dashboard/activity_log.html', context)
@@ -2038,23 +2046,42 @@ def toggle_brand_status(request, brand_id):
 
 # --- Gestion du Recrutement ---
 
+def applications_queryset(model, params):
+    """Candidatures filtrées par statut, et par offre pour les candidatures aux offres"""
+    applications = model.objects.all().order_by('-date_candidature')
+    statut = params.get('statut')
+    if statut:
+        applications = applications.filter(statut=statut)
+    offre = params.get('offre')
+    if offre and offre.isdigit() and model is Candidature:
+        applications = applications.filter(offre_emploi_id=offre)
+    return applications
+
+
 @login_required
 def recruitment_manager(request):
     """Tableau de bord pour la gestion du recrutement"""
+    from .cv_download import signed_cv_urls
+
     offres = OffreEmploi.objects.all().order_by('-date_creation')
-    candidatures = Candidature.objects.all().order_by('-date_candidature')
-    candidatures_spontanees = CandidatureSpontanee.objects.all().order_by('-date_candidature')
-    
+    candidatures = applications_queryset(Candidature, request.GET)
+    candidatures_spontanees = applications_queryset(CandidatureSpontanee, request.GET)
+
+    # Adresses signées des CV, lues en un seul accès au cache
+    candidatures = list(candidatures.select_related('offre_emploi'))
+    candidatures_spontanees = list(candidatures_spontanees)
+    rows = [('normal', app) for app in candidatures] + [('spontaneous', app) for app in candidatures_spontanees]
+    cv_urls = signed_cv_urls(request.user, [(kind, app.pk) for kind, app in rows if app.cv])
+    for kind, app in rows:
+        app.cv_url = cv_urls.get((kind, app.pk))
+
     context = {
         'job_offers': offres,
         'applications': candidatures,
         'spontaneous_applications': candidatures_spontanees,
         'total_offers': offres.count(),
-        'total_applications': candidatures.count() + candidatures_spontanees.count(),
-        'new_applications': (
-            candidatures.filter(statut='nouvelle').count() + 
-            candidatures_spontanees.filter(statut='nouvelle').count()
-        )
+        'total_applications': len(rows),
+        'new_applications': sum(1 for _, app in rows if app.statut == 'nouvelle'),
     }
     return render(request, 'dashboard/recruitment_manager.html', context)
 
@@ -2141,17 +2168,135 @@ def toggle_job_offer_status(request, pk):
 @login_required
 def view_application(request, pk, type='normal'):
     """Voir le détail d'une candidature"""
+    from .cv_download import signed_cv_url
+
     if type == 'spontaneous':
         application = get_object_or_404(CandidatureSpontanee, pk=pk)
     else:
         application = get_object_or_404(Candidature, pk=pk)
-        
-    return render(request, 'dashboard/application_detail.html', {
+
+    context = {
         'application': application,
-        'type': type
+        'type': type,
+        'cv_url': signed_cv_url(request.user, type, pk) if application.cv else None,
+    }
+    if type == 'spontaneous':
+        from main.matching import offers_for_candidate
+
+        # Offres actives les plus proches du poste souhaité et de la lettre de motivation
+        matches, context['matching_fresh'] = offers_for_candidate(pk)
+        context['matching_ready'] = matches is not None
+        if matches:
+            offers = OffreEmploi.objects.only('titre', 'lieu', 'type_contrat').in_bulk([offer for offer, _ in matches])
+            context['matching_offers'] = [
+                (offers[offer], round(score * 100)) for offer, score in matches if offer in offers
+            ]
+    return render(request, 'dashboard/application_detail.html', context)
+
+
+@login_required
+def job_offer_matches(request, pk):
+    """Candidatures spontanées les plus proches d'une offre (rapprochement TF-IDF)"""
+    from main.matching import candidates_for_offer
+    from .cv_download import signed_cv_urls
+
+    offre = get_object_or_404(OffreEmploi, pk=pk)
+    matches, fresh = candidates_for_offer(pk)
+    applications = CandidatureSpontanee.objects.defer('motivation', 'notes_admin').in_bulk(
+        [application for application, _ in matches or []]
+    )
+    rows = [(applications[application], round(score * 100)) for application, score in matches or [] if application in applications]
+    cv_urls = signed_cv_urls(request.user, [('spontaneous', app.pk) for app, _ in rows if app.cv])
+    for app, _ in rows:
+        app.cv_url = cv_urls.get(('spontaneous', app.pk))
+    return render(request, 'dashboard/job_offer_matches.html', {
+        'offre': offre,
+        'rows': rows,
+        'matching_ready': matches is not None,
+        'matching_fresh': fresh,
     })
 
 
+def download_cv(request, pk, type='normal'):
+    """CV d'une candidature : session connectée ou adresse signée, avec plages d'octets"""
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.views import redirect_to_login
+    from django.http import Http404, HttpResponseForbidden
+    from .cv_download import KINDS, download_name, file_response, token_user_id
+
+    if type not in KINDS:
+        raise Http404
+    user_id = token_user_id(request, type, pk)
+    if user_id is not None:
+        if not get_user_model().objects.filter(pk=user_id, is_active=True).exists():
+            return HttpResponseForbidden()
+    elif not request.user.is_authenticated:
+        if request.GET.get('t'):
+            return HttpResponseForbidden('Lien expiré ou invalide.')
+        return redirect_to_login(request.get_full_path())
+
+    model = CandidatureSpontanee if type == 'spontaneous' else Candidature
+    application = get_object_or_404(model.objects.only('cv', 'nom', 'prenom'), pk=pk)
+    if not application.cv:
+        raise Http404
+    try:
+        return file_response(request, application.cv, download_name(application))
+    except FileNotFoundError:
+        raise Http404
+
+
+@login_required
+def candidate_search(request):
+    """Recherche de candidats par compétences détectées dans le CV (toutes requises) et par nom"""
+    from urllib.parse import urlencode
+    from main import cv_index
+    from .cv_download import signed_cv_urls
+
+    skills = [skill for skill in request.GET.getlist('skill') if skill in cv_index.SKILLS]
+    query = request.GET.get('q', '').strip()
+    documents = cv_index.search(skills, query)
+
+    paginator = Paginator(
+        documents.select_related('candidature__offre_emploi', 'candidature_spontanee')
+        .defer(
+            'texte', 'candidature__motivation', 'candidature__notes_admin', 'candidature_spontanee__motivation',
+            'candidature_spontanee__notes_admin', 'candidature__offre_emploi__description',
+            'candidature__offre_emploi__missions', 'candidature__offre_emploi__profil_recherche',
+            'candidature__offre_emploi__avantages',
+        )
+        .order_by('-pk'),
+        25,
+    )
+    # Total compté sur l'index des compétences plutôt que par COUNT(*) sur la requête complète
+    paginator.count = cv_index.count(skills, query)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    rows = [
+        ('normal' if document.candidature_id else 'spontaneous', document)
+        for document in page_obj if document.application is not None
+    ]
+    cv_urls = signed_cv_urls(request.user, [(kind, document.application.pk) for kind, document in rows])
+    results = [
+        {
+            'kind': kind,
+            'application': document.application,
+            'skills': [(slug, cv_index.skill_label(slug)) for slug in document.competences_list()],
+            'cv_url': cv_urls.get((kind, document.application.pk)),
+        }
+        for kind, document in rows
+    ]
+
+    context = {
+        'page_obj': page_obj,
+        'results': results,
+        'facet': cv_index.facet(),
+        'selected_skills': skills,
+        'selected_labels': [cv_index.skill_label(skill) for skill in skills],
+        'query': query,
+        'filters': urlencode([('skill', skill) for skill in skills] + ([('q', query)] if query else [])),
+    }
+    return render(request, 'dashboard/candidate_search.html', context)
+
+
 @login_required
 @require_POST
 def update_application_status(request, pk):
@@ -2205,27 +2350,157 @@ def delete_application(request, pk):
     return JsonResponse({'success': True})
 
 @login_required
-def request_manager(request):
-    """Vue pour gérer toutes les demandes (Services, Formations, Contact)"""
+def export_data(request, dataset, fmt):
+    """Export CSV ou XLSX en flux, avec les filtres GET de la page correspondante"""
+    from django.http import Http404
+    from .exports import DATASETS, table_response
+
+    if dataset not in DATASETS or fmt not in ('csv', 'xlsx'):
+        raise Http404
+    if dataset == 'candidatures':
+        queryset = applications_queryset(Candidature, request.GET)
+    elif dataset == 'candidatures-spontanees':
+        queryset = applications_queryset(CandidatureSpontanee, request.GET)
+    elif dataset == 'demandes':
+        queryset = contact_queryset(request.GET)
+    else:
+        queryset = activity_queryset(request.GET)
+    DashboardActivity.objects.create(
+        user=request.user,
+        action='download',
+        object_type='Export',
+        object_id=dataset,
+        description=f"Export {fmt.upper()} : {dataset}"
+    )
+    return table_response(dataset, queryset, fmt)
+
+
+@login_required
+def export_cvs(request):
+    """Archive ZIP en flux des CV : candidatures cochées (POST) ou filtrées comme le recrutement (GET)"""
+    from .exports import cv_files, response, zip_stream
+
+    kinds = {'normal': Candidature, 'spontaneous': CandidatureSpontanee}
+    if request.method == 'POST':
+        querysets = {
+            kind: model.objects.filter(pk__in=[pk for pk in request.POST.getlist(kind) if pk.isdigit()]).order_by('pk')
+            for kind, model in kinds.items()
+        }
+    else:
+        querysets = {
+            kind: applications_queryset(model, request.GET)
+            for kind, model in kinds.items() if request.GET.get('type', kind) == kind
+        }
+    folders = {'normal': 'candidatures', 'spontaneous': 'candidatures_spontanees'}
+    applications = (
+        (folders[kind], *values)
+        for kind, queryset in querysets.items()
+        for values in queryset.exclude(cv='').values_list('pk', 'prenom', 'nom', 'cv').iterator(chunk_size=2000)
+    )
+    DashboardActivity.objects.create(
+        user=request.user,
+        action='download',
+        object_type='Export',
+        object_id='cv',
+        description="Archive ZIP des CV"
+    )
+    return response(zip_stream(cv_files(applications)), 'cv', 'zip')
+
+
+@login_required
+def import_manager(request):
+    """Imports en masse de services, formations et offres (CSV, JSON) : envoi du fichier et suivi"""
+    from .imports import enqueue
+    from .models import ImportJob
+
+    if request.method == 'POST':
+        kind = request.POST.get('kind')
+        upload = request.FILES.get('import_file')
+        if kind not in dict(ImportJob.KIND_CHOICES):
+            messages.error(request, 'Choisissez le type de contenu à importer.')
+        elif upload is None:
+            messages.error(request, 'Aucun fichier envoyé.')
+        else:
+            job = ImportJob.objects.create(user=request.user, kind=kind, file=upload, file_name=upload.name, size=upload.size)
+            # Le thread ne doit voir l'import qu'une fois la transaction de la requête validée
+            transaction.on_commit(lambda: enqueue(job.pk))
+            messages.success(request, f"Import de {upload.name} lancé.")
+        return redirect('dashboard:import_manager')
+
+    paginator = Paginator(ImportJob.objects.select_related('user').defer('errors'), 20)
+    context = {
+        'page_obj': paginator.get_page(request.GET.get('page')),
+        'kinds': ImportJob.KIND_CHOICES,
+        'max_size': settings.UPLOAD_RULES['import_file']['max_size'],
+    }
+    return render(request, 'dashboard/import_manager.html', context)
+
+
+@login_required
+def import_status(request, pk):
+    """Avancement d'un import, interrogé par la page Imports pendant le traitement"""
+    from .models import ImportJob
+
+    job = get_object_or_404(ImportJob, pk=pk)
+    return JsonResponse({
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'rows': job.rows,
+        'created': job.created,
+        'updated': job.updated,
+        'failed': job.failed,
+        'errors': job.errors,
+        'message': job.message,
+    })
+
+
+@login_required
+@require_POST
+def bulk_triage_applications(request):
+    """Tri groupé : statuts, notes et suppressions de candidatures des deux types, en une transaction"""
+    from .triage import TriageError, apply, parse
+
+    try:
+        operations = parse(json.loads(request.body))
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Corps JSON invalide'}, status=400)
+    except TriageError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    result = apply(request.user, operations)
+    return JsonResponse({'success': True, **result})
+
+
+def contact_queryset(params):
+    """Demandes filtrées selon les paramètres GET de la gestion des demandes"""
     from main.models import Contact
     
     demandes = Contact.objects.all().order_by('-date_creation')
     
     # Filtrage par statut
-    statut = request.GET.get('statut')
+    statut = params.get('statut')
     if statut == 'traite':
         demandes = demandes.filter(traite=True)
     elif statut == 'non_traite':
         demandes = demandes.filter(traite=False)
         
     # Filtrage par type
-    type_demande = request.GET.get('type')
+    type_demande = params.get('type')
     if type_demande == 'service':
         demandes = demandes.filter(service_interesse__isnull=False)
     elif type_demande == 'formation':
         demandes = demandes.filter(formation_interessee__isnull=False)
     elif type_demande == 'contact':
         demandes = demandes.filter(service_interesse__isnull=True, formation_interessee__isnull=True)
+    return demandes
+
+
+@login_required
+def request_manager(request):
+    """Vue pour gérer toutes les demandes (Services, Formations, Contact)"""
+    demandes = contact_queryset(request.GET)
+    statut = request.GET.get('statut')
+    type_demande = request.GET.get('type')
     
     # Pagination
     paginator = Paginator(demandes, 20)
@@ -2259,3 +2534,189 @@ def request_detail(request, pk):
         'demande': demande,
     }
     return render(request, 'dashboard/request_detail.html', context)
+
+
+SLOW_QUERY_ORDERINGS = {
+    'total': '-total_time_ms',
+    'calls': '-calls',
+    'max': '-max_time_ms',
+    'recent': '-last_seen',
+}
+
+
+@staff_member_required
+def sql_insights(request):
+    """Requêtes SQL lentes classées par temps total ou fréquence"""
+    from .models import SlowQuery
+
+    if request.method == 'POST' and request.POST.get('action') == 'clear':
+        SlowQuery.objects.all().delete()
+        messages.success(request, 'Le journal des requêtes lentes a été vidé.')
+        return redirect('dashboard:sql_insights')
+
+    sort = request.GET.get('sort', 'total')
+    queries = SlowQuery.objects.order_by(SLOW_QUERY_ORDERINGS.get(sort, '-total_time_ms'))
+
+    view_name = request.GET.get('view')
+    if view_name:
+        queries = queries.filter(view=view_name)
+
+    paginator = Paginator(queries, 25)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    context = {
+        'page_obj': page_obj,
+        'current_sort': sort,
+        'current_view': view_name,
+        'views': SlowQuery.objects.order_by('view').values_list('view', flat=True).distinct(),
+        'threshold_ms': settings.SLOW_QUERY_THRESHOLD_MS,
+    }
+    return render(request, 'dashboard/sql_insights.html', context)
+
+
+@staff_member_required
+def profiler_panel(request):
+    """Activation du profileur par worker et résumé des profils collectés"""
+    from globaltit_site import metrics, profiler
+
+    if request.method == 'POST':
+        action = request.POST.get('action')
+        if action == 'enable':
+            pids = [int(pid) for pid in request.POST.getlist('pids') if pid.isdigit()]
+            profiler.set_config(True, pids)
+            messages.success(request, 'Profileur activé' + (f' sur {len(pids)} worker(s).' if pids else ' sur tous les workers.'))
+        elif action == 'disable':
+            profiler.set_config(False)
+            messages.success(request, 'Profileur arrêté.')
+        elif action == 'reset':
+            profiler.reset()
+            messages.success(request, 'Profils effacés.')
+        return redirect('dashboard:profiler_panel')
+
+    stacks, workers = profiler.load_profiles()
+    total = sum(stacks.values())
+    views = Counter()
+    for (view, _), count in stacks.items():
+        views[view] += count
+
+    context = {
+        'config': profiler.get_config(),
+        'live_pids': sorted(metrics.process_files('live', live_only=True)),
+        'workers': workers,
+        'total_samples': total,
+        'views': [
+            {'name': name, 'samples': count, 'percent': count * 100 / total}
+            for name, count in views.most_common()
+        ],
+        'hz': settings.PROFILER_HZ,
+    }
+    return render(request, 'dashboard/profiler.html', context)
+
+
+@staff_member_required
+def profiler_export(request):
+    """Téléchargement des profils fusionnés (speedscope ou piles repliées), pour une vue ou toutes"""
+    from globaltit_site import profiler
+
+    stacks, workers = profiler.load_profiles()
+    view_name = request.GET.get('view') or None
+    hz = workers[0]['hz'] if workers else settings.PROFILER_HZ
+    stamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+
+    if request.GET.get('format') == 'folded':
+        response = HttpResponse(profiler.to_folded(stacks, view_name), content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="profil_{stamp}.folded"'
+    else:
+        response = JsonResponse(profiler.to_speedscope(stacks, hz, view_name))
+        response['Content-Disposition'] = f'attachment; filename="profil_{stamp}.speedscope.json"'
+    return response
+
+
+@staff_member_required
+def request_profiles(request):
+    """Profils de requêtes enregistrés et génération d'une adresse signée à profiler"""
+    from .models import RequestProfile
+    from .request_profiler import profile_url
+
+    signed_url = None
+    if request.method == 'POST':
+        if request.POST.get('action') == 'clear':
+            RequestProfile.objects.all().delete()
+            messages.success(request, 'Les profils de requêtes ont été supprimés.')
+            return redirect('dashboard:request_profiles')
+        url = request.POST.get('url', '').strip()
+        if url.startswith('/') and not url.startswith('//'):
+            signed_url = request.build_absolute_uri(profile_url(request.user, url))
+        else:
+            messages.error(request, 'Indiquez un chemin du site commençant par « / ».')
+
+    profiles = RequestProfile.objects.select_related('user').defer('stats_text', 'stats_data', 'sql_timeline', 'allocations')
+    paginator = Paginator(profiles, 25)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    context = {
+        'page_obj': page_obj,
+        'signed_url': signed_url,
+        'token_max_age_minutes': settings.REQUEST_PROFILE_TOKEN_MAX_AGE // 60,
+    }
+    return render(request, 'dashboard/request_profiles.html', context)
+
+
+@staff_member_required
+def request_profile_detail(request, pk):
+    """Statistiques cProfile, chronologie SQL et allocations d'une requête profilée"""
+    from .models import RequestProfile
+
+    profile = get_object_or_404(RequestProfile.objects.select_related('user'), pk=pk)
+    timeline = profile.sql_timeline
+    scale = max((entry['start_ms'] + entry['duration_ms'] for entry in timeline), default=0)
+    scale = max(scale, profile.duration_ms, 1)
+    for entry in timeline:
+        entry['left'] = entry['start_ms'] * 100 / scale
+        entry['width'] = max(entry['duration_ms'] * 100 / scale, 0.3)
+
+    context = {
+        'profile': profile,
+        'timeline': timeline,
+    }
+    return render(request, 'dashboard/request_profile_detail.html', context)
+
+
+@staff_member_required
+def request_profile_download(request, pk):
+    """Statistiques cProfile brutes (format pstats, ouvrable avec snakeviz)"""
+    from .models import RequestProfile
+
+    profile = get_object_or_404(RequestProfile, pk=pk)
+    response = HttpResponse(bytes(profile.stats_data), content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="requete_{profile.pk}.prof"'
+    return response
+
+
+@staff_member_required
+def performance_panel(request):
+    """Latences par vue, requêtes SQL, cache, requêtes les plus lentes et mémoire des workers"""
+    from globaltit_site import ring
+
+    windows = settings.PERF_PANEL_WINDOWS
+    window = request.GET.get('window', '')
+    window = int(window) if window.isdigit() and int(window) in windows else 300
+    data = ring.summary(window)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse(data)
+
+    for entry in data['slowest']:
+        entry['date'] = datetime.fromtimestamp(entry['timestamp'], tz=dt_timezone.utc)
+    for worker in data['workers']:
+        if worker['last_request']:
+            worker['last_request'] = datetime.fromtimestamp(worker['last_request'], tz=dt_timezone.utc)
+        if worker['started']:
+            worker['started'] = datetime.fromtimestamp(worker['started'], tz=dt_timezone.utc)
+
+    context = {
+        **data,
+        'windows': [(seconds, f'{seconds // 3600} h' if seconds >= 3600 else f'{seconds // 60} min') for seconds in windows],
+        'enabled': bool(settings.PERF_RING_SIZE),
+    }
+    return render(request, 'dashboard/performance.html', context)
@@ -0,0 +1,326 @@
+"""
+Backend de cache à deux niveaux pour globaltit_site.
+
+- L1 : LRU borné en mémoire du processus, avec TTL court.
+- L2 : cache partagé entre workers (fichiers ou table en local,
+  memcached/redis en production), désigné par son alias dans CACHES.
+
+La cohérence entre workers se fait clé par clé. Une écriture (set,
+delete, incr) met à jour le L2 et le L1 du worker qui écrit. Les copies
+des autres workers sont évincées par le bus d'invalidation
+(main/invalidation.py), qui vise les clés de version des tables et les
+clés déclarées dépendantes. Les autres copies expirent après L1_TIMEOUT.
+Les clés dont le préfixe figure dans L1_BYPASS ne sont jamais gardées
+en L1, car chaque worker doit en voir tout de suite la dernière valeur.
+
+Les défauts de cache concurrents sur une même clé sont fusionnés
+(singleflight) : un seul appelant calcule la valeur, les autres l'attendent.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .timing import record_cache
+
+FILL_LOCK_PREFIX = '__tiered_fill__:'
+
+_MISSING = object()
+
+# Un même backend est instancié une fois par thread par Django : l'état du
+# L1 est donc partagé au niveau du module, indexé par LOCATION.
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class _Flight:
+    """Calcul en cours pour une clé (singleflight)"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = _MISSING
+
+
+class _Store:
+    """État L1 partagé par toutes les instances d'un même cache"""
+
+    def __init__(self):
+        self.data = OrderedDict()  # clé -> (expiration, valeur picklée)
+        self.lock = threading.RLock()
+        self.inflight = {}
+        self.stats = {
+            'l1_hits': 0,
+            'l2_hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'coalesced': 0,
+        }
+
+
+def _get_store(name):
+    with _stores_lock:
+        if name not in _stores:
+            _stores[name] = _Store()
+        return _stores[name]
+
+
+def get_all_stats():
+    """Retourne les compteurs de tous les caches à deux niveaux du processus"""
+    return {name: dict(store.stats, l1_size=len(store.data)) for name, store in _stores.items()}
+
+
+class TieredCache(BaseCache):
+    """
+    Cache LRU local (L1) devant un cache partagé (L2).
+
+    Options (OPTIONS dans CACHES) :
+        L2                    alias du cache partagé (obligatoire)
+        L1_MAX_ENTRIES        nombre maximum d'entrées en mémoire (1000)
+        L1_TIMEOUT            durée de vie maximale d'une entrée L1 en secondes (30)
+        L1_BYPASS             préfixes des clés lues et écrites directement dans L2 ([])
+        L2_SHARED             L2 commun à toutes les instances, comme redis ou memcached (True)
+        FILL_WAIT             attente maximale d'un remplissage fait par un autre worker (2.0)
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = options['L2']
+        self._l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 30))
+        self._fill_wait = float(options.get('FILL_WAIT', 2.0))
+        # Comparé aux clés complètes (préfixe et version par défaut compris)
+        self._l1_bypass_keys = tuple(self.make_key(prefix) for prefix in options.get('L1_BYPASS', ()))
+        self.l2_shared = bool(options.get('L2_SHARED', True))
+        self._store = _get_store(location or 'default')
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    # --- L1 -----------------------------------------------------------------
+
+    def _l1_expiry(self, timeout):
+        expiry = time.monotonic() + self._l1_timeout
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is not None:
+            expiry = min(expiry, time.monotonic() + max(timeout, 0))
+        return expiry
+
+    def _l1_get(self, key):
+        if key.startswith(self._l1_bypass_keys):
+            return _MISSING
+        store = self._store
+        with store.lock:
+            entry = store.data.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= time.monotonic():
+                del store.data[key]
+                store.stats['expirations'] += 1
+                return _MISSING
+            store.data.move_to_end(key)
+        return pickle.loads(entry[1])
+
+    def _l1_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        if key.startswith(self._l1_bypass_keys):
+            return
+        if timeout == 0:
+            self._l1_delete(key)
+            return
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        store = self._store
+        with store.lock:
+            store.data[key] = (self._l1_expiry(timeout), pickled)
+            store.data.move_to_end(key)
+            while len(store.data) > self._l1_max_entries:
+                store.data.popitem(last=False)
+                store.stats['evictions'] += 1
+
+    def _l1_delete(self, key):
+        with self._store.lock:
+            return self._store.data.pop(key, None) is not None
+
+    def evict_local(self, key, version=None):
+        """Retire une clé du L1 de ce processus sans toucher au L2"""
+        evicted = self._l1_delete(self.make_key(key, version=version))
+        if evicted:
+            self._store.stats['invalidations'] += 1
+        return evicted
+
+    def clear_local(self):
+        """Vide le L1 de ce processus"""
+        with self._store.lock:
+            self._store.data.clear()
+
+    # --- API BaseCache ------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        stats = self._store.stats
+        value = self._l1_get(full_key)
+        if value is not _MISSING:
+            stats['l1_hits'] += 1
+            record_cache(True)
+            return value
+        value = self.l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            stats['misses'] += 1
+            record_cache(False)
+            return default
+        stats['l2_hits'] += 1
+        record_cache(True)
+        self._l1_set(full_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        stats = self._store.stats
+        found = {}
+        remaining = []
+        for key in keys:
+            value = self._l1_get(self.make_and_validate_key(key, version=version))
+            if value is _MISSING:
+                remaining.append(key)
+            else:
+                found[key] = value
+        stats['l1_hits'] += len(found)
+        if found:
+            record_cache(True, len(found))
+        if remaining:
+            from_l2 = self.l2.get_many(remaining, version=version)
+            stats['l2_hits'] += len(from_l2)
+            stats['misses'] += len(remaining) - len(from_l2)
+            if from_l2:
+                record_cache(True, len(from_l2))
+            if len(remaining) > len(from_l2):
+                record_cache(False, len(remaining) - len(from_l2))
+            for key, value in from_l2.items():
+                self._l1_set(self.make_key(key, version=version), value)
+            found.update(from_l2)
+        return found
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        added = self.l2.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._l1_set(full_key, value, timeout)
+        return added
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        self.l2.set(key, value, timeout=timeout, version=version)
+        self._store.stats['sets'] += 1
+        self._l1_set(full_key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout=timeout, version=version)
+        self._store.stats['sets'] += len(data)
+        for key, value in data.items():
+            if key not in failed:
+                self._l1_set(self.make_and_validate_key(key, version=version), value, timeout)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        self._l1_delete(full_key)
+        deleted = self.l2.delete(key, version=version)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._l1_delete(self.make_and_validate_key(key, version=version))
+        self.l2.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        if self._l1_get(full_key) is not _MISSING:
+            return True
+        return self.l2.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        self._l1_delete(full_key)
+        value = self.l2.incr(key, delta, version=version)
+        return value
+
+    def clear(self):
+        self.l2.clear()
+        self.clear_local()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Comme BaseCache.get_or_set, avec fusion des défauts concurrents :
+        dans le processus via un Event, entre workers via un verrou posé
+        dans L2 avec add().
+        """
+        value = self.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            return value
+
+        full_key = self.make_and_validate_key(key, version=version)
+        store = self._store
+        with store.lock:
+            flight = store.inflight.get(full_key)
+            leader = flight is None
+            if leader:
+                flight = store.inflight[full_key] = _Flight()
+
+        if not leader:
+            store.stats['coalesced'] += 1
+            flight.event.wait(self._fill_wait)
+            if flight.value is not _MISSING:
+                return flight.value
+            return self._compute(key, default, timeout, version)
+
+        try:
+            value = self._fill_from_peer(key, version)
+            if value is _MISSING:
+                value = self._compute(key, default, timeout, version)
+            flight.value = value
+            return value
+        finally:
+            with store.lock:
+                store.inflight.pop(full_key, None)
+            flight.event.set()
+
+    def _fill_from_peer(self, key, version):
+        """Attend brièvement qu'un autre worker remplisse la clé, si c'est lui qui la calcule"""
+        lock_key = FILL_LOCK_PREFIX + key
+        if self.l2.add(lock_key, 1, timeout=max(int(self._fill_wait) + 1, 1), version=version):
+            return _MISSING
+        self._store.stats['coalesced'] += 1
+        deadline = time.monotonic() + self._fill_wait
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            value = self.l2.get(key, _MISSING, version=version)
+            if value is not _MISSING:
+                self._l1_set(self.make_key(key, version=version), value)
+                return value
+        return _MISSING
+
+    def _compute(self, key, default, timeout, version):
+        try:
+            value = default() if callable(default) else default
+            self.add(key, value, timeout=timeout, version=version)
+            return value
+        finally:
+            # Même en cas d'erreur : les autres workers n'attendent pas l'expiration du verrou
+            self.l2.delete(FILL_LOCK_PREFIX + key, version=version)
+
+    def stats(self):
+        """Compteurs hits/miss/évictions du L1 de ce processus"""
+        return dict(self._store.stats, l1_size=len(self._store.data))
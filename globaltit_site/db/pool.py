@@ -0,0 +1,190 @@
+"""
+Pool de connexions PostgreSQL par processus, utilisé par le backend
+globaltit_site.db.pooled.
+
+Le pool garde entre MIN_SIZE et MAX_SIZE connexions physiques ouvertes.
+Quand toutes sont empruntées, une demande attend au plus TIMEOUT secondes
+avant d'échouer. Une connexion restée inactive plus de HEALTH_CHECK_AFTER
+secondes est vérifiée (SELECT 1) avant d'être prêtée.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class ConnectionPool:
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=10.0, health_check_after=30.0):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self._idle = deque()  # (connexion, instant de restitution)
+        self._size = 0
+        self._cond = threading.Condition()
+        self.stats = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'connections_discarded': 0,
+            'health_check_failures': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    def _open(self):
+        connection = self._connect()
+        self.stats['connections_created'] += 1
+        return connection
+
+    def fill(self):
+        """Ouvre les connexions jusqu'à MIN_SIZE"""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                connection = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            self.putconn(connection)
+
+    def getconn(self):
+        start = time.monotonic()
+        while True:
+            connection = None
+            with self._cond:
+                while True:
+                    if self._idle:
+                        connection, released_at = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = self.timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        self.stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f"Aucune connexion disponible après {self.timeout}s (pool de {self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+
+            if connection is None:
+                try:
+                    connection = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif time.monotonic() - released_at > self.health_check_after and not self._is_healthy(connection):
+                self.stats['health_check_failures'] += 1
+                self._discard(connection)
+                continue
+
+            waited = time.monotonic() - start
+            self.stats['checkouts'] += 1
+            self.stats['wait_time_total'] += waited
+            self.stats['wait_time_max'] = max(self.stats['wait_time_max'], waited)
+            return connection
+
+    def putconn(self, connection):
+        if connection.closed or not self._reset(connection):
+            self._discard(connection)
+            return
+        with self._cond:
+            self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def _reset(self, connection):
+        """Annule une éventuelle transaction en cours ; False si la connexion est inutilisable"""
+        try:
+            if not connection.autocommit:
+                connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _is_healthy(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            if not connection.autocommit:
+                connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self.stats['connections_discarded'] += 1
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def snapshot(self):
+        """Statistiques courantes du pool"""
+        with self._cond:
+            idle = len(self._idle)
+            size = self._size
+        stats = dict(self.stats)
+        checkouts = stats['checkouts'] or 1
+        stats.update({
+            'size': size,
+            'idle': idle,
+            'in_use': size - idle,
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'wait_time_avg_ms': round(stats['wait_time_total'] / checkouts * 1000, 3),
+            'wait_time_max_ms': round(stats['wait_time_max'] * 1000, 3),
+        })
+        return stats
+
+
+def get_pool(alias, settings_dict, connect):
+    """Pool de l'alias pour le processus courant (un nouveau pool après un fork)"""
+    key = (alias, os.getpid())
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                options = settings_dict.get('POOL', {})
+                pool = ConnectionPool(
+                    connect,
+                    min_size=int(options.get('MIN_SIZE', 1)),
+                    max_size=int(options.get('MAX_SIZE', 10)),
+                    timeout=float(options.get('TIMEOUT', 10)),
+                    health_check_after=float(options.get('HEALTH_CHECK_AFTER', 30)),
+                )
+                _pools[key] = pool
+    return pool
+
+
+def get_pool_stats():
+    """Statistiques des pools du processus courant, par alias"""
+    pid = os.getpid()
+    return {alias: pool.snapshot() for (alias, owner), pool in list(_pools.items()) if owner == pid}
@@ -0,0 +1,38 @@
+"""
+Backend PostgreSQL avec pool de connexions par processus.
+
+    DATABASES['default']['ENGINE'] = 'globaltit_site.db.pooled'
+    DATABASES['default']['POOL'] = {'MIN_SIZE': 2, 'MAX_SIZE': 10, 'TIMEOUT': 10}
+
+À la fin d'une requête, Django « ferme » la connexion : elle retourne en
+réalité dans le pool, sans refaire la poignée de main TCP/TLS au prochain
+emprunt. CONN_MAX_AGE doit rester à 0 avec ce backend.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from ..pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def _get_pool(self, conn_params):
+        def connect():
+            return base.DatabaseWrapper.get_new_connection(self, conn_params)
+        return get_pool(self.alias, self.settings_dict, connect)
+
+    def get_new_connection(self, conn_params):
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = IsolationLevel(options.get('isolation_level', IsolationLevel.READ_COMMITTED))
+        except ValueError:
+            raise ImproperlyConfigured(
+                f"Invalid transaction isolation level {options['isolation_level']} specified."
+            )
+        return self._get_pool(conn_params).getconn()
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self._get_pool(None).putconn(self.connection)
@@ -0,0 +1,166 @@
+"""
+Routage des lectures vers les réplicas.
+
+Seules les lectures des modèles de `main` et `dashboard` faites pendant une
+vue listée dans REPLICA_READ_VIEWS (pages publiques, listes du tableau de
+bord) partent vers un réplica ; tout le reste (sessions, authentification,
+commandes, écritures) reste sur `default`.
+
+Garde-fous :
+- dès qu'une requête écrit, ses lectures suivantes repartent sur `default` ;
+- après un POST (ou toute méthode non sûre), le navigateur est épinglé sur
+  `default` pendant REPLICA_PIN_SECONDS pour relire ses propres écritures.
+  L'épingle est un cookie signé de courte durée : ni lecture de session (et
+  donc pas de `Vary: Cookie`) sur les pages publiques, ni session créée pour
+  un visiteur anonyme qui envoie un formulaire ;
+- chaque réplica est vérifié au plus toutes les REPLICA_HEALTH_INTERVAL
+  secondes ; s'il est injoignable ou en retard de plus de REPLICA_MAX_LAG
+  secondes, il est écarté et les lectures reviennent sur `default`.
+"""
+import contextvars
+import logging
+import math
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+ROUTED_APPS = {'main', 'dashboard'}
+PIN_COOKIE = 'db_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_state = contextvars.ContextVar('replica_routing', default=None)
+_health = {}  # alias -> (vérifié à, utilisable, retard en secondes)
+_health_lock = threading.Lock()
+
+
+class RoutingState:
+    """État de routage d'une requête, partagé avec les threads qu'elle lance"""
+
+    def __init__(self, use_replica=False):
+        self.use_replica = use_replica
+        self.wrote = False
+        self.alias = None
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def _measure_lag(alias):
+    """Retard de réplication en secondes (0 hors PostgreSQL ou sur un primaire)"""
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT CASE WHEN pg_is_in_recovery() "
+                "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+                "ELSE 0 END"
+            )
+        else:
+            cursor.execute("SELECT 0")
+        return float(cursor.fetchone()[0])
+
+
+def replica_status(alias, force=False):
+    """(utilisable, retard) d'un réplica, mis en cache REPLICA_HEALTH_INTERVAL secondes"""
+    now = time.monotonic()
+    checked = _health.get(alias)
+    if checked and not force and now - checked[0] < settings.REPLICA_HEALTH_INTERVAL:
+        return checked[1], checked[2]
+
+    with _health_lock:
+        checked = _health.get(alias)
+        if checked and not force and now - checked[0] < settings.REPLICA_HEALTH_INTERVAL:
+            return checked[1], checked[2]
+        try:
+            lag = _measure_lag(alias)
+            usable = lag <= settings.REPLICA_MAX_LAG
+            if not usable:
+                logger.warning("Réplica %s écarté : %.1f s de retard", alias, lag)
+        except Exception as e:
+            logger.warning("Réplica %s injoignable : %s", alias, e)
+            connections[alias].close()
+            lag, usable = None, False
+        _health[alias] = (time.monotonic(), usable, lag)
+        return usable, lag
+
+
+def healthy_replicas():
+    return [alias for alias in replica_aliases() if replica_status(alias)[0]]
+
+
+def is_pinned(request):
+    if PIN_COOKIE not in request.COOKIES:
+        return False
+    # La signature horodatée borne la durée, même si le navigateur garde le cookie
+    return request.get_signed_cookie(
+        PIN_COOKIE, default=None, salt=PIN_COOKIE, max_age=settings.REPLICA_PIN_SECONDS,
+    ) is not None
+
+
+def pin(response):
+    """Épingle le navigateur sur le primaire pendant REPLICA_PIN_SECONDS"""
+    response.set_signed_cookie(
+        PIN_COOKIE, '1', salt=PIN_COOKIE,
+        max_age=math.ceil(settings.REPLICA_PIN_SECONDS),
+        secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+    )
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replica or state.wrote or model._meta.app_label not in ROUTED_APPS:
+            return None
+        if state.alias is None:
+            # Un seul réplica par requête pour des lectures cohérentes entre elles
+            replicas = healthy_replicas()
+            state.alias = random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Active les réplicas pour les vues de REPLICA_READ_VIEWS et épingle le navigateur après une écriture"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.set(RoutingState())
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.set(None)
+        if request.method not in SAFE_METHODS and replica_aliases():
+            pin(response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if (
+            state is not None
+            and replica_aliases()
+            and request.method in SAFE_METHODS
+            and request.resolver_match.view_name in settings.REPLICA_READ_VIEWS
+            and not is_pinned(request)
+        ):
+            state.use_replica = True
+        return None
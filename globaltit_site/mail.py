@@ -0,0 +1,49 @@
+"""
+Backend d'envoi d'e-mails instrumenté.
+
+Délègue l'envoi à EMAIL_DELIVERY_BACKEND (SMTP par défaut) et publie dans
+globaltit_site.metrics : la jauge des messages en cours d'envoi (la file
+sortante, additionnée sur tous les workers), les messages envoyés ou en
+échec et la durée de chaque envoi. Chaque envoi est aussi un span de
+globaltit_site.tracing.
+"""
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from . import metrics, tracing
+
+
+class InstrumentedEmailBackend(BaseEmailBackend):
+
+    def __init__(self, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently)
+        self.backend = get_connection(settings.EMAIL_DELIVERY_BACKEND, fail_silently=fail_silently, **kwargs)
+
+    def open(self):
+        return self.backend.open()
+
+    def close(self):
+        return self.backend.close()
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        pending = len(email_messages)
+        metrics.gauge_add('email_outbox', pending)
+        start = time.perf_counter()
+        sent = 0
+        try:
+            with tracing.span('email.send', tracing.KIND_CLIENT, **{'email.messages': pending}) as current:
+                sent = self.backend.send_messages(email_messages) or 0
+                if current is not None:
+                    current.set('email.sent', sent)
+            return sent
+        finally:
+            metrics.gauge_add('email_outbox', -pending)
+            metrics.observe('email_send_duration_ms', (time.perf_counter() - start) * 1000)
+            metrics.inc('emails_sent_total', amount=sent)
+            if pending - sent:
+                metrics.inc('emails_failed_total', amount=pending - sent)
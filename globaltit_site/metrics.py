@@ -0,0 +1,285 @@
+"""
+Compteurs et histogrammes partagés entre les workers gunicorn.
+
+Chaque processus écrit ses valeurs dans son propre fichier mappé en
+mémoire (METRICS_DIR/live_<pid>.db) : pas de verrou entre processus, une
+écriture coûte une recherche dans un dictionnaire et un struct.pack_into.
+La lecture (collect) additionne les fichiers de tous les processus et
+l'archive (archive_live.db). À sa première lecture, le fichier d'un worker
+terminé est reporté dans l'archive puis supprimé : les compteurs restent
+monotones et le nombre de fichiers à lire reste borné. Chaque processus
+garde un verrou exclusif (flock) sur son fichier. Un fichier verrouillé
+n'est jamais archivé, même si son PID a été réutilisé. Un nouveau
+processus qui reprend le PID d'un worker terminé rouvre le fichier sans
+l'effacer.
+
+Les jauges (gauge_add) sont écrites à part (gauge_<pid>.db) et seules
+celles des processus encore vivants sont additionnées.
+
+Format d'un fichier : un entier de 8 octets (taille utilisée) puis des
+entrées [longueur de la clé (int32)][clé utf-8 complétée à 8 octets][valeur float64].
+
+Les histogrammes utilisent des classes log-linéaires façon HDR : chaque
+puissance de 2 (en millisecondes) est découpée en SUB_BUCKETS classes de
+même largeur, soit une erreur relative d'au plus 1/SUB_BUCKETS.
+"""
+import fcntl
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+
+from django.conf import settings
+
+SUB_BUCKETS = 8
+BUCKET_BOUNDS = [
+    2.0 ** exponent * (1 + step / SUB_BUCKETS)
+    for exponent in range(-3, 17)  # de 0,125 ms à environ 131 s
+    for step in range(1, SUB_BUCKETS + 1)
+]
+INITIAL_SIZE = 1 << 16
+
+_HEADER = struct.Struct('q')
+_KEY_LENGTH = struct.Struct('i')
+_VALUE = struct.Struct('d')
+
+
+@lru_cache(maxsize=4096)
+def _encode_key(name, labels, suffix):
+    return json.dumps([name, sorted(labels), suffix], separators=(',', ':'))
+
+
+def _entry_key(name, labels, suffix=''):
+    return _encode_key(name, tuple(labels.items()) if labels else (), suffix)
+
+
+def _read_entries(data):
+    used = _HEADER.unpack_from(data, 0)[0]
+    position = _HEADER.size
+    while position < used:
+        length = _KEY_LENGTH.unpack_from(data, position)[0]
+        key_start = position + _KEY_LENGTH.size
+        key = bytes(data[key_start:key_start + length]).decode('utf-8')
+        value_position = key_start + length + (-(_KEY_LENGTH.size + length) % 8)
+        yield key, _VALUE.unpack_from(data, value_position)[0], value_position
+        position = value_position + _VALUE.size
+
+
+class MmapStore:
+    """Fichier de valeurs d'un processus ; un seul écrivain (verrou flock), lecteurs quelconques"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        while True:
+            self._file = open(path, 'a+b')
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            # Fichier archivé et supprimé pendant l'attente du verrou : en ouvrir un nouveau
+            if os.fstat(self._file.fileno()).st_nlink:
+                break
+            self._file.close()
+        size = max(os.fstat(self._file.fileno()).st_size, INITIAL_SIZE)
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._used = _HEADER.unpack_from(self._map, 0)[0]
+        if self._used < _HEADER.size:
+            self._used = _HEADER.size
+            _HEADER.pack_into(self._map, 0, self._used)
+        # Valeurs déjà présentes (PID réutilisé, archive) : on les prolonge
+        self._positions = {key: position for key, _, position in _read_entries(self._map)}
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _allocate(self, key):
+        encoded = key.encode('utf-8')
+        padding = -(_KEY_LENGTH.size + len(encoded)) % 8
+        size = _KEY_LENGTH.size + len(encoded) + padding + _VALUE.size
+        while self._used + size > len(self._map):
+            new_size = len(self._map) * 2
+            self._file.truncate(new_size)
+            self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), new_size)
+        position = self._used
+        _KEY_LENGTH.pack_into(self._map, position, len(encoded))
+        self._map[position + _KEY_LENGTH.size:position + _KEY_LENGTH.size + len(encoded)] = encoded
+        value_position = position + _KEY_LENGTH.size + len(encoded) + padding
+        _VALUE.pack_into(self._map, value_position, 0.0)
+        self._used += size
+        # La taille utilisée est publiée en dernier : un lecteur ne voit jamais d'entrée incomplète
+        _HEADER.pack_into(self._map, 0, self._used)
+        self._positions[key] = value_position
+        return value_position
+
+    def add(self, key, amount):
+        with self._lock:
+            position = self._positions.get(key)
+            if position is None:
+                position = self._allocate(key)
+            _VALUE.pack_into(self._map, position, _VALUE.unpack_from(self._map, position)[0] + amount)
+
+    def set(self, key, value):
+        with self._lock:
+            position = self._positions.get(key)
+            if position is None:
+                position = self._allocate(key)
+            _VALUE.pack_into(self._map, position, value)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def metrics_dir():
+    directory = settings.METRICS_DIR
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def get_store(kind='live'):
+    """Fichier du processus courant (un nouveau fichier après un fork)"""
+    key = (kind, os.getpid())
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is None:
+                store = _stores[key] = MmapStore(os.path.join(metrics_dir(), f'{kind}_{os.getpid()}.db'))
+    return store
+
+
+def inc(name, labels=None, amount=1):
+    """Incrémente un compteur"""
+    get_store().add(_entry_key(name, labels), amount)
+
+
+def gauge_add(name, amount, labels=None):
+    """Fait varier une jauge ; seules les jauges des processus vivants sont additionnées"""
+    get_store('gauge').add(_entry_key(name, labels), amount)
+
+
+def observe(name, value, labels=None):
+    """Ajoute une mesure (en millisecondes) à un histogramme"""
+    store = get_store()
+    store.add(_entry_key(name, labels, bisect_left(BUCKET_BOUNDS, value)), 1)
+    store.add(_entry_key(name, labels, 'sum'), value)
+    store.add(_entry_key(name, labels, 'count'), 1)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _archive_dead(kind):
+    """Reporte dans l'archive les fichiers des processus terminés, puis les supprime"""
+    archive = None
+    try:
+        for pid, path in process_files(kind).items():
+            if pid == os.getpid() or _pid_alive(pid):
+                continue
+            try:
+                handle = open(path, 'rb')
+            except FileNotFoundError:
+                continue
+            with handle:
+                try:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Repris par un processus vivant (PID réutilisé) ou archivé par un autre lecteur
+                    continue
+                if not os.fstat(handle.fileno()).st_nlink:
+                    continue
+                data = handle.read()
+                if kind == 'live' and len(data) >= _HEADER.size:
+                    if archive is None:
+                        # Le verrou de l'archive sérialise les lecteurs qui archivent en même temps
+                        archive = MmapStore(os.path.join(metrics_dir(), f'archive_{kind}.db'))
+                    for key, value, _ in _read_entries(data):
+                        archive.add(key, value)
+                # Les jauges d'un processus terminé ne comptent plus : le fichier est simplement supprimé
+                os.unlink(path)
+    finally:
+        if archive is not None:
+            archive.close()
+
+
+def process_files(kind='live', live_only=False):
+    """{pid: chemin} des fichiers de métriques, éventuellement limités aux processus vivants"""
+    files = {}
+    for path in glob.glob(os.path.join(metrics_dir(), f'{kind}_*.db')):
+        pid = int(os.path.basename(path)[len(kind) + 1:-3])
+        if not live_only or _pid_alive(pid):
+            files[pid] = path
+    return files
+
+
+def collect(kind='live', live_only=False):
+    """Additionne les fichiers des processus (et l'archive des processus terminés) : {(nom, labels, suffixe): valeur}"""
+    _archive_dead(kind)
+    paths = list(process_files(kind, live_only).values())
+    if not live_only:
+        paths.append(os.path.join(metrics_dir(), f'archive_{kind}.db'))
+    totals = {}
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            continue
+        if len(data) < _HEADER.size:
+            continue
+        for key, value, _ in _read_entries(data):
+            name, labels, suffix = json.loads(key)
+            identity = (name, tuple(tuple(pair) for pair in labels), suffix)
+            totals[identity] = totals.get(identity, 0.0) + value
+    return totals
+
+
+def bucket_upper_bound(index):
+    return BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else float('inf')
+
+
+def percentile_from_buckets(buckets, count, p):
+    """Borne supérieure de la classe contenant le p-ième percentile"""
+    if not count:
+        return 0.0
+    rank = p / 100 * count
+    seen = 0
+    for index in sorted(buckets):
+        seen += buckets[index]
+        if seen >= rank:
+            return bucket_upper_bound(index)
+    return bucket_upper_bound(max(buckets))
+
+
+def histograms(name, totals=None):
+    """Histogrammes agrégés d'une métrique, par jeu de labels"""
+    totals = collect() if totals is None else totals
+    series = {}
+    for (metric, labels, suffix), value in totals.items():
+        if metric != name:
+            continue
+        entry = series.setdefault(labels, {'labels': dict(labels), 'buckets': {}, 'count': 0, 'sum': 0.0})
+        if suffix == 'count':
+            entry['count'] = int(value)
+        elif suffix == 'sum':
+            entry['sum'] = value
+        else:
+            entry['buckets'][suffix] = int(value)
+    for entry in series.values():
+        count = entry['count']
+        entry['mean'] = entry['sum'] / count if count else 0.0
+        for p in (50, 90, 99):
+            entry[f'p{p}'] = percentile_from_buckets(entry['buckets'], count, p)
+    return list(series.values())
@@ -0,0 +1,267 @@
+"""
+Profileur statistique par échantillonnage.
+
+Un thread par worker relève les piles de tous les threads
+(sys._current_frames) PROFILER_HZ fois par seconde. Chaque pile est
+rattachée à la vue en cours : on y cherche le code d'une vue déclarée dans
+les URLs (décorateurs retirés). Les piles sans vue mais passant par le
+gestionnaire de requêtes Django sont classées « <hors vue> » (middlewares),
+les autres (threads au repos) sont ignorées.
+
+Les piles repliées (« a;b;c ») sont comptées en mémoire puis écrites toutes
+les quelques secondes dans METRICS_DIR/profiles/<pid>.json, que le
+dashboard fusionne et exporte au format speedscope ou flamegraph.
+
+L'activation passe par le cache (clé CONFIG_KEY) : chaque worker relit la
+configuration au plus une fois par seconde, au début d'une requête.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+CONFIG_KEY = 'profiler:config'
+CHECK_INTERVAL = 1.0
+FLUSH_INTERVAL = 5.0
+MAX_DEPTH = 128
+OUTSIDE_VIEW = '<hors vue>'
+
+_state = {'checked_at': 0.0, 'generation': None}
+# Piles comptées par ce worker, conservées entre deux activations
+_profile = {'stacks': Counter(), 'samples': 0}
+_sampler = None
+_lock = threading.Lock()
+_view_codes = None
+_labels = {}
+
+
+def profiles_dir():
+    directory = os.path.join(settings.METRICS_DIR, 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def get_config():
+    return cache.get(CONFIG_KEY) or {'enabled': False, 'pids': None, 'generation': 0}
+
+
+def set_config(enabled, pids=None):
+    """Active ou arrête l'échantillonnage, pour tous les workers (pids=None) ou certains"""
+    config = get_config()
+    config.update(enabled=enabled, pids=list(pids) if pids else None)
+    cache.set(CONFIG_KEY, config, None)
+    return config
+
+
+def reset():
+    """Efface les profils enregistrés ; les workers repartent de zéro"""
+    config = get_config()
+    config['generation'] = config.get('generation', 0) + 1
+    cache.set(CONFIG_KEY, config, None)
+    for name in os.listdir(profiles_dir()):
+        if name.endswith('.json'):
+            try:
+                os.remove(os.path.join(profiles_dir(), name))
+            except OSError:
+                pass
+
+
+def _collect_view_codes():
+    """{code de la fonction de vue: nom d'URL} pour toutes les routes du projet"""
+    from django.urls import URLPattern, URLResolver, get_resolver
+
+    codes = {}
+
+    def walk(patterns, namespace):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns, f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace)
+            elif isinstance(pattern, URLPattern):
+                func = pattern.callback
+                while hasattr(func, '__wrapped__'):
+                    func = func.__wrapped__
+                code = getattr(func, '__code__', None)
+                if code is not None:
+                    codes.setdefault(code, f'{namespace}{pattern.name}' if pattern.name else func.__qualname__)
+
+    walk(get_resolver().url_patterns, '')
+    return codes
+
+
+def _label(code):
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        if filename.startswith(str(settings.BASE_DIR)):
+            filename = os.path.relpath(filename, settings.BASE_DIR)
+        else:
+            # Chemins des bibliothèques raccourcis à partir du paquet
+            marker = filename.rfind('site-packages' + os.sep)
+            if marker >= 0:
+                filename = filename[marker + len('site-packages') + 1:]
+        label = _labels[code] = f'{code.co_name} ({filename}:{code.co_firstlineno})'
+    return label
+
+
+class Sampler(threading.Thread):
+
+    def __init__(self, hz):
+        super().__init__(name='profiler', daemon=True)
+        self.interval = 1.0 / hz
+        self.running = True
+
+    def sample(self):
+        own = threading.get_ident()
+        view_codes = _view_codes
+        stacks = _profile['stacks']
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            codes = []
+            view = None
+            in_handler = False
+            while frame is not None and len(codes) < MAX_DEPTH:
+                code = frame.f_code
+                codes.append(code)
+                if view is None and code in view_codes:
+                    view = view_codes[code]
+                if not in_handler and code.co_filename.endswith(os.path.join('django', 'core', 'handlers', 'base.py')):
+                    in_handler = True
+                frame = frame.f_back
+            if view is None:
+                if not in_handler:
+                    continue
+                view = OUTSIDE_VIEW
+            stack = ';'.join(_label(code) for code in reversed(codes))
+            stacks[(view, stack)] += 1
+            _profile['samples'] += 1
+
+    def flush(self):
+        data = {
+            'pid': os.getpid(),
+            'generation': _state['generation'],
+            'hz': round(1 / self.interval),
+            'samples': _profile['samples'],
+            'updated_at': time.time(),
+            'stacks': [[view, stack, count] for (view, stack), count in list(_profile['stacks'].items())],
+        }
+        path = os.path.join(profiles_dir(), f'{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(path + '.tmp', path)
+
+    def run(self):
+        next_flush = time.monotonic() + FLUSH_INTERVAL
+        while self.running:
+            started = time.monotonic()
+            self.sample()
+            if started >= next_flush:
+                self.flush()
+                next_flush = started + FLUSH_INTERVAL
+            time.sleep(max(self.interval - (time.monotonic() - started), 0))
+        self.flush()
+
+
+def is_running():
+    return _sampler is not None and _sampler.is_alive()
+
+
+def apply_config(**kwargs):
+    """Démarre ou arrête le thread selon la configuration (connecté à request_started)"""
+    global _sampler, _view_codes
+    now = time.monotonic()
+    if now - _state['checked_at'] < CHECK_INTERVAL:
+        return
+    _state['checked_at'] = now
+    config = get_config()
+    wanted = config['enabled'] and (not config.get('pids') or os.getpid() in config['pids'])
+
+    with _lock:
+        if _state['generation'] != config.get('generation'):
+            _profile['stacks'] = Counter()
+            _profile['samples'] = 0
+        _state['generation'] = config.get('generation')
+        if wanted and not is_running():
+            if _view_codes is None:
+                _view_codes = _collect_view_codes()
+            _sampler = Sampler(settings.PROFILER_HZ)
+            _sampler.start()
+        elif not wanted and is_running():
+            _sampler.running = False
+            _sampler = None
+
+
+def load_profiles():
+    """Fusionne les profils de tous les workers : (Counter {(vue, pile): n}, infos par worker)"""
+    stacks = Counter()
+    workers = []
+    generation = get_config().get('generation')
+    directory = profiles_dir()
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if data.get('generation') != generation:
+            # Écrit avant la dernière remise à zéro
+            continue
+        workers.append({key: data[key] for key in ('pid', 'hz', 'samples', 'updated_at')})
+        for view, stack, count in data['stacks']:
+            stacks[(view, stack)] += count
+    return stacks, workers
+
+
+def to_folded(stacks, view=None):
+    """Format « piles repliées » de flamegraph.pl / inferno"""
+    lines = [
+        f'{name};{stack} {count}' for (name, stack), count in sorted(stacks.items())
+        if view is None or name == view
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def to_speedscope(stacks, hz, view=None):
+    """Document speedscope : un profil échantillonné par vue, poids en millisecondes"""
+    frames, frame_index = [], {}
+    profiles = {}
+    for (name, stack), count in sorted(stacks.items()):
+        if view is not None and name != view:
+            continue
+        indexes = []
+        for label in stack.split(';'):
+            if label not in frame_index:
+                frame_index[label] = len(frames)
+                function, _, location = label.partition(' (')
+                file, _, line = location.rstrip(')').rpartition(':')
+                frames.append({'name': function, 'file': file, 'line': int(line) if line.isdigit() else None})
+            indexes.append(frame_index[label])
+        profile = profiles.setdefault(name, {'samples': [], 'weights': []})
+        profile['samples'].append(indexes)
+        profile['weights'].append(count * 1000 / hz)
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': 'globaltit',
+        'exporter': 'globaltit_site.profiler',
+        'activeProfileIndex': 0,
+        'shared': {'frames': frames},
+        'profiles': [
+            {
+                'type': 'sampled',
+                'name': name,
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': sum(profile['weights']),
+                'samples': profile['samples'],
+                'weights': profile['weights'],
+            }
+            for name, profile in sorted(profiles.items(), key=lambda item: -sum(item[1]['weights']))
+        ],
+    }
@@ -0,0 +1,219 @@
+"""
+Dernières requêtes de chaque worker, dans un tampon circulaire mappé en
+mémoire (METRICS_DIR/ring_<pid>.db), pour le panneau « Performances » du
+dashboard.
+
+Chaque worker n'écrit que dans son fichier : PERF_RING_SIZE emplacements de
+taille fixe, le plus ancien étant écrasé. Un emplacement commence par un
+numéro de séquence mis à 0 pendant l'écriture puis au rang de la requête
+(seqlock) : un lecteur qui voit le même numéro non nul avant et après la
+lecture a un enregistrement complet.
+
+summary() relit les fichiers de tous les workers (y compris ceux recyclés
+récemment) et calcule, sur la fenêtre demandée, les percentiles exacts par
+vue, le nombre de requêtes SQL, le taux de succès du cache, les requêtes
+les plus lentes et la mémoire des workers vivants.
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+
+import psutil
+from django.conf import settings
+
+from . import metrics
+
+_HEADER = struct.Struct('<iiq')  # version, capacité, rang de la prochaine écriture
+_SEQUENCE = struct.Struct('<q')
+_RECORD = struct.Struct('<qdfffIIIH8s80s160s')
+VERSION = 1
+
+_rings = {}
+_rings_lock = threading.Lock()
+
+
+def _text(value, size):
+    return value.encode('utf-8')[:size]
+
+
+def _decode(value):
+    return value.rstrip(b'\0').decode('utf-8', 'replace')
+
+
+class Ring:
+    """Tampon circulaire d'un processus : un écrivain, lecteurs quelconques"""
+
+    def __init__(self, path, capacity):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._file = open(path, 'w+b')
+        self._file.truncate(_HEADER.size + capacity * _RECORD.size)
+        self._map = mmap.mmap(self._file.fileno(), _HEADER.size + capacity * _RECORD.size)
+        self._next = 0
+        _HEADER.pack_into(self._map, 0, VERSION, capacity, 0)
+
+    def append(self, timestamp, duration_ms, sql_ms, template_ms, sql_count, cache_hits, cache_misses, status,
+               method, view, path):
+        with self._lock:
+            rank = self._next
+            position = _HEADER.size + (rank % self.capacity) * _RECORD.size
+            _SEQUENCE.pack_into(self._map, position, 0)
+            _RECORD.pack_into(
+                self._map, position, 0, timestamp, duration_ms, sql_ms, template_ms, sql_count, cache_hits,
+                cache_misses, status, _text(method, 8), _text(view, 80), _text(path, 160),
+            )
+            _SEQUENCE.pack_into(self._map, position, rank + 1)
+            self._next = rank + 1
+            _HEADER.pack_into(self._map, 0, VERSION, self.capacity, self._next)
+
+
+def get_ring():
+    """Tampon du processus courant (un nouveau fichier après un fork)"""
+    pid = os.getpid()
+    ring = _rings.get(pid)
+    if ring is None:
+        with _rings_lock:
+            ring = _rings.get(pid)
+            if ring is None:
+                path = os.path.join(metrics.metrics_dir(), f'ring_{pid}.db')
+                ring = _rings[pid] = Ring(path, settings.PERF_RING_SIZE)
+    return ring
+
+
+def record(request, response, stats, total_ms, view):
+    """Ajoute la requête terminée au tampon du worker (appelé par TimingMiddleware)"""
+    get_ring().append(
+        time.time(), total_ms, stats.sql_time * 1000, stats.template_time * 1000, stats.sql_count,
+        stats.cache_hits, stats.cache_misses, response.status_code, request.method, view, request.path,
+    )
+
+
+def read(path, since=0.0):
+    """Enregistrements complets d'un fichier de tampon, postérieurs à `since`"""
+    records = []
+    try:
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return records
+    with data:
+        if len(data) < _HEADER.size:
+            return records
+        version, capacity, _ = _HEADER.unpack_from(data, 0)
+        if version != VERSION or len(data) < _HEADER.size + capacity * _RECORD.size:
+            return records
+        for slot in range(capacity):
+            position = _HEADER.size + slot * _RECORD.size
+            values = _RECORD.unpack_from(data, position)
+            rank = values[0]
+            if rank <= 0 or _SEQUENCE.unpack_from(data, position)[0] != rank or values[1] < since:
+                continue
+            records.append({
+                'rank': rank,
+                'timestamp': values[1],
+                'duration_ms': values[2],
+                'sql_ms': values[3],
+                'template_ms': values[4],
+                'sql_count': values[5],
+                'cache_hits': values[6],
+                'cache_misses': values[7],
+                'status': values[8],
+                'method': _decode(values[9]),
+                'view': _decode(values[10]),
+                'path': _decode(values[11]),
+            })
+    return records
+
+
+def percentile(sorted_values, p):
+    """Percentile par rang le plus proche d'une liste triée"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(-(-p * len(sorted_values) // 100)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _aggregate(records, window):
+    durations = sorted(entry['duration_ms'] for entry in records)
+    count = len(records)
+    hits = sum(entry['cache_hits'] for entry in records)
+    lookups = hits + sum(entry['cache_misses'] for entry in records)
+    return {
+        'count': count,
+        'rate': count / window if window else 0.0,
+        'p50': percentile(durations, 50),
+        'p95': percentile(durations, 95),
+        'p99': percentile(durations, 99),
+        'max': durations[-1] if durations else 0.0,
+        'mean': sum(durations) / count if count else 0.0,
+        'queries_mean': sum(entry['sql_count'] for entry in records) / count if count else 0.0,
+        'queries_max': max((entry['sql_count'] for entry in records), default=0),
+        'sql_ms_mean': sum(entry['sql_ms'] for entry in records) / count if count else 0.0,
+        'cache_lookups': lookups,
+        'cache_hit_ratio': hits / lookups if lookups else None,
+        'errors': sum(1 for entry in records if entry['status'] >= 500),
+    }
+
+
+def _worker(pid, records, alive):
+    worker = {
+        'pid': pid,
+        'alive': alive,
+        'requests': len(records),
+        'last_request': max((entry['timestamp'] for entry in records), default=None),
+        'rss': None,
+        'memory_percent': None,
+        'threads': None,
+        'started': None,
+    }
+    if alive:
+        try:
+            process = psutil.Process(pid)
+            with process.oneshot():
+                worker['rss'] = process.memory_info().rss
+                worker['memory_percent'] = process.memory_percent()
+                worker['threads'] = process.num_threads()
+                worker['started'] = process.create_time()
+        except psutil.Error:
+            worker['alive'] = False
+    return worker
+
+
+def summary(window, slowest=20):
+    """Synthèse des `window` dernières secondes, tous workers confondus"""
+    now = time.time()
+    since = now - window
+    live = metrics.process_files('ring', live_only=True)
+    records, workers = [], []
+    for pid, path in sorted(metrics.process_files('ring').items()):
+        entries = read(path, since)
+        alive = pid in live
+        if not alive and not entries:
+            # Worker recyclé sans requête dans la fenêtre : son tampon n'apporte plus rien
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        for entry in entries:
+            entry['pid'] = pid
+        records += entries
+        workers.append(_worker(pid, entries, alive))
+
+    by_view = {}
+    for entry in records:
+        by_view.setdefault(entry['view'], []).append(entry)
+    views = [{'view': view, **_aggregate(entries, window)} for view, entries in by_view.items()]
+    views.sort(key=lambda view: view['p95'] * view['count'], reverse=True)
+
+    return {
+        'generated_at': now,
+        'window': window,
+        'total': _aggregate(records, window),
+        'views': views,
+        'slowest': sorted(records, key=lambda entry: entry['duration_ms'], reverse=True)[:slowest],
+        'workers': workers,
+        'capacity': settings.PERF_RING_SIZE,
+    }
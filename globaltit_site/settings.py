@@ -4,6 +4,7 @@ Django settings for globaltit_site project.
 
 from pathlib import Path
 import os
+import tempfile
 from decouple import Config, RepositoryEnv
 import dj_database_url
 
@@ -48,11 +49,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'globaltit_site.timing.TimingMiddleware',
+    'globaltit_site.tracing.TracingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'globaltit_site.uploads.UploadErrorMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'dashboard.request_profiler.RequestProfilerMiddleware',
+    'globaltit_site.db.router.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -78,15 +84,36 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'globaltit_site.wsgi.application'
+ASGI_APPLICATION = 'globaltit_site.asgi.application'
+
+# Vues publiques asynchrones (à activer avec le profil gunicorn_asgi.conf.py)
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
 
 # Database Configuration
 # Priorité à DATABASE_URL si disponible (Render), sinon SQLite pour le développement local
 database_url = os.environ.get('DATABASE_URL') or config('DATABASE_URL', default=None)
 if database_url:
     # Configuration PostgreSQL pour Render
+    # Connexions persistantes (évite la poignée de main TLS à chaque requête),
+    # vérifiées avant réutilisation après une erreur ou une longue inactivité
     DATABASES = {
-        'default': dj_database_url.parse(database_url)
+        'default': dj_database_url.parse(
+            database_url,
+            conn_max_age=config('DB_CONN_MAX_AGE', default=600, cast=int),
+            conn_health_checks=True,
+        )
     }
+    # Pool de connexions par worker (utile en ASGI, où plusieurs threads interrogent la base)
+    if config('DB_POOL', default=False, cast=bool) and DATABASES['default']['ENGINE'].endswith('postgresql'):
+        DATABASES['default'].update({
+            'ENGINE': 'globaltit_site.db.pooled',
+            'CONN_MAX_AGE': 0,
+            'POOL': {
+                'MIN_SIZE': config('DB_POOL_MIN_SIZE', default=1, cast=int),
+                'MAX_SIZE': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+                'TIMEOUT': config('DB_POOL_TIMEOUT', default=10, cast=float),
+            },
+        })
 else:
     # Configuration SQLite pour le développement local
     DATABASES = {
@@ -96,6 +123,181 @@ else:
         }
     }
 
+# Réplicas en lecture (URLs séparées par des virgules) pour les pages publiques
+# et les listes du tableau de bord, voir globaltit_site/db/router.py
+DATABASE_REPLICAS = []
+for index, replica_url in enumerate(config('DATABASE_REPLICA_URLS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()]), start=1):
+    replica = dj_database_url.parse(
+        replica_url,
+        conn_max_age=DATABASES['default'].get('CONN_MAX_AGE', 0),
+        conn_health_checks=True,
+    )
+    if 'POOL' in DATABASES['default'] and replica['ENGINE'].endswith('postgresql'):
+        replica.update(ENGINE='globaltit_site.db.pooled', CONN_MAX_AGE=0, POOL=DATABASES['default']['POOL'])
+    replica['TEST'] = {'MIRROR': 'default'}
+    DATABASES[f'replica_{index}'] = replica
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['globaltit_site.db.router.ReplicaRouter']
+
+# Retard maximal toléré (s), durée d'épinglage après une écriture (s), fréquence de vérification (s)
+REPLICA_MAX_LAG = config('REPLICA_MAX_LAG', default=5, cast=float)
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=10, cast=float)
+REPLICA_HEALTH_INTERVAL = config('REPLICA_HEALTH_INTERVAL', default=5, cast=float)
+
+# Vues dont les lectures peuvent partir sur un réplica
+REPLICA_READ_VIEWS = {
+    'home', 'services', 'service_detail', 'formations', 'formation_detail',
+    'about', 'partners', 'job_offers', 'job_offer_detail',
+    'dashboard:home', 'dashboard:image_manager', 'dashboard:carousel_manager',
+    'dashboard:about_manager', 'dashboard:content_manager', 'dashboard:activity_log',
+    'dashboard:partner_manager', 'dashboard:brand_manager', 'dashboard:file_manager',
+    'dashboard:customer_reviews_manager', 'dashboard:recruitment_manager',
+    'dashboard:request_manager',
+}
+
+# Mesure des requêtes (globaltit_site/timing.py) : en-tête Server-Timing et
+# histogrammes par vue partagés entre workers dans METRICS_DIR. L'en-tête
+# expose les temps SQL à tout visiteur : actif par défaut en DEBUG seulement
+SERVER_TIMING = config('SERVER_TIMING', default=DEBUG, cast=bool)
+METRICS_DIR = config('METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'globaltit-metrics'))
+
+# Panneau « Performances » : dernières requêtes de chaque worker (0 désactive)
+PERF_RING_SIZE = config('PERF_RING_SIZE', default=4096, cast=int)
+PERF_PANEL_WINDOWS = [60, 300, 900, 3600]
+
+# Journal des requêtes SQL lentes (page « Requêtes SQL » du dashboard)
+SLOW_QUERY_LOG = config('SLOW_QUERY_LOG', default=True, cast=bool)
+SLOW_QUERY_THRESHOLD_MS = config('SLOW_QUERY_THRESHOLD_MS', default=100, cast=float)
+SLOW_QUERY_MAX_ROWS = config('SLOW_QUERY_MAX_ROWS', default=500, cast=int)
+
+# Profileur par échantillonnage (activé depuis la page « Profileur » du dashboard)
+PROFILER_HZ = config('PROFILER_HZ', default=100, cast=int)
+
+# Traces locales au format OTLP/JSON (fichiers JSONL par worker)
+TRACING = config('TRACING', default=False, cast=bool)
+TRACING_SAMPLE_RATE = config('TRACING_SAMPLE_RATE', default=1.0, cast=float)
+TRACING_DIR = config('TRACING_DIR', default=os.path.join(tempfile.gettempdir(), 'globaltit-traces'))
+TRACING_MAX_BYTES = config('TRACING_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+TRACING_BACKUPS = config('TRACING_BACKUPS', default=5, cast=int)
+TRACING_MAX_SPANS = config('TRACING_MAX_SPANS', default=1000, cast=int)
+TRACING_SERVICE_NAME = config('TRACING_SERVICE_NAME', default='globaltit')
+
+# Profils de requêtes à la demande (jeton signé, page « Profils de requêtes »)
+REQUEST_PROFILE_TOKEN_MAX_AGE = config('REQUEST_PROFILE_TOKEN_MAX_AGE', default=3600, cast=int)
+REQUEST_PROFILE_MAX_ENTRIES = config('REQUEST_PROFILE_MAX_ENTRIES', default=100, cast=int)
+
+# Export /metrics : jeton (Authorization: Bearer) ou adresses autorisées.
+# Aucune adresse par défaut : derrière un proxy sur la même machine, toutes
+# les requêtes arrivent de 127.0.0.1 et l'export deviendrait public
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+
+# Mesure et validation des envois de fichiers pendant la réception
+FILE_UPLOAD_HANDLERS = [
+    'globaltit_site.uploads.MeasuredUploadHandler',
+    'globaltit_site.uploads.ValidatingUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Règles par nom de champ : taille maximale (octets) et types reconnus aux premiers octets
+_IMAGE_UPLOAD = {'max_size': config('UPLOAD_IMAGE_MAX_SIZE', default=10 * 1024 * 1024, cast=int),
+                 'types': ['jpeg', 'png', 'gif', 'webp']}
+_LOGO_UPLOAD = {**_IMAGE_UPLOAD, 'types': [*_IMAGE_UPLOAD['types'], 'svg']}
+UPLOAD_RULES = {
+    'cv': {'max_size': config('UPLOAD_CV_MAX_SIZE', default=5 * 1024 * 1024, cast=int), 'types': ['pdf', 'doc', 'docx']},
+    'image': _IMAGE_UPLOAD,
+    'images': _IMAGE_UPLOAD,
+    'image_file': _IMAGE_UPLOAD,
+    'file': _IMAGE_UPLOAD,
+    'photo': _IMAGE_UPLOAD,
+    'hero_image': _IMAGE_UPLOAD,
+    'about_image': _IMAGE_UPLOAD,
+    'logo': _LOGO_UPLOAD,
+    'favicon': {**_LOGO_UPLOAD, 'types': [*_LOGO_UPLOAD['types'], 'ico']},
+    'import_file': {'max_size': config('UPLOAD_IMPORT_MAX_SIZE', default=40 * 1024 * 1024, cast=int)},
+}
+UPLOAD_DEFAULT_MAX_SIZE = config('UPLOAD_DEFAULT_MAX_SIZE', default=20 * 1024 * 1024, cast=int)
+UPLOAD_MAX_REQUEST_SIZE = config('UPLOAD_MAX_REQUEST_SIZE', default=50 * 1024 * 1024, cast=int)
+
+# Téléchargement des CV (dashboard/cv_download.py) : durée des adresses signées,
+# délégation au proxy ('x-accel-redirect' pour nginx, 'x-sendfile' pour Apache)
+CV_URL_MAX_AGE = config('CV_URL_MAX_AGE', default=600, cast=int)
+CV_DOWNLOAD_OFFLOAD = config('CV_DOWNLOAD_OFFLOAD', default='')
+CV_ACCEL_REDIRECT_PREFIX = config('CV_ACCEL_REDIRECT_PREFIX', default='/protected-media/')
+
+# Indexation du texte des CV (main/cv_index.py) : à l'enregistrement des
+# candidatures, dans un pool de CV_INDEX_PROCESSES processus (0 : dans le thread)
+CV_INDEX_ON_SAVE = config('CV_INDEX_ON_SAVE', default=True, cast=bool)
+CV_INDEX_PROCESSES = config('CV_INDEX_PROCESSES', default=0, cast=int)
+CV_INDEX_MAX_CHARS = config('CV_INDEX_MAX_CHARS', default=20000, cast=int)
+CV_INDEX_FACET_TIMEOUT = config('CV_INDEX_FACET_TIMEOUT', default=300, cast=int)
+
+# Rapprochement candidatures spontanées / offres actives (main/matching.py)
+MATCHING_DIR = config('MATCHING_DIR', default=os.path.join(tempfile.gettempdir(), 'globaltit-matching'))
+MATCHING_TOP_K = config('MATCHING_TOP_K', default=10, cast=int)
+MATCHING_MIN_SCORE = config('MATCHING_MIN_SCORE', default=0.05, cast=float)
+
+# Contenus associés des pages de détail (main/related.py, commande build_related)
+RELATED_ITEMS_COUNT = config('RELATED_ITEMS_COUNT', default=6, cast=int)
+
+# Expiration des offres d'emploi (main/expiry.py, commande expire_job_offers) :
+# nombre d'offres désactivées par UPDATE
+JOB_OFFER_EXPIRY_BATCH_SIZE = config('JOB_OFFER_EXPIRY_BATCH_SIZE', default=500, cast=int)
+
+# Imports CSV / JSON de contenus (dashboard/imports.py) : lignes validées par
+# paquets, images référencées par URL téléchargées par IMPORT_IMAGE_WORKERS threads
+IMPORT_CHUNK_ROWS = config('IMPORT_CHUNK_ROWS', default=200, cast=int)
+IMPORT_IMAGE_WORKERS = config('IMPORT_IMAGE_WORKERS', default=8, cast=int)
+IMPORT_IMAGE_TIMEOUT = config('IMPORT_IMAGE_TIMEOUT', default=10, cast=int)
+IMPORT_MAX_ERRORS = config('IMPORT_MAX_ERRORS', default=200, cast=int)
+
+# Cache
+# L1 : LRU en mémoire de chaque worker, L2 : cache partagé entre workers
+# (redis ou memcached en production, fichiers en développement local)
+REDIS_URL = config('REDIS_URL', default='')
+MEMCACHED_LOCATION = config('MEMCACHED_LOCATION', default='')
+if REDIS_URL:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+elif MEMCACHED_LOCATION:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': MEMCACHED_LOCATION,
+    }
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'globaltit_cache'),
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'globaltit_site.cache.TieredCache',
+        'LOCATION': 'tiered-default',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_MAX_ENTRIES': config('CACHE_L1_MAX_ENTRIES', default=1000, cast=int),
+            'L1_TIMEOUT': config('CACHE_L1_TIMEOUT', default=30, cast=int),
+            # Configuration du profileur : relue chaque seconde par tous les workers
+            'L1_BYPASS': ['profiler:'],
+            # Le cache fichiers est propre à chaque instance : le bus y efface les clés
+            # invalidées depuis une autre machine (tâches planifiées)
+            'L2_SHARED': bool(REDIS_URL or MEMCACHED_LOCATION),
+        },
+    },
+    'shared': SHARED_CACHE,
+}
+
+# Bus d'invalidation des caches locaux (LISTEN/NOTIFY sur PostgreSQL,
+# table InvalidationEvent scrutée sinon)
+INVALIDATION_BUS_ENABLED = config('INVALIDATION_BUS_ENABLED', default=True, cast=bool)
+INVALIDATION_POLL_INTERVAL = 1.0
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -154,7 +356,9 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # Email Configuration
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Les envois passent par un backend instrumenté (file sortante, durées) qui délègue à SMTP
+EMAIL_BACKEND = 'globaltit_site.mail.InstrumentedEmailBackend'
+EMAIL_DELIVERY_BACKEND = config('EMAIL_DELIVERY_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = config('EMAIL_HOST')
 EMAIL_PORT = config('EMAIL_PORT', cast=int)
 EMAIL_USE_TLS = config('EMAIL_USE_TLS', cast=bool)
@@ -173,9 +377,12 @@ CLOUDINARY_STORAGE = {
 # Stockage des fichiers médias (images uploadées)
 if CLOUDINARY_STORAGE['CLOUD_NAME']:
     DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+    # CV en type « authenticated » : pas d'adresse publique res.cloudinary.com
+    CV_STORAGE = config('CV_STORAGE', default='globaltit_site.storage.AuthenticatedCloudinaryStorage')
 else:
     # Fallback pour le développement local
     MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+    CV_STORAGE = config('CV_STORAGE', default='')
 
 # Messages
 from django.contrib.messages import constants as messages
@@ -0,0 +1,85 @@
+"""
+Stockage des CV.
+
+Sur Cloudinary, MediaCloudinaryStorage envoie les fichiers en type
+« upload » : toute personne qui connaît leur adresse res.cloudinary.com
+peut les lire, sans passer par l'application. Les CV sont donc envoyés
+en type « authenticated » par AuthenticatedCloudinaryStorage. Leur adresse
+de livraison n'est valable que signée avec API_SECRET. Le serveur lit les
+fichiers par une adresse signée qui ne quitte jamais le serveur. url()
+renvoie une adresse de téléchargement qui expire après CV_URL_MAX_AGE
+secondes. La vue dashboard:download_cv reste le seul accès des
+utilisateurs.
+
+Sans Cloudinary, les CV restent dans MEDIA_ROOT, dont le dossier cv/ ne
+doit pas être servi publiquement.
+
+Les CV envoyés avant ce stockage sont encore en type « upload ». La
+commande protect_cvs les passe en type « authenticated », ce qui invalide
+leurs anciennes adresses publiques.
+"""
+import os
+import time
+
+import cloudinary.exceptions
+import cloudinary.uploader
+import cloudinary.utils
+from cloudinary_storage.storage import MediaCloudinaryStorage
+from django.conf import settings
+from django.utils.deconstruct import deconstructible
+from django.utils.module_loading import import_string
+
+
+def cv_storage():
+    """Stockage des champs cv : CV_STORAGE, sinon la classe du stockage par défaut"""
+    return import_string(settings.CV_STORAGE or settings.DEFAULT_FILE_STORAGE)()
+
+
+@deconstructible
+class AuthenticatedCloudinaryStorage(MediaCloudinaryStorage):
+    """MediaCloudinaryStorage en type « authenticated » : aucune adresse publique"""
+
+    DELIVERY_TYPE = 'authenticated'
+
+    def _upload(self, name, content):
+        options = {
+            'use_filename': True, 'resource_type': self._get_resource_type(name), 'tags': self.TAG,
+            'type': self.DELIVERY_TYPE,
+        }
+        folder = os.path.dirname(name)
+        if folder:
+            options['folder'] = folder
+        return cloudinary.uploader.upload(content, **options)
+
+    def delete(self, name):
+        response = cloudinary.uploader.destroy(
+            name, invalidate=True, resource_type=self._get_resource_type(name), type=self.DELIVERY_TYPE,
+        )
+        return response['result'] == 'ok'
+
+    def _get_url(self, name):
+        # Adresse signée sans expiration : réservée aux lectures du serveur (open, exists, size)
+        url, _ = cloudinary.utils.cloudinary_url(
+            self._prepend_prefix(name), resource_type=self._get_resource_type(name), type=self.DELIVERY_TYPE,
+            sign_url=True, secure=True,
+        )
+        return url
+
+    def url(self, name):
+        # Adresse de téléchargement qui expire (champ de l'admin, par exemple)
+        return cloudinary.utils.private_download_url(
+            self._prepend_prefix(name), '', resource_type=self._get_resource_type(name), type=self.DELIVERY_TYPE,
+            expires_at=int(time.time()) + settings.CV_URL_MAX_AGE,
+        )
+
+    def protect(self, name):
+        """Passe un fichier envoyé en type « upload » en type « authenticated » ; False s'il ne l'était pas"""
+        public_id = self._prepend_prefix(name)
+        try:
+            cloudinary.uploader.rename(
+                public_id, public_id, resource_type=self._get_resource_type(name),
+                type='upload', to_type=self.DELIVERY_TYPE, invalidate=True,
+            )
+        except cloudinary.exceptions.NotFound:
+            return False
+        return True
@@ -0,0 +1,189 @@
+"""
+Mesure du temps passé par requête : total, SQL, templates et cache.
+
+TimingMiddleware ouvre un RequestStats dans une contextvar (propagée aux
+threads lancés par sync_to_async). Les sondes, installées une fois par
+install(), y ajoutent leurs mesures :
+- SQL : un execute_wrapper ajouté à chaque connexion à sa création ;
+- templates : Template.render enveloppé, seul le rendu de premier niveau
+  est compté (les {% include %} sont inclus dedans) ;
+- cache : TieredCache appelle record_cache().
+
+Si stats.timeline est une liste (profil de requête demandé par le staff),
+chaque requête SQL y est ajoutée avec son instant de départ.
+
+Les requêtes SQL plus lentes que SLOW_QUERY_THRESHOLD_MS sont en plus
+transmises aux écouteurs enregistrés par add_slow_query_listener().
+
+En sortie, la réponse reçoit un en-tête Server-Timing et les mesures sont
+agrégées par nom d'URL dans globaltit_site.metrics ; la requête est aussi
+ajoutée au tampon circulaire du worker (globaltit_site.ring).
+"""
+import contextvars
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics, ring
+
+_current = contextvars.ContextVar('request_stats', default=None)
+_installed = False
+_slow_query_listeners = []
+
+
+class RequestStats:
+    __slots__ = (
+        'request', 'start', 'sql_time', 'sql_count', 'template_time', 'template_depth', 'cache_hits', 'cache_misses',
+        'timeline',
+    )
+
+    def __init__(self, request=None):
+        self.request = request
+        self.start = time.perf_counter()
+        self.sql_time = 0.0
+        self.sql_count = 0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.timeline = None
+
+
+def current():
+    """Mesures de la requête en cours, ou None hors requête"""
+    return _current.get()
+
+
+def record_cache(hit, count=1):
+    stats = _current.get()
+    if stats is not None:
+        if hit:
+            stats.cache_hits += count
+        else:
+            stats.cache_misses += count
+
+
+def add_slow_query_listener(listener):
+    """listener(stats, sql, params, many, duration_ms, connection) est appelé au-delà de SLOW_QUERY_THRESHOLD_MS"""
+    _slow_query_listeners.append(listener)
+
+
+def sql_timer(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        stats.sql_time += duration
+        stats.sql_count += 1
+        if stats.timeline is not None:
+            stats.timeline.append((start - stats.start, duration, sql, many, context['connection'].alias))
+        if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+            for listener in _slow_query_listeners:
+                listener(stats, sql, params, many, duration * 1000, context['connection'])
+
+
+def _add_sql_timer(sender, connection, **kwargs):
+    if sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_timer)
+
+
+def _patch_template_render():
+    from django.template.base import Template
+
+    original = Template.render
+
+    def render(self, context):
+        stats = _current.get()
+        if stats is None:
+            return original(self, context)
+        stats.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            stats.template_depth -= 1
+            if stats.template_depth == 0:
+                stats.template_time += time.perf_counter() - start
+
+    Template.render = render
+
+
+def install():
+    """Installe les sondes SQL et templates (appelé depuis MainConfig.ready)"""
+    global _installed
+    if _installed:
+        return
+    from django.db.backends.signals import connection_created
+
+    connection_created.connect(_add_sql_timer, dispatch_uid='timing_sql')
+    _patch_template_render()
+    _installed = True
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else '<non résolue>'
+
+
+class TimingMiddleware:
+    """À placer en tête de MIDDLEWARE pour mesurer la requête entière"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = RequestStats(request)
+        _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.set(None)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats(request)
+        _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.set(None)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        total = (time.perf_counter() - stats.start) * 1000
+        sql = stats.sql_time * 1000
+        template = stats.template_time * 1000
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'total;dur={total:.1f}, '
+                f'db;dur={sql:.1f};desc="{stats.sql_count} queries", '
+                f'tpl;dur={template:.1f}, '
+                f'cache;desc="hits={stats.cache_hits} misses={stats.cache_misses}"'
+            )
+        view = view_label(request)
+        labels = {'view': view}
+        metrics.observe('request_duration_ms', total, labels)
+        metrics.inc('requests_total', {**labels, 'status': f'{response.status_code // 100}xx'})
+        if stats.sql_count:
+            metrics.inc('db_queries_total', labels, stats.sql_count)
+            metrics.inc('db_time_ms_total', labels, sql)
+        if template:
+            metrics.inc('template_time_ms_total', labels, template)
+        if stats.cache_hits:
+            metrics.inc('cache_hits_total', labels, stats.cache_hits)
+        if stats.cache_misses:
+            metrics.inc('cache_misses_total', labels, stats.cache_misses)
+        if settings.PERF_RING_SIZE:
+            ring.record(request, response, stats, total, view)
+        return response
@@ -0,0 +1,389 @@
+"""
+Traces locales au format OTLP/JSON.
+
+Un span est ouvert par span() (gestionnaire de contexte ou décorateur) et
+rattaché au span courant, conservé dans une contextvar (propagée aux
+threads de sync_to_async). Sont instrumentés :
+- les requêtes HTTP (TracingMiddleware, qui reprend un en-tête traceparent) ;
+- les requêtes SQL (execute_wrapper, uniquement à l'intérieur d'une trace) ;
+- default_storage.save() et delete() ;
+- les envois d'e-mails (globaltit_site.mail) ;
+- les tâches de fond qui s'enveloppent dans span().
+
+Quand le span racine d'un processus se termine, la trace est écrite sur une
+ligne de TRACING_DIR/spans-<pid>.jsonl, au format d'une requête
+ExportTraceServiceRequest OTLP (celui de l'exportateur « file » du
+collecteur OpenTelemetry). Le fichier tourne au-delà de TRACING_MAX_BYTES
+et TRACING_BACKUPS anciens fichiers sont conservés.
+
+Désactivé (TRACING=False), span() se réduit à une lecture de la contextvar.
+"""
+import contextvars
+import functools
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .timing import view_label
+
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_OK, STATUS_ERROR = 1, 2
+MAX_STATEMENT = 2000
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+# Marqueur d'une trace non échantillonnée : ses enfants ne sont pas créés
+_UNSAMPLED = object()
+_current = contextvars.ContextVar('tracing_span', default=None)
+_installed = False
+
+
+class _Trace:
+    """Spans terminés d'une même trace dans ce processus"""
+    __slots__ = ('spans', 'exported', 'dropped')
+
+    def __init__(self):
+        self.spans = []
+        self.exported = False
+        self.dropped = 0
+
+
+class Span:
+    __slots__ = (
+        'trace', 'trace_id', 'span_id', 'parent_id', 'is_root', 'name', 'kind', 'start', 'end', 'attributes',
+        'status', 'message',
+    )
+
+    def __init__(self, name, kind, parent=None, trace_id=None, parent_id=''):
+        # Racine locale : sa fin déclenche l'écriture de la trace
+        self.is_root = parent is None
+        self.trace = parent.trace if parent is not None else _Trace()
+        self.trace_id = parent.trace_id if parent is not None else trace_id or f'{random.getrandbits(128):032x}'
+        self.span_id = f'{random.getrandbits(64):016x}'
+        self.parent_id = parent.span_id if parent is not None else parent_id
+        self.name = name
+        self.kind = kind
+        self.start = time.time_ns()
+        self.end = None
+        self.attributes = {}
+        self.status = STATUS_OK
+        self.message = ''
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def error(self, exc):
+        self.status = STATUS_ERROR
+        self.message = f'{type(exc).__name__}: {exc}'
+
+    def to_otlp(self):
+        data = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start),
+            'endTimeUnixNano': str(self.end),
+            'attributes': _attributes(self.attributes),
+            'status': {'code': self.status},
+        }
+        if self.message:
+            data['status']['message'] = self.message
+        return data
+
+
+def _value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _attributes(attributes):
+    return [{'key': key, 'value': _value(value)} for key, value in attributes.items() if value is not None]
+
+
+class _Exporter:
+    """Écriture des traces dans un fichier JSONL par processus, avec rotation"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.file = None
+        self.pid = None
+
+    def path(self):
+        return os.path.join(settings.TRACING_DIR, f'spans-{os.getpid()}.jsonl')
+
+    def _open(self):
+        os.makedirs(settings.TRACING_DIR, exist_ok=True)
+        self.file = open(self.path(), 'a', encoding='utf-8')
+        self.pid = os.getpid()
+
+    def _rotate(self):
+        self.file.close()
+        path = self.path()
+        for index in range(settings.TRACING_BACKUPS - 1, 0, -1):
+            if os.path.exists(f'{path}.{index}'):
+                os.replace(f'{path}.{index}', f'{path}.{index + 1}')
+        if settings.TRACING_BACKUPS:
+            os.replace(path, f'{path}.1')
+        else:
+            os.remove(path)
+        self._open()
+
+    def write(self, spans):
+        line = json.dumps({
+            'resourceSpans': [{
+                'resource': {'attributes': _attributes({
+                    'service.name': settings.TRACING_SERVICE_NAME,
+                    'process.pid': os.getpid(),
+                })},
+                'scopeSpans': [{
+                    'scope': {'name': __name__},
+                    'spans': [span.to_otlp() for span in spans],
+                }],
+            }],
+        }, separators=(',', ':'))
+        with self.lock:
+            if self.file is None or self.pid != os.getpid():
+                self._open()
+            self.file.write(line + '\n')
+            self.file.flush()
+            if self.file.tell() >= settings.TRACING_MAX_BYTES:
+                self._rotate()
+
+
+_exporter = _Exporter()
+
+
+def current_span():
+    """Span en cours, ou None hors trace"""
+    span = _current.get()
+    return span if isinstance(span, Span) else None
+
+
+def start_span(name, kind=KIND_INTERNAL, attributes=None, new_trace=True, traceparent=None):
+    """
+    Ouvre un span enfant du span courant, ou une nouvelle trace si
+    new_trace est vrai (décision d'échantillonnage TRACING_SAMPLE_RATE).
+    Renvoie (span ou None, jeton de la contextvar) pour end_span().
+    """
+    parent = _current.get()
+    if parent is _UNSAMPLED or (parent is None and not (new_trace and settings.TRACING)):
+        return None, None
+    if parent is not None:
+        if len(parent.trace.spans) >= settings.TRACING_MAX_SPANS:
+            parent.trace.dropped += 1
+            return None, None
+        span = Span(name, kind, parent)
+    else:
+        trace_id, parent_id, sampled = None, '', None
+        match = _TRACEPARENT.match(traceparent or '')
+        if match:
+            trace_id, parent_id, flags = match.groups()
+            sampled = bool(int(flags, 16) & 1)
+        if sampled is None:
+            sampled = random.random() < settings.TRACING_SAMPLE_RATE
+        if not sampled:
+            return None, _current.set(_UNSAMPLED)
+        span = Span(name, kind, trace_id=trace_id, parent_id=parent_id)
+    if attributes:
+        span.attributes.update(attributes)
+    return span, _current.set(span)
+
+
+def end_span(span, token):
+    if token is not None:
+        _current.reset(token)
+    if span is None:
+        return
+    span.end = time.time_ns()
+    trace = span.trace
+    trace.spans.append(span)
+    if span.is_root or trace.exported:
+        if trace.dropped:
+            span.set('tracing.dropped_spans', trace.dropped)
+        spans, trace.spans = trace.spans, []
+        trace.exported = True
+        _exporter.write(spans)
+
+
+class span:
+    """
+    with span('nom', attribut=valeur) as s: ... ou @span('nom')
+    s vaut None si la requête n'est pas tracée.
+    """
+
+    def __init__(self, name, kind=KIND_INTERNAL, new_trace=True, **attributes):
+        self.name = name
+        self.kind = kind
+        self.new_trace = new_trace
+        self.attributes = attributes
+        self._stack = []
+
+    def __enter__(self):
+        current, token = start_span(self.name, self.kind, self.attributes, self.new_trace)
+        self._stack.append((current, token))
+        return current
+
+    def __exit__(self, exc_type, exc, tb):
+        current, token = self._stack.pop()
+        if current is not None and exc is not None:
+            current.error(exc)
+        end_span(current, token)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(self.name, self.kind, self.new_trace, **self.attributes):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def load_traces():
+    """Spans de tous les fichiers de TRACING_DIR, regroupés par trace : {trace_id: [span OTLP]}"""
+    traces = {}
+    if not os.path.isdir(settings.TRACING_DIR):
+        return traces
+    for name in sorted(os.listdir(settings.TRACING_DIR)):
+        if not name.startswith('spans-'):
+            continue
+        with open(os.path.join(settings.TRACING_DIR, name), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    continue
+                for resource in data.get('resourceSpans', []):
+                    for scope in resource.get('scopeSpans', []):
+                        for item in scope.get('spans', []):
+                            traces.setdefault(item['traceId'], []).append(item)
+    return traces
+
+
+def sql_tracer(execute, sql, params, many, context):
+    parent = _current.get()
+    if parent is None or parent is _UNSAMPLED:
+        return execute(sql, params, many, context)
+    connection = context['connection']
+    with span(sql.lstrip().split(' ', 1)[0].upper(), KIND_CLIENT, new_trace=False, **{
+        'db.system': connection.vendor,
+        'db.name': connection.alias,
+        'db.statement': sql[:MAX_STATEMENT],
+        'db.executemany': many or None,
+    }):
+        return execute(sql, params, many, context)
+
+
+def _add_sql_tracer(sender, connection, **kwargs):
+    if sql_tracer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_tracer)
+
+
+def _patch_storage():
+    """Enveloppe save() et delete() de la classe du stockage par défaut"""
+    from django.core.files.storage import default_storage
+
+    storage_class = default_storage.__class__
+
+    def wrap(method_name):
+        original = getattr(storage_class, method_name)
+
+        @functools.wraps(original)
+        def method(self, name, *args, **kwargs):
+            if _current.get() is None and not settings.TRACING:
+                return original(self, name, *args, **kwargs)
+            with span(f'storage.{method_name}', KIND_CLIENT, **{
+                'storage.backend': storage_class.__name__,
+                'storage.name': str(name),
+            }) as current:
+                result = original(self, name, *args, **kwargs)
+                if current is not None and method_name == 'save':
+                    current.set('storage.saved_name', str(result))
+                return result
+
+        setattr(storage_class, method_name, method)
+
+    wrap('save')
+    wrap('delete')
+
+
+def install():
+    """Installe les sondes SQL et stockage (appelé depuis MainConfig.ready si TRACING)"""
+    global _installed
+    if _installed:
+        return
+    from django.db.backends.signals import connection_created
+
+    connection_created.connect(_add_sql_tracer, dispatch_uid='tracing_sql')
+    _patch_storage()
+    _installed = True
+
+
+class TracingMiddleware:
+    """Span serveur de chaque requête, à placer juste après TimingMiddleware"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def start(self, request):
+        return start_span(f'{request.method} {request.path}', KIND_SERVER, {
+            'http.request.method': request.method,
+            'url.path': request.path,
+        }, traceparent=request.headers.get('traceparent'))
+
+    def finish(self, request, response, current, token):
+        if current is not None:
+            route = view_label(request)
+            current.name = f'{request.method} {route}'
+            current.set('http.route', route)
+            if response is not None:
+                current.set('http.response.status_code', response.status_code)
+                if response.status_code >= 500:
+                    current.status = STATUS_ERROR
+                response['X-Trace-Id'] = current.trace_id
+        end_span(current, token)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        current, token = self.start(request)
+        response = None
+        try:
+            response = self.get_response(request)
+        except Exception as e:
+            if current is not None:
+                current.error(e)
+            raise
+        finally:
+            self.finish(request, response, current, token)
+        return response
+
+    async def __acall__(self, request):
+        current, token = self.start(request)
+        response = None
+        try:
+            response = await self.get_response(request)
+        except Exception as e:
+            if current is not None:
+                current.error(e)
+            raise
+        finally:
+            self.finish(request, response, current, token)
+        return response
@@ -0,0 +1,186 @@
+"""
+Gestionnaires d'envoi de fichiers.
+
+MeasuredUploadHandler, placé en tête de FILE_UPLOAD_HANDLERS, ne stocke
+rien : il mesure la taille de chaque fichier reçu et la durée de réception
+du corps de la requête, puis laisse les gestionnaires suivants faire le
+travail.
+
+ValidatingUploadHandler, placé juste après, applique UPLOAD_RULES pendant
+la réception : taille maximale par champ et type réel du fichier, reconnu
+à ses premiers octets. Un corps annoncé plus gros que
+UPLOAD_MAX_REQUEST_SIZE n'est pas lu du tout ; un fichier refusé arrête la
+lecture (le reste du corps est lu et jeté, sans être mis en mémoire ni sur
+disque). Dans la même passe, il calcule le SHA-256 de chaque fichier,
+disponible ensuite dans l'attribut `sha256` des fichiers de request.FILES.
+
+UploadErrorMiddleware transforme un refus en réponse propre avant la vue :
+JSON (413 ou 415) pour les appels AJAX, sinon message et retour au
+formulaire.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import JsonResponse, QueryDict
+from django.shortcuts import redirect
+from django.template.defaultfilters import filesizeformat
+from django.utils.datastructures import MultiValueDict
+from django.utils.http import url_has_allowed_host_and_scheme
+
+from . import metrics
+from .timing import view_label
+
+# Octets nécessaires pour reconnaître un type
+SNIFF_SIZE = 512
+
+SIGNATURES = {
+    'pdf': (b'%PDF-',),
+    'doc': (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1',),
+    'docx': (b'PK\x03\x04',),
+    'jpeg': (b'\xff\xd8\xff',),
+    'png': (b'\x89PNG\r\n\x1a\n',),
+    'gif': (b'GIF87a', b'GIF89a'),
+    'ico': (b'\x00\x00\x01\x00',),
+}
+
+
+class MeasuredUploadHandler(FileUploadHandler):
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.started = time.perf_counter()
+        self.sizes = []
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sizes.append(0)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sizes[-1] += len(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+    def upload_complete(self):
+        if not self.sizes:
+            return
+        labels = {'view': view_label(self.request)}
+        for size in self.sizes:
+            metrics.observe('upload_size_kb', size / 1024, labels)
+        metrics.observe('upload_duration_ms', (time.perf_counter() - self.started) * 1000, labels)
+
+
+class UploadRejected(StopUpload):
+    """Fichier refusé : StopUpload sans couper la connexion, pour pouvoir répondre"""
+
+    def __init__(self, status, field_name, message):
+        super().__init__(connection_reset=False)
+        self.status = status
+        self.field_name = field_name
+        self.message = message
+
+
+def detect_type(head):
+    """Type reconnu d'après les premiers octets d'un fichier, ou None"""
+    for kind, signatures in SIGNATURES.items():
+        if head.startswith(signatures):
+            return kind
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    text = head.lstrip(b'\xef\xbb\xbf \t\r\n').lower()
+    if text.startswith(b'<svg') or (text.startswith((b'<?xml', b'<!--', b'<!doctype svg')) and b'<svg' in text):
+        return 'svg'
+    return None
+
+
+class ValidatingUploadHandler(FileUploadHandler):
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.hashes = {}
+        if content_length > settings.UPLOAD_MAX_REQUEST_SIZE:
+            # Rien n'est lu : le corps entier est refusé d'après son Content-Length
+            self.request._upload_error = UploadRejected(
+                413, None,
+                f"L'envoi dépasse la taille maximale de {filesizeformat(settings.UPLOAD_MAX_REQUEST_SIZE)}.",
+            )
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.rule = settings.UPLOAD_RULES.get(field_name, {})
+        self.max_size = self.rule.get('max_size', settings.UPLOAD_DEFAULT_MAX_SIZE)
+        self.received = 0
+        self.head = b''
+        self.checked = 'types' not in self.rule
+        self.digest = hashlib.sha256()
+
+    def reject(self, status, message):
+        error = UploadRejected(status, self.field_name, message)
+        self.request._upload_error = error
+        raise error
+
+    def check_type(self):
+        kind = detect_type(self.head)
+        if kind not in self.rule['types']:
+            self.reject(415, f"{self.file_name} : format non accepté ({', '.join(self.rule['types'])}).")
+        self.checked = True
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.reject(413, f"{self.file_name} : la taille du fichier ne doit pas dépasser {filesizeformat(self.max_size)}.")
+        if not self.checked:
+            self.head += raw_data[:SNIFF_SIZE - len(self.head)]
+            if len(self.head) >= SNIFF_SIZE:
+                self.check_type()
+        self.digest.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not self.checked:
+            self.check_type()
+        self.hashes.setdefault(self.field_name, []).append(self.digest.hexdigest())
+        return None
+
+    def upload_complete(self):
+        self.request._upload_hashes = self.hashes
+
+
+class UploadErrorMiddleware:
+    """À placer avant CsrfViewMiddleware : lit le corps et répond à la place de la vue si un envoi est refusé"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method != 'POST' or not request.content_type.startswith('multipart/'):
+            return None
+        request.POST  # Déclenche la lecture du corps par les gestionnaires d'envoi
+        error = getattr(request, '_upload_error', None)
+        if error is not None:
+            return self.rejected(request, error)
+        for field_name, hashes in getattr(request, '_upload_hashes', {}).items():
+            for uploaded, digest in zip(request.FILES.getlist(field_name), hashes):
+                uploaded.sha256 = digest
+        return None
+
+    def rejected(self, request, error):
+        if (
+            request.headers.get('x-requested-with') == 'XMLHttpRequest'
+            or 'application/json' in request.headers.get('accept', '')
+        ):
+            errors = {error.field_name or '__all__': [error.message]}
+            return JsonResponse({'success': False, 'error': error.message, 'errors': errors}, status=error.status)
+        messages.error(request, error.message)
+        # Retour au formulaire d'où vient l'envoi (la vue de réception n'accepte souvent que POST)
+        referer = request.headers.get('referer', '')
+        if url_has_allowed_host_and_scheme(referer, {request.get_host()}, request.is_secure()):
+            return redirect(referer)
+        return redirect(request.get_full_path())
@@ -2,9 +2,10 @@
 URL configuration for globaltit_site project.
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from django.views.defaults import page_not_found
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -13,5 +14,7 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
+    # Les CV ne sont servis que par dashboard:download_cv
+    urlpatterns += [re_path(r'^%scv/' % settings.MEDIA_URL.lstrip('/'), page_not_found, {'exception': None})]
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
@@ -0,0 +1,16 @@
+"""
+Profil gunicorn pour le mode ASGI (workers uvicorn + vues publiques asynchrones).
+
+    gunicorn -c gunicorn_asgi.conf.py globaltit_site.asgi:application
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'uvicorn.workers.UvicornWorker'
+keepalive = 5
+graceful_timeout = 30
+timeout = 60
+
+raw_env = ['ASYNC_VIEWS=True']
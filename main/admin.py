@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.urls import reverse
 from django.utils.html import format_html
 from .models import (Contact, Service, Formation, SiteConfiguration, CarouselImage, 
                      AboutImage, Partner, OffreEmploi, Candidature, CandidatureSpontanee, CustomerReview)
@@ -333,7 +334,7 @@ class CandidatureAdmin(admin.ModelAdmin):
     list_display = ['nom_complet', 'email', 'offre_emploi', 'statut_badge', 'date_candidature']
     list_filter = ['statut', 'date_candidature', 'offre_emploi']
     search_fields = ['nom', 'prenom', 'email', 'motivation']
-    readonly_fields = ['nom', 'prenom', 'email', 'telephone', 'motivation', 'cv', 'cv_link', 'date_candidature', 'date_modification']
+    readonly_fields = ['nom', 'prenom', 'email', 'telephone', 'motivation', 'cv_link', 'date_candidature', 'date_modification']
     
     fieldsets = (
         ('Candidat', {
@@ -343,7 +344,7 @@ class CandidatureAdmin(admin.ModelAdmin):
             'fields': ('offre_emploi',)
         }),
         ('Motivation et CV', {
-            'fields': ('motivation', 'cv', 'cv_link')
+            'fields': ('motivation', 'cv_link')
         }),
         ('Gestion', {
             'fields': ('statut', 'notes_admin')
@@ -376,7 +377,7 @@ class CandidatureAdmin(admin.ModelAdmin):
     
     def cv_link(self, obj):
         if obj.cv:
-            return format_html('<a href="{}" target="_blank" class="button">📄 Télécharger le CV</a>', obj.cv.url)
+            return format_html('<a href="{}" target="_blank" class="button">📄 Télécharger le CV</a>', reverse('dashboard:download_cv', args=[obj.pk, 'normal']))
         return '-'
     cv_link.short_description = 'CV'
     
@@ -401,7 +402,7 @@ class CandidatureSpontaneeAdmin(admin.ModelAdmin):
     list_display = ['nom_complet', 'email', 'poste_souhaite', 'statut_badge', 'date_candidature']
     list_filter = ['statut', 'date_candidature']
     search_fields = ['nom', 'prenom', 'email', 'poste_souhaite', 'motivation']
-    readonly_fields = ['nom', 'prenom', 'email', 'telephone', 'poste_souhaite', 'motivation', 'cv', 'cv_link', 'date_candidature', 'date_modification']
+    readonly_fields = ['nom', 'prenom', 'email', 'telephone', 'poste_souhaite', 'motivation', 'cv_link', 'date_candidature', 'date_modification']
     
     fieldsets = (
         ('Candidat', {
@@ -411,7 +412,7 @@ class CandidatureSpontaneeAdmin(admin.ModelAdmin):
             'fields': ('poste_souhaite',)
         }),
         ('Motivation et CV', {
-            'fields': ('motivation', 'cv', 'cv_link')
+            'fields': ('motivation', 'cv_link')
         }),
         ('Gestion', {
             'fields': ('statut', 'notes_admin')
@@ -444,7 +445,7 @@ class CandidatureSpontaneeAdmin(admin.ModelAdmin):
     
     def cv_link(self, obj):
         if obj.cv:
-            return format_html('<a href="{}" target="_blank" class="button">📄 Télécharger le CV</a>', obj.cv.url)
+            return format_html('<a href="{}" target="_blank" class="button">📄 Télécharger le CV</a>', reverse('dashboard:download_cv', args=[obj.pk, 'spontaneous']))
         return '-'
     cv_link.short_description = 'CV'
     
@@ -1,8 +1,10 @@
 from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db import connection
+from django.db import connection, connections
 from django.contrib import messages
 from main.models import Service, Formation, Contact, Partner
+from globaltit_site.cache import get_all_stats
+from globaltit_site.db.pool import get_pool_stats
 import datetime
 import psutil
 import os
@@ -55,6 +57,20 @@ def admin_dashboard(request):
     
     return render(request, 'admin/dashboard.html', context)
 
+def database_info():
+    """Paramètres de connexion de chaque base (persistance, vérification, pool)"""
+    databases = []
+    for alias in connections:
+        settings_dict = connections[alias].settings_dict
+        databases.append({
+            'alias': alias,
+            'engine': settings_dict['ENGINE'].rsplit('.', 1)[-1],
+            'conn_max_age': settings_dict.get('CONN_MAX_AGE', 0),
+            'health_checks': settings_dict.get('CONN_HEALTH_CHECKS', False),
+            'pool': settings_dict.get('POOL'),
+        })
+    return databases
+
 @staff_member_required
 def system_info(request):
     """Informations système et performance"""
@@ -85,6 +101,9 @@ def system_info(request):
             'disk_percent': disk.percent,
             'uptime': str(uptime).split('.')[0],        # Remove microseconds
             'django_processes': django_processes,
+            'databases': database_info(),
+            'pool_stats': get_pool_stats(),
+            'cache_stats': get_all_stats(),
             'server_time': datetime.datetime.now(),
         }
         
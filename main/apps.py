@@ -3,4 +3,24 @@ from django.apps import AppConfig
 
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'main'
\ No newline at end of file
+    name = 'main'
+
+    def ready(self):
+        from django.conf import settings
+        from django.core.signals import request_started
+        from globaltit_site import profiler, timing, tracing
+        from . import cv_index, invalidation
+        # Enregistre les dépendances de cache déclarées au niveau des modules
+        from . import context_processors  # noqa: F401
+
+        # Sondes SQL et templates du middleware de mesure
+        timing.install()
+        if settings.TRACING:
+            tracing.install()
+        invalidation.connect_app_signals(self)
+        # Indexation des CV en arrière-plan après l'enregistrement d'une candidature
+        cv_index.connect_signals()
+        # Le thread d'écoute démarre à la première requête de chaque worker
+        request_started.connect(invalidation.ensure_listener, dispatch_uid='invalidation_listener')
+        # Le profileur suit la configuration choisie depuis le dashboard
+        request_started.connect(profiler.apply_config, dispatch_uid='profiler_config')
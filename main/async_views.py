@@ -0,0 +1,108 @@
+"""
+Vues publiques asynchrones, utilisées quand ASYNC_VIEWS est activé (serveur ASGI).
+
+Les requêtes indépendantes d'une page sont évaluées en parallèle, chacune
+dans un thread de l'exécuteur par défaut avec sa propre connexion à la
+base ; le rendu et la validation des formulaires restent synchrones et
+passent par sync_to_async. La logique métier est partagée avec main.views.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.shortcuts import redirect, render
+
+from . import views
+from .forms import ContactForm, QuickContactForm
+from .models import Service
+
+arender = sync_to_async(render)
+
+
+def _evaluate(queryset):
+    # Chaque thread garde sa connexion : on applique CONN_MAX_AGE comme le ferait une requête
+    close_old_connections()
+    return queryset.cached()
+
+
+async def gather_querysets(querysets):
+    """Évalue simultanément un dictionnaire {nom: queryset} et retourne {nom: résultat}"""
+    names = list(querysets)
+    results = await asyncio.gather(*(
+        sync_to_async(_evaluate, thread_sensitive=False)(querysets[name]) for name in names
+    ))
+    return dict(zip(names, results))
+
+
+def _is_ajax_post(request):
+    return request.method == 'POST' and request.headers.get('x-requested-with') == 'XMLHttpRequest'
+
+
+async def home(request):
+    if request.method == 'POST':
+        quick_form = QuickContactForm(request.POST)
+        if await sync_to_async(quick_form.is_valid)():
+            await sync_to_async(views.save_quick_request)(quick_form.cleaned_data)
+            messages.success(request, 'Votre demande a été envoyée avec succès ! Nous vous contacterons rapidement.')
+            return redirect('home')
+    else:
+        quick_form = QuickContactForm()
+
+    context = await gather_querysets(views.home_querysets())
+    context['quick_form'] = quick_form
+    return await arender(request, 'main/home.html', context)
+
+
+async def services(request):
+    context = await gather_querysets({'services': Service.objects.filter(est_actif=True)})
+    return await arender(request, 'main/services.html', context)
+
+
+async def formations(request):
+    context = await gather_querysets({'formations': views.formations_queryset(request.GET)})
+    return await arender(request, 'main/formations.html', context)
+
+
+async def about(request):
+    context = await gather_querysets(views.about_querysets())
+    return await arender(request, 'main/about.html', context)
+
+
+async def partners(request):
+    context = await gather_querysets(views.partners_querysets())
+    return await arender(request, 'main/partners.html', context)
+
+
+async def _submit(request, form, save, message):
+    if not _is_ajax_post(request):
+        return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
+    if await sync_to_async(form.is_valid)():
+        await sync_to_async(save, thread_sensitive=False)(form)
+        return JsonResponse({'success': True, 'message': message})
+    return JsonResponse({'success': False, 'errors': form.errors.as_json()}, status=400)
+
+
+async def submit_service_request(request):
+    """Traitement AJAX de la demande de devis service"""
+    return await _submit(
+        request, ContactForm(request.POST), views.save_service_request,
+        'Votre demande de devis a été envoyée avec succès.',
+    )
+
+
+async def submit_formation_request(request):
+    """Traitement AJAX de la demande de formation"""
+    return await _submit(
+        request, ContactForm(request.POST), views.save_formation_request,
+        'Votre inscription a été envoyée avec succès.',
+    )
+
+
+async def submit_quick_request(request):
+    """Traitement AJAX du formulaire de devis rapide"""
+    return await _submit(
+        request, QuickContactForm(request.POST), lambda form: views.save_quick_request(form.cleaned_data),
+        'Votre demande a été envoyée avec succès ! Nous vous contacterons rapidement.',
+    )
@@ -0,0 +1,180 @@
+"""
+Outils de mesure de charge : client HTTP/1.1 asyncio minimal et statistiques.
+
+Pas de dépendance externe : le client ouvre une connexion par utilisateur
+virtuel, la réutilise quand le serveur le permet (keep-alive) et gère
+Content-Length, chunked et fermeture de connexion.
+"""
+import asyncio
+import math
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+
+class Response:
+    def __init__(self, status, headers, body, elapsed):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.elapsed = elapsed
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8', 'replace')
+
+
+class HttpClient:
+    """Client HTTP d'un utilisateur virtuel (connexion et cookies persistants)"""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.cookies = {}
+        self._reader = None
+        self._writer = None
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self._reader = self._writer = None
+
+    async def request(self, method, path, headers=None, data=None):
+        body = b''
+        all_headers = {'Host': f"{self.host}:{self.port}", 'Connection': 'keep-alive', 'User-Agent': 'globaltit-bench'}
+        if data is not None:
+            body = urlencode(data).encode() if isinstance(data, dict) else data
+            all_headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        all_headers['Content-Length'] = str(len(body))
+        if self.cookies:
+            all_headers['Cookie'] = '; '.join(f"{k}={v}" for k, v in self.cookies.items())
+        all_headers.update(headers or {})
+        raw = f"{method} {path} HTTP/1.1\r\n" + ''.join(f"{k}: {v}\r\n" for k, v in all_headers.items()) + "\r\n"
+
+        start = time.perf_counter()
+        for attempt in (1, 2):
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                self._writer.write(raw.encode('latin-1') + body)
+                await self._writer.drain()
+                status, response_headers, response_body = await asyncio.wait_for(self._read_response(), self.timeout)
+                break
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Connexion keep-alive fermée par le serveur entre deux requêtes
+                await self.close()
+                if attempt == 2:
+                    raise
+        elapsed = time.perf_counter() - start
+
+        for value in response_headers.get('set-cookie', []):
+            for name, morsel in SimpleCookie(value).items():
+                self.cookies[name] = morsel.value
+        if response_headers.get('connection', [''])[0].lower() == 'close':
+            await self.close()
+        return Response(status, {k: v[-1] for k, v in response_headers.items()}, response_body, elapsed)
+
+    async def _read_response(self):
+        status_line = await self._reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers.setdefault(name.strip().lower(), []).append(value.strip())
+
+        if 'content-length' in headers:
+            body = await self._reader.readexactly(int(headers['content-length'][-1]))
+        elif headers.get('transfer-encoding', [''])[-1].lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self._reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if size == 0:
+                    await self._reader.readuntil(b'\r\n')
+                    break
+                chunks.append(await self._reader.readexactly(size))
+                await self._reader.readexactly(2)
+            body = b''.join(chunks)
+        else:
+            body = await self._reader.read()
+            headers['connection'] = ['close']
+        return status, headers, body
+
+
+def percentile(sorted_values, p):
+    """Percentile (méthode du rang le plus proche) d'une liste déjà triée"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def summarize(latencies, errors, elapsed):
+    """Débit, percentiles (ms) et taux d'erreur d'une série de mesures"""
+    values = sorted(latencies)
+    total = len(values) + errors
+    return {
+        'requests': total,
+        'errors': errors,
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'throughput': round(total / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 2),
+        'p95_ms': round(percentile(values, 95) * 1000, 2),
+        'p99_ms': round(percentile(values, 99) * 1000, 2),
+        'max_ms': round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+async def run_load(base_url, paths, concurrency, duration):
+    """Fait tourner `concurrency` clients en boucle sur `paths` pendant `duration` secondes"""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def user(index):
+        nonlocal errors
+        client = HttpClient(base_url)
+        i = index
+        try:
+            while time.perf_counter() < deadline:
+                path = paths[i % len(paths)]
+                i += 1
+                try:
+                    response = await client.request('GET', path)
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                    errors += 1
+                    await client.close()
+                    continue
+                if response.status >= 400:
+                    errors += 1
+                else:
+                    latencies.append(response.elapsed)
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def wait_for_server(base_url, timeout=30):
+    """Attend que le serveur réponde (démarrage des workers)"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        client = HttpClient(base_url, timeout=5)
+        try:
+            await client.request('GET', '/')
+            return True
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            await asyncio.sleep(0.3)
+        finally:
+            await client.close()
+    return False
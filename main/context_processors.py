@@ -1,12 +1,23 @@
+from django.core.cache import cache
+
+from .invalidation import cache_depends_on
 from .models import SiteConfiguration
 
-def site_config(request):
-    """Context processor pour rendre la configuration du site disponible dans tous les templates"""
+SITE_CONFIG_CACHE_KEY = 'site_config:active'
+cache_depends_on(SITE_CONFIG_CACHE_KEY, SiteConfiguration)
+
+
+def _load_site_config():
     try:
-        config = SiteConfiguration.objects.get(active=True)
+        return SiteConfiguration.objects.get(active=True)
     except SiteConfiguration.DoesNotExist:
-        config = SiteConfiguration.objects.create()
+        return SiteConfiguration.objects.create()
+
+
+def site_config(request):
+    """Context processor pour rendre la configuration du site disponible dans tous les templates"""
+    config = cache.get_or_set(SITE_CONFIG_CACHE_KEY, _load_site_config, 300)
     
     return {
         'site_config': config
-    }
\ No newline at end of file
+    }
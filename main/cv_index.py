@@ -0,0 +1,396 @@
+"""
+Indexation du texte des CV pour la recherche de candidats par compétence.
+
+À l'enregistrement d'une Candidature ou d'une CandidatureSpontanee, le CV
+est mis en file (après le commit) ; un thread d'arrière-plan par worker lit
+le fichier, en extrait le texte avec des analyseurs en pur Python (pypdf
+pour le PDF, zipfile + ElementTree pour le DOCX, chaînes imprimables pour
+l'ancien format DOC), le normalise (minuscules, sans accents) et y repère
+les compétences du vocabulaire SKILLS. Le résultat va dans CVDocument
+(texte et liste) et CandidateSkill (une ligne par compétence, indexée par
+(skill, document)) : la recherche du dashboard n'interroge que cette table
+étroite.
+
+L'analyse est une fonction pure (analyse) : avec CV_INDEX_PROCESSES > 0,
+elle s'exécute dans un pool de processus (démarrage « spawn », sûr depuis
+un worker multithread) pour ne pas prendre le GIL aux requêtes. Un fichier
+déjà analysé (même empreinte sha256) n'est pas relu. Si la file est pleine
+ou le worker arrêté, le CV reste sans document et la commande index_cvs le
+rattrape.
+"""
+import hashlib
+import io
+import logging
+import multiprocessing
+import queue
+import re
+import threading
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from globaltit_site import tracing
+from globaltit_site.storage import cv_storage
+
+logger = logging.getLogger(__name__)
+
+# Compétences reconnues : identifiant -> (libellé, variantes écrites dans les CV)
+SKILLS = {
+    'python': ('Python', ['python']),
+    'django': ('Django', ['django']),
+    'javascript': ('JavaScript', ['javascript', 'js', 'node.js', 'nodejs', 'typescript']),
+    'react': ('React', ['react', 'reactjs', 'react.js']),
+    'sql': ('SQL', ['sql', 'mysql']),
+    'postgresql': ('PostgreSQL', ['postgresql', 'postgres']),
+    'linux': ('Linux', ['linux', 'debian', 'ubuntu', 'red hat', 'centos']),
+    'docker': ('Docker', ['docker']),
+    'kubernetes': ('Kubernetes', ['kubernetes', 'k8s']),
+    'cisco': ('Cisco', ['cisco', 'ccna', 'ccnp']),
+    'windows-server': ('Windows Server', ['windows server']),
+    'active-directory': ('Active Directory', ['active directory']),
+    'cybersecurite': ('Cybersécurité', ['cybersecurite', 'cyber securite', 'securite informatique']),
+    'pentest': ('Pentest', ['pentest', 'test d\'intrusion', 'tests d\'intrusion']),
+    'reseaux': ('Réseaux', ['reseaux', 'reseau', 'tcp/ip']),
+    'java': ('Java', ['java']),
+    'php': ('PHP', ['php', 'symfony', 'laravel']),
+    'azure': ('Azure', ['azure']),
+    'aws': ('AWS', ['aws', 'amazon web services']),
+    'support-utilisateur': ('Support utilisateur', ['support utilisateur', 'helpdesk', 'help desk']),
+    'itil': ('ITIL', ['itil']),
+    'virtualisation': ('Virtualisation', ['virtualisation', 'hyper-v']),
+    'vmware': ('VMware', ['vmware', 'vsphere']),
+    'git': ('Git', ['git', 'gitlab', 'github']),
+    'gestion-de-projet': ('Gestion de projet', ['gestion de projet', 'chef de projet', 'scrum']),
+    'excel': ('Excel', ['excel']),
+    'power-bi': ('Power BI', ['power bi', 'powerbi']),
+}
+
+FORMAT_SIGNATURES = [(b'%PDF-', 'pdf'), (b'PK\x03\x04', 'docx'), (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'doc')]
+MAX_PDF_PAGES = 30
+
+_WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_SPACES = re.compile(r'\s+')
+_DOC_UTF16 = re.compile(rb'(?:[\x20-\x7e\xa0-\xff]\x00|[\t\r\n]\x00){4,}')
+_DOC_BYTES = re.compile(rb'[\x20-\x7e\xa0-\xff\t\r\n]{6,}')
+
+
+# Lettres que la décomposition NFKD ne ramène pas à l'ASCII, et apostrophes typographiques
+_LETTERS = [('œ', 'oe'), ('Œ', 'OE'), ('æ', 'ae'), ('Æ', 'AE'), ('ß', 'ss'), ('\u2019', "'"), ('\u2018', "'")]
+
+
+def normalize(text):
+    """Minuscules ASCII sans accents ni ligatures, espaces regroupés"""
+    for letter, replacement in _LETTERS:
+        text = text.replace(letter, replacement)
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(text.lower().split())
+
+
+_ALIASES = {normalize(alias): slug for slug, (_, aliases) in SKILLS.items() for alias in aliases}
+_SKILL_PATTERN = re.compile(
+    r'(?<![a-z0-9])(' + '|'.join(
+        re.escape(alias).replace(r'\ ', r'\s+') for alias in sorted(_ALIASES, key=len, reverse=True)
+    ) + r')(?![a-z0-9])'
+)
+
+
+def skill_label(slug):
+    return SKILLS[slug][0] if slug in SKILLS else slug
+
+
+def detect_skills(normalized_text):
+    """Identifiants des compétences présentes dans un texte normalisé, dans l'ordre du vocabulaire"""
+    found = {_ALIASES[_SPACES.sub(' ', match)] for match in _SKILL_PATTERN.findall(normalized_text)}
+    return [slug for slug in SKILLS if slug in found]
+
+
+def detect_format(data):
+    for signature, kind in FORMAT_SIGNATURES:
+        if data.startswith(signature):
+            return kind
+    return None
+
+
+def _pdf_text(data):
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    return '\n'.join(page.extract_text() or '' for page in reader.pages[:MAX_PDF_PAGES])
+
+
+def _docx_text(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        xml = archive.read('word/document.xml')
+    paragraphs, current = [], []
+    for _, element in ElementTree.iterparse(io.BytesIO(xml)):
+        if element.tag == _WORD_NS + 't':
+            current.append(element.text or '')
+        elif element.tag in (_WORD_NS + 'tab', _WORD_NS + 'br'):
+            current.append(' ')
+        elif element.tag == _WORD_NS + 'p':
+            paragraphs.append(''.join(current))
+            current = []
+            element.clear()
+    return '\n'.join(paragraphs)
+
+
+def _doc_text(data):
+    """Ancien format Word : au mieux, les suites de caractères imprimables (UTF-16 puis cp1252)"""
+    runs = [run.decode('utf-16-le', 'ignore') for run in _DOC_UTF16.findall(data)]
+    if sum(len(run) for run in runs) < 50:
+        runs = [run.decode('cp1252', 'ignore') for run in _DOC_BYTES.findall(data)]
+    return '\n'.join(runs)
+
+
+def extract_text(data):
+    kind = detect_format(data)
+    if kind == 'pdf':
+        return _pdf_text(data)
+    if kind == 'docx':
+        return _docx_text(data)
+    if kind == 'doc':
+        return _doc_text(data)
+    raise ValueError("Format de CV non reconnu")
+
+
+def analyse(data, max_chars):
+    """{sha256, texte, competences, erreur} pour le contenu d'un CV (exécutable dans un autre processus)"""
+    result = {'sha256': hashlib.sha256(data).hexdigest(), 'texte': '', 'competences': [], 'erreur': ''}
+    try:
+        text = normalize(extract_text(data))
+    except Exception as e:
+        result['erreur'] = f'{type(e).__name__}: {e}'[:300]
+        return result
+    result['texte'] = text[:max_chars]
+    result['competences'] = detect_skills(text)
+    return result
+
+
+def analyse_stored(name, max_chars):
+    """analyse() d'un fichier du stockage des CV ; erreur de lecture comprise dans le résultat"""
+    try:
+        with cv_storage().open(name, 'rb') as f:
+            data = f.read()
+    except Exception as e:
+        return {'sha256': '', 'texte': '', 'competences': [], 'erreur': f'Lecture impossible : {e}'[:300]}
+    return analyse(data, max_chars)
+
+
+def _models():
+    from .models import Candidature, CandidatureSpontanee
+
+    return {'normal': Candidature, 'spontaneous': CandidatureSpontanee}
+
+
+def _owner_field(kind):
+    return 'candidature' if kind == 'normal' else 'candidature_spontanee'
+
+
+def save_results(entries, replace=True):
+    """Enregistre [(type, pk, nom du fichier, résultat d'analyse)] : documents puis compétences, en lot"""
+    from .models import CandidateSkill, CVDocument
+
+    now = timezone.now()
+    with transaction.atomic():
+        if replace:
+            for kind in ('normal', 'spontaneous'):
+                pks = [pk for entry_kind, pk, _, _ in entries if entry_kind == kind]
+                if pks:
+                    CVDocument.objects.filter(**{f'{_owner_field(kind)}_id__in': pks}).delete()
+        documents = [
+            CVDocument(
+                **{f'{_owner_field(kind)}_id': pk},
+                fichier=name[:255],
+                sha256=result['sha256'],
+                statut='echec' if result['erreur'] else 'indexe',
+                texte=result['texte'],
+                competences=','.join(result['competences']),
+                erreur=result['erreur'],
+                date_extraction=now,
+            )
+            for kind, pk, name, result in entries
+        ]
+        CVDocument.objects.bulk_create(documents)
+        CandidateSkill.objects.bulk_create([
+            CandidateSkill(document=document, skill=skill)
+            for document, (_, _, _, result) in zip(documents, entries)
+            for skill in result['competences']
+        ])
+    return documents
+
+
+def _known_result(sha256):
+    """Résultat d'un document déjà indexé avec le même contenu"""
+    from .models import CVDocument
+
+    document = CVDocument.objects.filter(sha256=sha256, statut='indexe').order_by('-pk').first()
+    if document is None:
+        return None
+    return {
+        'sha256': sha256, 'texte': document.texte, 'competences': document.competences_list(), 'erreur': '',
+    }
+
+
+# --- Indexation en arrière-plan --------------------------------------------
+
+_queue = queue.Queue(maxsize=1000)
+_worker = None
+_worker_lock = threading.Lock()
+_pool = None
+
+
+def enqueue(kind, pk):
+    try:
+        _queue.put_nowait((kind, pk))
+    except queue.Full:
+        # Rattrapé par la commande index_cvs
+        return
+    _ensure_worker()
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='cv-index', daemon=True)
+            _worker.start()
+
+
+def _analyse(data, max_chars):
+    global _pool
+    processes = settings.CV_INDEX_PROCESSES
+    if processes <= 0:
+        return analyse(data, max_chars)
+    if _pool is None:
+        _pool = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'))
+    return _pool.submit(analyse, data, max_chars).result()
+
+
+def index_application(kind, pk):
+    """Indexe le CV actuel d'une candidature, sauf s'il l'est déjà"""
+    from .models import CVDocument
+
+    name = _models()[kind].objects.filter(pk=pk).values_list('cv', flat=True).first()
+    if not name:
+        return None
+    field = _owner_field(kind)
+    if CVDocument.objects.filter(**{f'{field}_id': pk}, fichier=name).exclude(statut='en_attente').exists():
+        return None
+    with cv_storage().open(name, 'rb') as f:
+        data = f.read()
+    result = _known_result(hashlib.sha256(data).hexdigest()) or _analyse(data, settings.CV_INDEX_MAX_CHARS)
+    try:
+        return save_results([(kind, pk, name, result)])[0]
+    except IntegrityError:
+        # Candidature supprimée entre-temps
+        return None
+
+
+def _run():
+    while True:
+        kind, pk = _queue.get()
+        close_old_connections()
+        try:
+            with tracing.span('job.cv_index', **{'cv.kind': kind}):
+                index_application(kind, pk)
+        except Exception:
+            logger.exception("Impossible d'indexer le CV de la candidature %s %s", kind, pk)
+
+
+def _on_application_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not settings.CV_INDEX_ON_SAVE or not instance.cv:
+        return
+    if update_fields is not None and 'cv' not in update_fields:
+        return
+    kind = 'normal' if sender is _models()['normal'] else 'spontaneous'
+    pk = instance.pk
+    transaction.on_commit(lambda: enqueue(kind, pk))
+
+
+def connect_signals():
+    from django.db.models.signals import post_save
+
+    for kind, model in _models().items():
+        post_save.connect(_on_application_saved, sender=model, dispatch_uid=f'cv_index:{kind}')
+
+
+# --- Recherche -----------------------------------------------------------------
+
+def facet():
+    """[(identifiant, libellé, nombre de CV)] sur tout l'index, par nombre décroissant (mis en cache)"""
+    from django.core.cache import cache
+    from django.db.models import Count
+
+    from .models import CandidateSkill
+
+    counts = cache.get('cv-index:facet')
+    if counts is None:
+        counts = list(CandidateSkill.objects.values_list('skill').annotate(n=Count('document')).order_by())
+        cache.set('cv-index:facet', counts, settings.CV_INDEX_FACET_TIMEOUT)
+    return sorted(((slug, skill_label(slug), n) for slug, n in counts), key=lambda item: (-item[2], item[1]))
+
+
+def _name_filter(query):
+    from django.db.models import Q
+
+    condition = Q()
+    for kind, model in _models().items():
+        matching = model.objects.filter(
+            Q(nom__icontains=query) | Q(prenom__icontains=query) | Q(email__icontains=query)
+        ).values('pk')
+        condition |= Q(**{f'{_owner_field(kind)}__in': matching})
+    return condition
+
+
+def search(skills, query=''):
+    """Documents indexés dont le CV contient toutes les compétences demandées, filtrés par nom ou email
+
+    Une sous-requête EXISTS par compétence : parcourus par identifiant
+    décroissant, les documents s'arrêtent à la première page sans agréger
+    toute la table des compétences.
+    """
+    from django.db.models import Exists, OuterRef
+
+    from .models import CandidateSkill, CVDocument
+
+    documents = CVDocument.objects.filter(statut='indexe')
+    for skill in skills:
+        documents = documents.filter(
+            Exists(CandidateSkill.objects.filter(document=OuterRef('pk'), skill=skill))
+        )
+    if query:
+        documents = documents.filter(_name_filter(query))
+    return documents
+
+
+def count(skills, query=''):
+    """Nombre de résultats de search(), compté sur l'index (skill, document) quand c'est possible"""
+    from django.core.cache import cache
+    from django.db.models import Count
+
+    from .models import CandidateSkill
+
+    if not skills or query:
+        return search(skills, query).count()
+    if len(skills) == 1:
+        return CandidateSkill.objects.filter(skill=skills[0]).count()
+    # L'intersection agrège toutes les lignes des compétences demandées : gardée comme la facette
+    key = 'cv-index:count:' + ','.join(sorted(skills))
+    total = cache.get(key)
+    if total is None:
+        total = (
+            CandidateSkill.objects.filter(skill__in=skills)
+            .values('document')
+            .annotate(n=Count('document'))
+            .filter(n=len(skills))
+            .count()
+        )
+        cache.set(key, total, settings.CV_INDEX_FACET_TIMEOUT)
+    return total
@@ -0,0 +1,68 @@
+"""
+Expiration des offres d'emploi dont la date limite est passée.
+
+La commande `expire_job_offers`, lancée par une tâche planifiée, désactive
+les offres actives dont `date_limite` est antérieure à aujourd'hui (fuseau
+du site). Les pages publiques n'ont donc pas à filtrer sur la date à chaque
+requête.
+
+Les offres sont parcourues par identifiant croissant et désactivées par
+lots de JOB_OFFER_EXPIRY_BATCH_SIZE. Chaque lot est un UPDATE court qui ne
+verrouille qu'une tranche de la table. L'UPDATE reprend la condition
+d'expiration : une offre prolongée entre la lecture et l'écriture n'est pas
+touchée. Les caches des pages d'offres (querysets versionnés, rapprochements,
+contenus associés) sont invalidés une seule fois pour tout le passage. Une
+seule entrée du journal d'activité résume le passage.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import invalidation
+from .models import OffreEmploi
+
+logger = logging.getLogger(__name__)
+
+TITLES_IN_LOG = 10
+
+
+def expired_offers(today=None):
+    """Offres encore actives dont la date limite est passée"""
+    today = today or timezone.localdate()
+    return OffreEmploi.objects.filter(est_actif=True, date_limite__lt=today)
+
+
+def expire_offers(today=None, batch_size=None, dry_run=False):
+    """Désactive les offres expirées par lots ; renvoie le nombre d'offres et leurs titres"""
+    from dashboard.models import DashboardActivity
+
+    batch_size = batch_size or settings.JOB_OFFER_EXPIRY_BATCH_SIZE
+    expired = expired_offers(today)
+    started = time.perf_counter()
+    now = timezone.now()
+    count, titles, last = 0, [], 0
+    with invalidation.coalesced():
+        while True:
+            batch = list(expired.filter(pk__gt=last).order_by('pk').values_list('pk', 'titre')[:batch_size])
+            if not batch:
+                break
+            last = batch[-1][0]
+            if dry_run:
+                count += len(batch)
+            else:
+                # update() ignore auto_now : la date de modification est posée ici
+                count += expired.filter(pk__in=[pk for pk, _ in batch]).update(est_actif=False, date_modification=now)
+            titles += [titre for _, titre in batch[:TITLES_IN_LOG - len(titles)]]
+    elapsed = time.perf_counter() - started
+    if count and not dry_run:
+        logger.info("%d offre(s) d'emploi expirée(s) désactivée(s) en %.2f s", count, elapsed)
+        more = f" et {count - len(titles)} autre(s)" if count > len(titles) else ""
+        DashboardActivity.objects.create(
+            user=None,
+            action='deactivate',
+            object_type='OffreEmploi',
+            description=f"{count} offre(s) expirée(s) désactivée(s) : {', '.join(titles)}{more}",
+        )
+    return {'count': count, 'titles': titles, 'seconds': elapsed}
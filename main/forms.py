@@ -1,4 +1,6 @@
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
 from django.core.validators import FileExtensionValidator
 from .models import Contact, Candidature, CandidatureSpontanee, OffreEmploi
 
@@ -101,11 +103,12 @@ class CandidatureForm(forms.ModelForm):
         }
     
     def clean_cv(self):
-        """Validation de la taille du CV (max 5MB)"""
+        """Validation de la taille du CV (déjà appliquée pendant l'envoi par ValidatingUploadHandler)"""
         cv = self.cleaned_data.get('cv')
+        max_size = settings.UPLOAD_RULES['cv']['max_size']
         if cv:
-            if cv.size > 5 * 1024 * 1024:  # 5MB
-                raise forms.ValidationError('La taille du fichier ne doit pas dépasser 5MB.')
+            if cv.size > max_size:
+                raise forms.ValidationError(f'La taille du fichier ne doit pas dépasser {filesizeformat(max_size)}.')
         return cv
 
 
@@ -154,11 +157,12 @@ class CandidatureSpontaneeForm(forms.ModelForm):
         }
     
     def clean_cv(self):
-        """Validation de la taille du CV (max 5MB)"""
+        """Validation de la taille du CV (déjà appliquée pendant l'envoi par ValidatingUploadHandler)"""
         cv = self.cleaned_data.get('cv')
+        max_size = settings.UPLOAD_RULES['cv']['max_size']
         if cv:
-            if cv.size > 5 * 1024 * 1024:  # 5MB
-                raise forms.ValidationError('La taille du fichier ne doit pas dépasser 5MB.')
+            if cv.size > max_size:
+                raise forms.ValidationError(f'La taille du fichier ne doit pas dépasser {filesizeformat(max_size)}.')
         return cv
 
 
@@ -0,0 +1,274 @@
+"""
+Bus d'invalidation des caches locaux entre workers et entre instances.
+
+Chaque sauvegarde ou suppression d'un modèle de `main` ou `dashboard`
+publie un événement « table:<db_table> ». Sur PostgreSQL l'événement part
+par NOTIFY au commit de la transaction ; un thread par worker écoute le
+canal (LISTEN) et évince les entrées locales concernées. Sur les autres
+bases (SQLite en développement), les événements sont écrits dans la table
+InvalidationEvent, que le thread d'écoute interroge périodiquement.
+
+Les invalidations issues des écritures sur les modèles (invalidate_model)
+sont appliquées au commit de la transaction. Un lecteur concurrent ne peut
+donc pas ranger des lignes d'avant le commit sous une version déjà
+renouvelée. Le processus qui écrit les applique sans attendre le retour du
+bus.
+
+Le bus évince les copies L1 de chaque worker. Quand le L2 n'est pas partagé
+entre instances (cache fichiers, L2_SHARED faux), un événement venu d'une
+autre machine efface aussi les clés du L2 local. C'est le cas des écritures
+des tâches planifiées de Render, qui tournent dans leur propre conteneur.
+"""
+import json
+import logging
+import os
+import select
+import socket
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import post_delete, post_save
+
+from globaltit_site import tracing
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'globaltit_invalidation'
+
+# Modèles dont les écritures ne sont jamais publiées
+IGNORED_MODELS = {
+    'main.invalidationevent', 'main.cvdocument', 'main.candidateskill', 'main.relateditem',
+    'dashboard.dashboardactivity', 'dashboard.slowquery', 'dashboard.requestprofile', 'dashboard.importjob',
+}
+
+_subscribers = []
+_dependencies = defaultdict(set)  # db_table -> clés de cache dépendantes
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+_coalescing = threading.local()
+
+
+def _origin():
+    """Identifiant du processus émetteur (recalculé après un fork)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def subscribe(handler):
+    """Enregistre une fonction appelée avec le sujet de chaque événement reçu"""
+    if handler not in _subscribers:
+        _subscribers.append(handler)
+    return handler
+
+
+def cache_depends_on(key, *models):
+    """Déclare qu'une clé du cache par défaut doit être invalidée quand l'un des modèles change"""
+    for model in models:
+        _dependencies[model._meta.db_table].add(key)
+
+
+def table_version_key(table):
+    return f"qv:{table}"
+
+
+def table_versions(tables):
+    """Versions courantes des tables ; une table sans version en reçoit une nouvelle, unique"""
+    keys = {table_version_key(table): table for table in tables}
+    found = cache.get_many(list(keys))
+    for key in keys.keys() - found.keys():
+        cache.add(key, time.time_ns(), None)
+        found[key] = cache.get(key)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def _evict_local(key):
+    evict = getattr(cache, 'evict_local', None)
+    if evict is not None:
+        evict(key)
+
+
+def dispatch(topic, other_host=False):
+    """Applique localement un événement d'invalidation ; other_host : émis par une autre machine"""
+    if topic.startswith('table:'):
+        table = topic[len('table:'):]
+        keys = [table_version_key(table), *_dependencies.get(table, ())]
+    elif topic.startswith('key:'):
+        keys = [topic[len('key:'):]]
+    else:
+        keys = []
+    if other_host and not getattr(cache, 'l2_shared', True):
+        # L2 propre à cette instance : l'émetteur n'a pas pu l'atteindre
+        cache.delete_many(keys)
+    else:
+        for key in keys:
+            _evict_local(key)
+    for handler in list(_subscribers):
+        try:
+            handler(topic)
+        except Exception:
+            logger.exception("Erreur dans un abonné du bus d'invalidation (%s)", topic)
+
+
+def publish(topic, using=DEFAULT_DB_ALIAS):
+    """Invalide localement puis diffuse l'événement aux autres workers au commit"""
+    dispatch(topic)
+    if getattr(settings, 'INVALIDATION_BUS_ENABLED', True):
+        transaction.on_commit(lambda: _send(topic, using), using=using)
+
+
+def _send(topic, using):
+    try:
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            payload = json.dumps({'t': topic, 'o': _origin()})
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+        else:
+            from .models import InvalidationEvent
+            InvalidationEvent.objects.using(using).create(topic=topic[:200], origin=_origin())
+    except Exception:
+        logger.exception("Impossible de publier l'événement d'invalidation %s", topic)
+
+
+def invalidate_model(model, using=DEFAULT_DB_ALIAS):
+    """Invalide au commit tout ce qui dépend de la table d'un modèle, ici et sur les autres workers"""
+    pending = getattr(_coalescing, 'pending', None)
+    if pending is not None:
+        pending.add((model, using))
+        return
+    table = model._meta.db_table
+    # Hors transaction, on_commit exécute aussitôt ; annulée avec un rollback
+    transaction.on_commit(lambda: _invalidate_table(table, using), using=using)
+
+
+def _invalidate_table(table, using):
+    cache.delete_many([table_version_key(table), *_dependencies.get(table, ())])
+    publish(f"table:{table}", using=using)
+
+
+@contextmanager
+def coalesced():
+    """Regroupe les invalidations du bloc : une seule par table, à la sortie (suppressions en masse)"""
+    if getattr(_coalescing, 'pending', None) is not None:
+        yield
+        return
+    _coalescing.pending = set()
+    try:
+        yield
+    finally:
+        pending, _coalescing.pending = _coalescing.pending, None
+        for model, using in pending:
+            invalidate_model(model, using=using)
+
+
+def _on_model_change(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    if sender._meta.label_lower in IGNORED_MODELS:
+        return
+    invalidate_model(sender, using=using)
+
+
+def connect_app_signals(app_config):
+    """Branche la publication sur les signaux post_save/post_delete des modèles d'une application"""
+    for model in app_config.get_models():
+        if model._meta.label_lower in IGNORED_MODELS:
+            # Sans récepteur, les suppressions (et cascades) restent des DELETE directs
+            continue
+        uid = f"invalidation:{model._meta.label_lower}"
+        post_save.connect(_on_model_change, sender=model, dispatch_uid=uid + ':save')
+        post_delete.connect(_on_model_change, sender=model, dispatch_uid=uid + ':delete')
+
+
+class Listener(threading.Thread):
+    """Thread d'écoute du bus : LISTEN/NOTIFY sur PostgreSQL, scrutation de table sinon"""
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, poll_interval=None, on_event=None):
+        super().__init__(name='invalidation-listener', daemon=True)
+        self.using = using
+        self.poll_interval = poll_interval or getattr(settings, 'INVALIDATION_POLL_INTERVAL', 1.0)
+        self.on_event = on_event or dispatch
+        self.origin = _origin()
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        backoff = 1
+        while not self._stop_event.is_set():
+            try:
+                if connections[self.using].vendor == 'postgresql':
+                    self._listen_postgresql()
+                else:
+                    self._poll_table()
+                backoff = 1
+            except Exception:
+                logger.exception("Bus d'invalidation interrompu, reconnexion dans %ss", backoff)
+                connections[self.using].close()
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def _handle(self, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        self._receive(message.get('t', ''), message.get('o', ''))
+
+    def _receive(self, topic, origin):
+        if origin == self.origin:
+            return
+        other_host = origin.rpartition(':')[0] != self.origin.rpartition(':')[0]
+        with tracing.span('job.invalidation', **{'invalidation.topic': topic}):
+            self.on_event(topic, other_host=other_host)
+
+    def _listen_postgresql(self):
+        wrapper = connections[self.using]
+        wrapper.ensure_connection()
+        wrapper.set_autocommit(True)
+        raw = wrapper.connection
+        with raw.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        if not hasattr(raw, 'poll'):
+            # psycopg 3
+            while not self._stop_event.is_set():
+                for notify in raw.notifies(timeout=self.poll_interval * 5, stop_after=100):
+                    self._handle(notify.payload)
+            return
+        while not self._stop_event.is_set():
+            if select.select([raw], [], [], self.poll_interval * 5) == ([], [], []):
+                continue
+            raw.poll()
+            while raw.notifies:
+                self._handle(raw.notifies.pop(0).payload)
+
+    def _poll_table(self):
+        from .models import InvalidationEvent
+        events = InvalidationEvent.objects.using(self.using)
+        last_id = events.order_by('-id').values_list('id', flat=True).first() or 0
+        last_prune = time.monotonic()
+        while not self._stop_event.is_set():
+            self._stop_event.wait(self.poll_interval)
+            for event_id, topic, origin in events.filter(id__gt=last_id).order_by('id').values_list('id', 'topic', 'origin'):
+                last_id = event_id
+                self._receive(topic, origin)
+            if time.monotonic() - last_prune > 60:
+                last_prune = time.monotonic()
+                InvalidationEvent.prune()
+
+
+def ensure_listener(**kwargs):
+    """Démarre le thread d'écoute une fois par processus (après le fork des workers)"""
+    global _listener, _listener_pid
+    if _listener_pid == os.getpid() or not getattr(settings, 'INVALIDATION_BUS_ENABLED', True):
+        return
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener = Listener()
+        _listener.start()
+        _listener_pid = os.getpid()
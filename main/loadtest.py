@@ -0,0 +1,272 @@
+"""
+Scénarios de charge du site, rejoués par la commande loadtest.
+
+Chaque utilisateur virtuel (HttpClient de main.benchmarks) suit en boucle
+le parcours de son scénario jusqu'à la fin de l'essai. Les choix aléatoires
+(filtres, fiches consultées) viennent d'un random.Random initialisé avec la
+graine de l'essai et le numéro de l'utilisateur : deux essais avec la même
+graine et les mêmes données demandent les mêmes pages.
+
+Les mesures sont regroupées par scénario et par étape (débit, percentiles,
+taux d'erreur) ; compare() les confronte à un rapport de référence.
+"""
+import asyncio
+import random
+import time
+from decimal import Decimal
+
+from django.conf import settings
+
+from .benchmarks import HttpClient, summarize
+
+LOADTEST_USERNAME = 'loadtest'
+# Indicateurs comparés à la référence : (clé, une hausse est-elle une régression ?)
+COMPARED = [('throughput', False), ('p50_ms', True), ('p95_ms', True), ('p99_ms', True), ('error_rate', True)]
+
+
+class StepError(Exception):
+    pass
+
+
+def seed(password, formations=20, services=10, job_offers=10):
+    """
+    Complète la base pour que chaque scénario ait des pages à visiter : un
+    compte staff LOADTEST_USERNAME et au moins le nombre demandé de
+    formations, services et offres actives. Renvoie les identifiants utiles.
+    """
+    from django.contrib.auth.models import User
+
+    from .models import Formation, OffreEmploi, Service
+
+    user, _ = User.objects.get_or_create(username=LOADTEST_USERNAME, defaults={'is_staff': True})
+    user.is_staff = True
+    user.set_password(password)
+    user.save()
+
+    categories = [value for value, _ in Formation.CATEGORIE_CHOICES]
+    niveaux = [value for value, _ in Formation.NIVEAU_CHOICES]
+    missing = formations - Formation.objects.filter(disponible=True).count()
+    Formation.objects.bulk_create([
+        Formation(
+            titre=f"Formation de charge {i}",
+            categorie=categories[i % len(categories)],
+            niveau=niveaux[i % len(niveaux)],
+            description="Formation créée pour les essais de charge.",
+            objectifs="Mesurer les temps de réponse.",
+            programme="Module 1\nModule 2\nModule 3",
+            duree="3 jours",
+            prix=Decimal('990.00'),
+        )
+        for i in range(max(missing, 0))
+    ])
+
+    service_categories = [value for value, _ in Service.CATEGORIE_CHOICES]
+    missing = services - Service.objects.filter(est_actif=True).count()
+    Service.objects.bulk_create([
+        Service(
+            titre=f"Service de charge {i}",
+            categorie=service_categories[i % len(service_categories)],
+            description="Service créé pour les essais de charge.",
+            description_courte="Service d'essai",
+            icone='fa-gauge',
+            ordre=100 + i,
+        )
+        for i in range(max(missing, 0))
+    ])
+
+    missing = job_offers - OffreEmploi.objects.filter(est_actif=True).count()
+    OffreEmploi.objects.bulk_create([
+        OffreEmploi(
+            titre=f"Offre de charge {i}",
+            description="Offre créée pour les essais de charge.",
+            lieu="Paris",
+            missions="Missions d'essai",
+            profil_recherche="Profil d'essai",
+        )
+        for i in range(max(missing, 0))
+    ])
+    return fixtures()
+
+
+def fixtures():
+    """Identifiants des pages visitées par les scénarios"""
+    from .models import Formation, OffreEmploi, Service
+
+    return {
+        'formations': list(Formation.objects.filter(disponible=True).values_list('pk', 'categorie', 'niveau')),
+        'services': list(Service.objects.filter(est_actif=True).values_list('pk', flat=True)),
+        'job_offers': list(OffreEmploi.objects.filter(est_actif=True).values_list('pk', flat=True)),
+    }
+
+
+class Recorder:
+    """Latences et erreurs par (scénario, étape)"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, scenario, step, elapsed=None):
+        key = (scenario, step)
+        self.latencies.setdefault(key, [])
+        if elapsed is None:
+            self.errors[key] = self.errors.get(key, 0) + 1
+        else:
+            self.latencies[key].append(elapsed)
+
+    def report(self, elapsed):
+        scenarios = {}
+        for scenario in sorted({scenario for scenario, _ in self.latencies}):
+            keys = [key for key in self.latencies if key[0] == scenario]
+            latencies = [value for key in keys for value in self.latencies[key]]
+            errors = sum(self.errors.get(key, 0) for key in keys)
+            scenarios[scenario] = summarize(latencies, errors, elapsed)
+            scenarios[scenario]['steps'] = {
+                step: summarize(self.latencies[(name, step)], self.errors.get((name, step), 0), elapsed)
+                for name, step in sorted(keys)
+            }
+        every = [value for values in self.latencies.values() for value in values]
+        return {'total': summarize(every, sum(self.errors.values()), elapsed), 'scenarios': scenarios}
+
+
+class Visit:
+    """Une itération de scénario : enchaîne les étapes et les enregistre"""
+
+    def __init__(self, scenario, client, recorder):
+        self.scenario = scenario
+        self.client = client
+        self.recorder = recorder
+
+    async def step(self, name, method, path, data=None, ajax=False, statuses=None):
+        """Requête mesurée ; échoue sur un statut >= 400 ou hors de `statuses` s'il est donné"""
+        headers = {}
+        if method == 'POST':
+            headers['X-CSRFToken'] = self.client.cookies.get('csrftoken', '')
+            headers['Referer'] = f"http://{self.client.host}:{self.client.port}{path}"
+        if ajax:
+            headers['X-Requested-With'] = 'XMLHttpRequest'
+        try:
+            response = await self.client.request(method, path, headers=headers, data=data)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            self.recorder.add(self.scenario, name)
+            await self.client.close()
+            raise StepError(name)
+        if (response.status not in statuses) if statuses else response.status >= 400:
+            self.recorder.add(self.scenario, name)
+            raise StepError(name)
+        self.recorder.add(self.scenario, name, response.elapsed)
+        return response
+
+
+async def visitor(visit, rng, data, state):
+    """Accueil, formations filtrées, fiche formation puis demande rapide"""
+    await visit.step('home', 'GET', '/')
+    pk, categorie, niveau = rng.choice(data['formations'])
+    await visit.step('formations', 'GET', f'/formations/?categorie={categorie}&niveau={rng.choice(["", niveau])}')
+    await visit.step('formation_detail', 'GET', f'/formation/{pk}/')
+    await visit.step('contact', 'GET', '/contact/')
+    await visit.step('submit_quick', 'POST', '/contact/submit-quick/', ajax=True, data={
+        'nom': f"Visiteur {rng.randrange(10 ** 6)}",
+        'email': f"visiteur{rng.randrange(10 ** 6)}@example.com",
+        'telephone': '0600000000',
+        'besoin': 'Essai de charge',
+    })
+
+
+async def jobs(visit, rng, data, state):
+    """Offres d'emploi puis fiche d'une offre"""
+    await visit.step('job_offers', 'GET', '/recrutement/')
+    await visit.step('job_offer_detail', 'GET', f"/recrutement/offre/{rng.choice(data['job_offers'])}/")
+
+
+async def editor(visit, rng, data, state):
+    """Parcours d'un éditeur du dashboard (connexion une fois par utilisateur virtuel)"""
+    if not state.get('logged_in'):
+        await visit.step('login_page', 'GET', '/dashboard/login/')
+        # Un échec d'authentification réaffiche le formulaire (200)
+        await visit.step('login', 'POST', '/dashboard/login/', statuses={302}, data={
+            'username': LOADTEST_USERNAME, 'password': data['password'],
+        })
+        state['logged_in'] = True
+    await visit.step('dashboard_home', 'GET', '/dashboard/')
+    image_type = rng.choice(['', 'service', 'formation', 'carousel'])
+    await visit.step('image_manager', 'GET', f'/dashboard/images/?type={image_type}')
+    await visit.step('content_manager', 'GET', '/dashboard/content/')
+    service = rng.choice(data['services'])
+    await visit.step('get_service', 'GET', f'/dashboard/services/{service}/get/', ajax=True)
+    # Deux bascules : le service retrouve son état
+    for _ in range(2):
+        await visit.step('toggle_service', 'POST', f'/dashboard/services/{service}/toggle/', ajax=True)
+    await visit.step('request_manager', 'GET', '/dashboard/requests/')
+
+
+SCENARIOS = {
+    'visitor': visitor,
+    'jobs': jobs,
+    'editor': editor,
+}
+
+
+async def run_scenarios(base_url, names, users, duration, data, seed_value=0):
+    """Répartit `users` utilisateurs virtuels entre les scénarios `names` pendant `duration` secondes"""
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    async def user(index):
+        name = names[index % len(names)]
+        scenario = SCENARIOS[name]
+        rng = random.Random(seed_value * 100003 + index)
+        client = HttpClient(base_url)
+        state = {}
+        try:
+            while time.perf_counter() < deadline:
+                try:
+                    await scenario(Visit(name, client, recorder), rng, data, state)
+                except StepError:
+                    state.clear()
+                    await client.close()
+                    client.cookies.clear()
+                    await asyncio.sleep(0.05)
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(users)))
+    return recorder.report(time.perf_counter() - start)
+
+
+def compare(report, baseline, tolerance):
+    """
+    Écarts entre un rapport et la référence, par scénario :
+    [(scénario, indicateur, référence, mesure, écart relatif, régression)].
+    Une régression dépasse `tolerance` (0.1 = 10 %) dans le mauvais sens ;
+    pour le taux d'erreur, toute hausse de plus d'un point compte.
+    """
+    rows = []
+    for scenario, current in sorted(report['scenarios'].items()):
+        reference = baseline.get('scenarios', {}).get(scenario)
+        if reference is None:
+            continue
+        for key, higher_is_worse in COMPARED:
+            before, after = reference.get(key, 0), current.get(key, 0)
+            if key == 'error_rate':
+                change = after - before
+                regression = change > 0.01
+            else:
+                change = (after - before) / before if before else 0.0
+                regression = change > tolerance if higher_is_worse else change < -tolerance
+            rows.append((scenario, key, before, after, change, regression))
+    return rows
+
+
+def report_meta(options):
+    return {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'users': options['users'],
+        'duration': options['duration'],
+        'scenarios': options['scenarios'],
+        'seed': options['seed_value'],
+        'mode': options['mode'],
+        'workers': options['workers'],
+        'database': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+    }
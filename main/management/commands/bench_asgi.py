@@ -0,0 +1,74 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.benchmarks import run_load, wait_for_server
+
+
+class Command(BaseCommand):
+    help = "Compare les latences p50/p99 des pages publiques entre le mode WSGI et le mode ASGI"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='50,100,250,500',
+                            help="Niveaux de concurrence, séparés par des virgules")
+        parser.add_argument('--duration', type=float, default=10, help="Durée de chaque palier (secondes)")
+        parser.add_argument('--paths', default='/,/a-propos/,/services/,/partenaires/')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--wsgi-port', type=int, default=8101)
+        parser.add_argument('--asgi-port', type=int, default=8102)
+        parser.add_argument('--json', dest='json_path', help="Écrit aussi les résultats dans ce fichier")
+
+    def _start(self, mode, port, workers):
+        env = dict(os.environ)
+        bind = f"127.0.0.1:{port}"
+        if mode == 'wsgi':
+            env['ASYNC_VIEWS'] = 'False'
+            args = ['globaltit_site.wsgi:application', '-b', bind, '-w', str(workers)]
+        else:
+            args = ['-c', str(settings.BASE_DIR / 'gunicorn_asgi.conf.py'), 'globaltit_site.asgi:application',
+                    '-b', bind, '-w', str(workers)]
+        return subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--log-level', 'warning', *args],
+            cwd=settings.BASE_DIR, env=env,
+        )
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        paths = [path.strip() for path in options['paths'].split(',') if path.strip()]
+        results = {}
+
+        for mode, port in (('wsgi', options['wsgi_port']), ('asgi', options['asgi_port'])):
+            server = self._start(mode, port, options['workers'])
+            base_url = f"http://127.0.0.1:{port}"
+            try:
+                if not asyncio.run(wait_for_server(base_url)):
+                    raise CommandError(f"Le serveur {mode} n'a pas démarré sur le port {port}")
+                # Premier passage pour remplir les caches
+                asyncio.run(run_load(base_url, paths, 5, 1))
+                for level in levels:
+                    summary = asyncio.run(run_load(base_url, paths, level, options['duration']))
+                    results.setdefault(str(level), {})[mode] = summary
+                    self.stdout.write(
+                        f"{mode} c={level:<4} {summary['throughput']:>8} req/s  "
+                        f"p50={summary['p50_ms']:>8} ms  p99={summary['p99_ms']:>8} ms  "
+                        f"erreurs={summary['error_rate']:.2%}"
+                    )
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+        self.stdout.write("\nconcurrence   p50 wsgi/asgi (ms)      p99 wsgi/asgi (ms)")
+        for level in levels:
+            wsgi, asgi = results[str(level)]['wsgi'], results[str(level)]['asgi']
+            self.stdout.write(
+                f"{level:<13} {wsgi['p50_ms']:>9} / {asgi['p50_ms']:<9}  {wsgi['p99_ms']:>9} / {asgi['p99_ms']:<9}"
+            )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
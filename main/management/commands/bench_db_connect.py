@@ -0,0 +1,108 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+
+from globaltit_site.db.pool import get_pool_stats
+from main.benchmarks import percentile
+
+MODES = {
+    'fresh': "connexion neuve à chaque requête (CONN_MAX_AGE=0)",
+    'persistent': "connexion persistante vérifiée (CONN_MAX_AGE + CONN_HEALTH_CHECKS)",
+    'pooled': "backend globaltit_site.db.pooled",
+}
+
+
+class Command(BaseCommand):
+    help = "Mesure le coût d'ouverture de connexion par requête : connexion neuve, persistante et pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help="Requêtes simulées par mode")
+        parser.add_argument('--threads', type=int, default=1, help="Requêtes simulées en parallèle")
+        parser.add_argument('--modes', default=','.join(MODES))
+
+    def _settings_for(self, mode):
+        settings_dict = dict(connections.settings[DEFAULT_DB_ALIAS])
+        settings_dict.pop('TEST', None)
+        if mode == 'fresh':
+            settings_dict.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
+        elif mode == 'persistent':
+            settings_dict.update(CONN_MAX_AGE=600, CONN_HEALTH_CHECKS=True)
+        else:
+            settings_dict.update(
+                ENGINE='globaltit_site.db.pooled', CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False,
+                POOL=settings_dict.get('POOL') or {'MIN_SIZE': 1, 'MAX_SIZE': 10},
+            )
+        return settings_dict
+
+    def _request(self, alias):
+        """Une requête HTTP simulée : signaux de début/fin et trois lectures comme une page publique"""
+        request_started.send(sender=self.__class__)
+        connection = connections[alias]
+        try:
+            start = time.perf_counter()
+            connection.ensure_connection()
+            connected = time.perf_counter()
+            with connection.cursor() as cursor:
+                for table in ('main_service', 'main_formation', 'main_partner'):
+                    cursor.execute(f'SELECT COUNT(*) FROM {table}')
+                    cursor.fetchone()
+            done = time.perf_counter()
+        finally:
+            request_finished.send(sender=self.__class__)
+        return connected - start, done - start
+
+    def _run(self, alias, count, threads):
+        def worker(n):
+            results = [self._request(alias) for _ in range(n)]
+            connections[alias].close()
+            return results
+
+        shares = [count // threads + (1 if i < count % threads else 0) for i in range(threads)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            results = [r for part in executor.map(worker, shares) for r in part]
+        return results, time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        for mode in modes:
+            if mode not in MODES:
+                raise CommandError(f"Mode inconnu : {mode} (choix : {', '.join(MODES)})")
+        vendor = connections[DEFAULT_DB_ALIAS].vendor
+        if 'pooled' in modes and vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(f"Mode « pooled » ignoré : base {vendor}, PostgreSQL requis"))
+            modes.remove('pooled')
+
+        created = []
+        connection_created.connect(lambda sender, connection, **kwargs: created.append(connection.alias), weak=False)
+
+        self.stdout.write(f"{options['requests']} requêtes par mode, {options['threads']} thread(s)\n")
+        self.stdout.write("mode         connexions  connect moy. (ms)  p50 (ms)  p99 (ms)  total (s)")
+        for mode in modes:
+            alias = f'bench_{mode}'
+            connections.settings[alias] = self._settings_for(mode)
+            created.clear()
+            # Une requête de chauffe pour exclure le premier import du backend
+            self._run(alias, 1, 1)
+            created.clear()
+            pooled_before = get_pool_stats().get(alias, {}).get('connections_created', 0)
+            results, elapsed = self._run(alias, options['requests'], options['threads'])
+            opened = len(created)
+            if mode == 'pooled':
+                # Les emprunts déclenchent connection_created ; on compte les connexions physiques
+                opened = get_pool_stats()[alias]['connections_created'] - pooled_before
+            connect_times = [connect for connect, _ in results]
+            totals = sorted(total for _, total in results)
+            self.stdout.write(
+                f"{mode:<12} {opened:>10}  {sum(connect_times) / len(results) * 1000:>17.3f}  "
+                f"{percentile(totals, 50) * 1000:>8.2f}  {percentile(totals, 99) * 1000:>8.2f}  {elapsed:>9.2f}"
+            )
+            connections[alias].close()
+
+        self.stdout.write('')
+        for mode in modes:
+            self.stdout.write(f"  {mode:<12} {MODES[mode]}")
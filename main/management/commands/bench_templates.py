@@ -0,0 +1,69 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main import template_bench
+
+
+class Command(BaseCommand):
+    help = "Mesure le coût de rendu de chaque template avec des contextes synthétiques de taille croissante"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--templates', default='*', help="Motif glob sur les chemins (ex. dashboard/*)")
+        parser.add_argument('--sizes', default='1,10,100,1000', help="Nombre d'éléments des séquences de premier niveau")
+        parser.add_argument('--inner', type=int, default=5, help="Nombre d'éléments des séquences imbriquées")
+        parser.add_argument('--min-time', type=float, default=0.2, help="Durée minimale de mesure par taille (s)")
+        parser.add_argument('--sort', choices=['time', 'memory', 'name'], default='time')
+        parser.add_argument('--json', dest='json_path', help="Écrit aussi les résultats dans ce fichier")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        names = template_bench.template_names(options['templates'])
+        if not names:
+            raise CommandError(f"Aucun template ne correspond à {options['templates']}")
+
+        request = template_bench.bench_request()
+        reserved = template_bench.processor_names(request)
+        results = []
+        for name in names:
+            results.append(template_bench.bench(name, sizes, options['inner'], options['min_time'], request, reserved))
+
+        largest = sizes[-1]
+
+        def key(result):
+            measure = result['sizes'].get(largest)
+            if options['sort'] == 'name' or measure is None:
+                return (measure is None, result['template'])
+            return (False, -measure['ms' if options['sort'] == 'time' else 'peak_kb'])
+
+        results.sort(key=key)
+        header = ''.join(f"{f'ms n={size}':>11}" for size in sizes)
+        self.stdout.write(
+            f"{'template':<44} {'lignes':>6}{header} {'pic Ko':>9} {'url()':>6} {'SQL':>4} {'alertes':>7}"
+        )
+        for result in results:
+            if result['error']:
+                self.stdout.write(f"{result['template'][:44]:<44} {result['lines']:>6}  erreur : {result['error']}")
+                continue
+            measures = result['sizes']
+            times = ''.join(f"{measures[size]['ms']:>11.2f}" for size in sizes)
+            last = measures[largest]
+            self.stdout.write(
+                f"{result['template'][:44]:<44} {result['lines']:>6}{times} {last['peak_kb']:>9.0f} "
+                f"{last['storage_urls']:>6} {last['queries']:>4} {len(result['flags']):>7}"
+            )
+        self.stdout.write(
+            f"Durée moyenne d'un rendu (ms), pic mémoire, appels à storage.url() et requêtes SQL pour n={largest}"
+        )
+
+        flagged = [result for result in results if result['flags']]
+        if flagged:
+            self.stdout.write("\nConstructions coûteuses")
+            for result in flagged:
+                self.stdout.write(self.style.WARNING(result['template']))
+                for line, message in result['flags']:
+                    self.stdout.write(f"  ligne {line:>4} : {message}")
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2, default=str)
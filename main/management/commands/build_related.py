@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main import related
+
+
+class Command(BaseCommand):
+    help = "Recalcule les contenus associés (services, formations, offres) affichés sur les pages de détail"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kinds', nargs='*', help=f"Types à recalculer parmi {', '.join(related.KINDS)} (tous par défaut)")
+
+    def handle(self, *args, **options):
+        unknown = set(options['kinds']) - set(related.KINDS)
+        if unknown:
+            raise CommandError(f"Type(s) inconnu(s) : {', '.join(sorted(unknown))}")
+        for name in options['kinds'] or related.KINDS:
+            stats = related.build(related.KINDS[name])
+            self.stdout.write(self.style.SUCCESS(
+                f"{name} : {stats['items']} élément(s), {stats['links']} lien(s) en {stats['seconds']:.2f} s"
+            ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from main import expiry
+
+
+class Command(BaseCommand):
+    help = "Désactive les offres d'emploi dont la date limite de candidature est passée"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Offres désactivées par UPDATE (JOB_OFFER_EXPIRY_BATCH_SIZE par défaut)")
+        parser.add_argument('--dry-run', action='store_true', help="Compte les offres expirées sans les désactiver")
+
+    def handle(self, *args, **options):
+        stats = expiry.expire_offers(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        verb = "à désactiver" if options['dry_run'] else "désactivée(s)"
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['count']} offre(s) expirée(s) {verb} en {stats['seconds']:.2f} s"
+        ))
+        for titre in stats['titles']:
+            self.stdout.write(f"  {titre}")
@@ -0,0 +1,40 @@
+import os
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import imports
+from dashboard.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = "Importe en masse des services, formations ou offres d'emploi depuis un fichier CSV, JSON ou JSON Lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', nargs='?', help=f"Contenu importé parmi {', '.join(imports.KINDS)}")
+        parser.add_argument('path', nargs='?', help="Fichier à importer")
+        parser.add_argument('--pending', action='store_true',
+                            help="Traite les imports du dashboard restés en attente ou interrompus par un redémarrage")
+
+    def handle(self, *args, **options):
+        if options['pending']:
+            jobs = list(ImportJob.objects.filter(status__in=['pending', 'running']).order_by('created_at'))
+        else:
+            kind, path = options['kind'], options['path']
+            if kind not in imports.KINDS or not path:
+                raise CommandError(f"Usage : import_content {{{','.join(imports.KINDS)}}} FICHIER")
+            if not os.path.isfile(path):
+                raise CommandError(f"Fichier introuvable : {path}")
+            name = os.path.basename(path)
+            with open(path, 'rb') as handle:
+                jobs = [ImportJob.objects.create(kind=kind, file=File(handle, name=name), file_name=name)]
+        for job in jobs:
+            job = imports.run(job)
+            style = self.style.SUCCESS if job.status == 'done' else self.style.ERROR
+            self.stdout.write(style(
+                f"{job.file_name} : {job.rows} ligne(s), {job.created} créé(s), {job.updated} mis à jour, "
+                f"{job.failed} refusé(s){' - ' + job.message if job.message else ''}"
+            ))
+            for error in job.errors[:20]:
+                for field, messages in error['erreurs'].items():
+                    self.stdout.write(f"  ligne {error['ligne']} {field} : {' '.join(messages)}")
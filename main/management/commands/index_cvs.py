@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from main import cv_index
+from main.models import Candidature, CandidatureSpontanee
+
+
+def _init_worker():
+    # Connexions héritées du parent : jamais réutilisées dans l'enfant
+    for conn in connections.all(initialized_only=True):
+        conn.connection = None
+
+
+def _analyse(name, max_chars):
+    return name, cv_index.analyse_stored(name, max_chars)
+
+
+def _save(entries):
+    cv_index.save_results(entries)
+    return len(entries)
+
+
+class Command(BaseCommand):
+    help = "Indexe le texte et les compétences des CV de candidatures non encore indexés (ou de tous avec --all)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Réindexe tous les CV, même déjà indexés")
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def pending(self, reindex):
+        """[(type, pk, nom du fichier)] des candidatures dont le CV n'est pas indexé dans sa version actuelle"""
+        from django.db.models import F
+
+        rows = []
+        for kind, model in (('normal', Candidature), ('spontaneous', CandidatureSpontanee)):
+            queryset = model.objects.exclude(cv='')
+            if not reindex:
+                queryset = queryset.exclude(cv_document__fichier=F('cv'), cv_document__statut__in=['indexe', 'echec'])
+            rows += [(kind, pk, name) for pk, name in queryset.order_by('pk').values_list('pk', 'cv').iterator()]
+        return rows
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = self.pending(options['all'])
+        names = sorted({name for _, _, name in rows})
+        self.stdout.write(f"{len(rows)} candidature(s) à indexer, {len(names)} fichier(s) distinct(s)")
+        if not rows:
+            return
+
+        # Chaque fichier n'est analysé qu'une fois, même partagé par plusieurs candidatures
+        max_chars = settings.CV_INDEX_MAX_CHARS
+        processes = max(options['processes'], 1)
+        batch_size = options['batch_size']
+        if connection.vendor == 'sqlite':
+            # Un seul écrivain à la fois et nombre de paramètres limité
+            processes = 1
+            batch_size = min(batch_size, 500)
+        executor = None
+        if processes > 1:
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                processes, mp_context=multiprocessing.get_context('fork'), initializer=_init_worker,
+            )
+        try:
+            if executor:
+                results = dict(executor.map(_analyse, names, [max_chars] * len(names), chunksize=8))
+            else:
+                results = dict(_analyse(name, max_chars) for name in names)
+            analysed = time.perf_counter()
+            failed = sum(1 for result in results.values() if result['erreur'])
+            self.stdout.write(f"Analyse : {analysed - started:.1f} s, {failed} fichier(s) en échec")
+
+            batches = (
+                [(kind, pk, name, results[name]) for kind, pk, name in rows[start:start + batch_size]]
+                for start in range(0, len(rows), batch_size)
+            )
+            saved = sum(executor.map(_save, batches) if executor else map(_save, batches))
+        finally:
+            if executor:
+                executor.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f"{saved} CV indexé(s) en {time.perf_counter() - started:.1f} s "
+            f"(enregistrement : {time.perf_counter() - analysed:.1f} s)"
+        ))
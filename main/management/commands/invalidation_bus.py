@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main import invalidation
+
+
+class Command(BaseCommand):
+    help = "Écoute ou publie des événements sur le bus d'invalidation (test local à deux processus)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['listen', 'publish'])
+        parser.add_argument('topic', nargs='?', help="Sujet à publier, ex. table:main_service ou key:site_config:active")
+
+    def handle(self, *args, **options):
+        if options['action'] == 'publish':
+            if not options['topic']:
+                raise CommandError("Un sujet est requis pour publish")
+            invalidation.publish(options['topic'])
+            self.stdout.write(self.style.SUCCESS(f"Publié : {options['topic']}"))
+            return
+
+        def show(topic, other_host=False):
+            origin = " (autre machine)" if other_host else ""
+            self.stdout.write(f"{time.strftime('%H:%M:%S')} reçu : {topic}{origin}")
+            invalidation.dispatch(topic, other_host=other_host)
+
+        listener = invalidation.Listener(on_event=show)
+        listener.start()
+        self.stdout.write(f"Écoute du bus ({listener.origin}), Ctrl+C pour arrêter")
+        try:
+            while listener.is_alive():
+                listener.join(1)
+        except KeyboardInterrupt:
+            listener.stop()
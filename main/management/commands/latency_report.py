@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from globaltit_site import metrics
+
+
+class Command(BaseCommand):
+    help = "Affiche les latences par vue (p50/p90/p99) agrégées sur tous les workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', choices=['count', 'p50', 'p99', 'mean'], default='p99')
+
+    def handle(self, *args, **options):
+        totals = metrics.collect()
+        series = metrics.histograms('request_duration_ms', totals)
+        if not series:
+            self.stdout.write(f"Aucune mesure dans {metrics.metrics_dir()}")
+            return
+
+        def counter(name, view):
+            return totals.get((name, (('view', view),), ''), 0.0)
+
+        self.stdout.write(
+            f"{'vue':<40} {'requêtes':>9} {'moy.':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'SQL/req':>8} {'SQL ms':>8} {'tpl ms':>8}"
+        )
+        for entry in sorted(series, key=lambda e: e[options['sort']], reverse=True):
+            view, count = entry['labels']['view'], entry['count']
+            self.stdout.write(
+                f"{view[:40]:<40} {count:>9} {entry['mean']:>8.1f} {entry['p50']:>8.1f} {entry['p90']:>8.1f} "
+                f"{entry['p99']:>8.1f} {counter('db_queries_total', view) / count:>8.1f} "
+                f"{counter('db_time_ms_total', view) / count:>8.1f} {counter('template_time_ms_total', view) / count:>8.1f}"
+            )
+        self.stdout.write("Durées en millisecondes (p50/p90/p99 : borne haute de la classe, précision 12,5 %)")
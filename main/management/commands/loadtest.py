@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import secrets
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main import loadtest
+from main.benchmarks import wait_for_server
+
+
+class Command(BaseCommand):
+    help = "Essai de charge par scénarios, rapport JSON et comparaison avec une référence"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', default='visitor,jobs,editor',
+                            help=f"Scénarios séparés par des virgules parmi {', '.join(loadtest.SCENARIOS)}")
+        parser.add_argument('--users', type=int, default=20, help="Utilisateurs virtuels, répartis entre les scénarios")
+        parser.add_argument('--duration', type=float, default=30, help="Durée de l'essai (secondes)")
+        parser.add_argument('--seed', dest='seed_value', type=int, default=1, help="Graine des choix aléatoires")
+        parser.add_argument('--url', help="Serveur déjà démarré ; sinon gunicorn est lancé localement")
+        parser.add_argument('--mode', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--port', type=int, default=8110)
+        parser.add_argument('--seed-data', action='store_true',
+                            help="Complète la base (compte staff loadtest et contenus publics) : base d'essai uniquement")
+        parser.add_argument('--password', default=os.environ.get('LOADTEST_PASSWORD') or None,
+                            help="Mot de passe du compte staff loadtest (sinon LOADTEST_PASSWORD ; "
+                                 "avec --seed-data, un mot de passe aléatoire par essai)")
+        parser.add_argument('--output', default='loadtest-report.json', help="Rapport JSON")
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'loadtest-baseline.json'),
+                            help="Rapport de référence")
+        parser.add_argument('--save-baseline', action='store_true', help="Enregistre ce rapport comme référence")
+        parser.add_argument('--tolerance', type=float, default=10, help="Écart toléré avant régression (%%)")
+
+    def _start(self, mode, port, workers):
+        env = dict(os.environ)
+        # Les demandes envoyées par les scénarios ne partent pas par e-mail
+        env['EMAIL_DELIVERY_BACKEND'] = 'django.core.mail.backends.dummy.EmailBackend'
+        bind = f"127.0.0.1:{port}"
+        if mode == 'wsgi':
+            env['ASYNC_VIEWS'] = 'False'
+            args = ['globaltit_site.wsgi:application', '-b', bind, '-w', str(workers)]
+        else:
+            args = ['-c', str(settings.BASE_DIR / 'gunicorn_asgi.conf.py'), 'globaltit_site.asgi:application',
+                    '-b', bind, '-w', str(workers)]
+        return subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--log-level', 'warning', *args],
+            cwd=settings.BASE_DIR, env=env,
+        )
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(names) - set(loadtest.SCENARIOS)
+        if unknown:
+            raise CommandError(f"Scénarios inconnus : {', '.join(sorted(unknown))}")
+        if options['users'] < len(names):
+            raise CommandError("Il faut au moins un utilisateur virtuel par scénario")
+
+        password = options['password']
+        if options['seed_data']:
+            # Pas de mot de passe connu d'avance : le compte créé ne sert qu'à cet essai
+            password = password or secrets.token_urlsafe(24)
+            data = loadtest.seed(password)
+        else:
+            if 'editor' in names and not password:
+                raise CommandError(
+                    f"Le scénario editor se connecte avec le compte staff {loadtest.LOADTEST_USERNAME} : "
+                    "indiquer --password (ou LOADTEST_PASSWORD), ou --seed-data sur une base d'essai"
+                )
+            data = loadtest.fixtures()
+        data['password'] = password
+        if not data['formations'] or not data['job_offers'] or not data['services']:
+            raise CommandError("Aucune formation, offre ou service actif : relancer avec --seed-data sur une base d'essai")
+
+        server = None
+        base_url = options['url']
+        if not base_url:
+            server = self._start(options['mode'], options['port'], options['workers'])
+            base_url = f"http://127.0.0.1:{options['port']}"
+        try:
+            if not asyncio.run(wait_for_server(base_url)):
+                raise CommandError(f"Le serveur ne répond pas sur {base_url}")
+            # Tour de chauffe : caches remplis, connexions ouvertes
+            asyncio.run(loadtest.run_scenarios(base_url, names, len(names), 2, data, options['seed_value']))
+            results = asyncio.run(loadtest.run_scenarios(
+                base_url, names, options['users'], options['duration'], data, options['seed_value'],
+            ))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+        report = {'meta': loadtest.report_meta(options), **results}
+        self.print_report(report)
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(f"\nRapport écrit dans {options['output']}")
+
+        if options['save_baseline']:
+            with open(options['baseline'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Référence enregistrée dans {options['baseline']}")
+        elif os.path.exists(options['baseline']):
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            self.print_comparison(loadtest.compare(report, baseline, options['tolerance'] / 100))
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{'scénario / étape':<32} {'requêtes':>9} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'erreurs':>8}"
+        )
+        for name, scenario in report['scenarios'].items():
+            rows = [(name, scenario), *((f"  {step}", summary) for step, summary in scenario['steps'].items())]
+            for label, summary in rows:
+                self.stdout.write(
+                    f"{label[:32]:<32} {summary['requests']:>9} {summary['throughput']:>8} {summary['p50_ms']:>8} "
+                    f"{summary['p95_ms']:>8} {summary['p99_ms']:>8} {summary['error_rate']:>8.2%}"
+                )
+        total = report['total']
+        self.stdout.write(
+            f"{'total':<32} {total['requests']:>9} {total['throughput']:>8} {total['p50_ms']:>8} "
+            f"{total['p95_ms']:>8} {total['p99_ms']:>8} {total['error_rate']:>8.2%}"
+        )
+        self.stdout.write("Latences en millisecondes")
+
+    def print_comparison(self, rows):
+        if not rows:
+            self.stdout.write("Aucun scénario commun avec la référence")
+            return
+        self.stdout.write(f"\n{'scénario':<12} {'indicateur':<12} {'référence':>10} {'mesure':>10} {'écart':>9}")
+        regressions = 0
+        for scenario, key, before, after, change, regression in rows:
+            regressions += regression
+            change_text = f"{change * 100:+.1f} pt" if key == 'error_rate' else f"{change:+.1%}"
+            line = f"{scenario:<12} {key:<12} {before:>10} {after:>10} {change_text:>9}"
+            self.stdout.write(self.style.ERROR(line + '  régression') if regression else line)
+        if regressions:
+            raise CommandError(f"{regressions} régression(s) par rapport à la référence")
+        self.stdout.write(self.style.SUCCESS("Aucune régression par rapport à la référence"))
@@ -0,0 +1,31 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from main import matching
+
+
+class Command(BaseCommand):
+    help = "Recalcule le rapprochement candidatures spontanées / offres actives (TF-IDF) s'il n'est plus à jour"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Repart de zéro : revectorise toutes les lignes")
+
+    def handle(self, *args, **options):
+        if options['rebuild'] and os.path.exists(matching.Engine.path()):
+            os.remove(matching.Engine.path())
+        engine = matching.Engine()
+        stats = engine.refresh(blocking=True)
+        if stats is None:
+            self.stdout.write(
+                f"Déjà à jour : {len(engine.candidates.ids)} candidature(s), {len(engine.offers.ids)} offre(s)"
+            )
+            return
+        self.stdout.write(
+            f"{stats['candidates']} candidature(s), {stats['offers']} offre(s) ; "
+            f"revectorisées : {stats['vectorized_candidates']} candidature(s), {stats['vectorized_offers']} offre(s), "
+            f"retirées : {stats['removed_candidates']} / {stats['removed_offers']}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Vectorisation {stats['vectorize_s']:.2f} s, rapprochement {stats['match_s']:.2f} s"
+        ))
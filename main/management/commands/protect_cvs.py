@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from globaltit_site.storage import cv_storage
+from main.models import Candidature, CandidatureSpontanee
+
+
+class Command(BaseCommand):
+    help = "Retire l'adresse publique Cloudinary des CV envoyés avant le stockage privé"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Compte les CV sans les modifier")
+
+    def handle(self, *args, **options):
+        storage = cv_storage()
+        if not hasattr(storage, 'protect'):
+            raise CommandError("CV_STORAGE n'est pas un stockage Cloudinary privé : rien à faire")
+        names = set()
+        for model in (Candidature, CandidatureSpontanee):
+            names.update(model.objects.exclude(cv='').values_list('cv', flat=True))
+        if options['dry_run']:
+            self.stdout.write(f"{len(names)} CV à vérifier")
+            return
+        protected = failed = 0
+        for name in sorted(names):
+            try:
+                protected += storage.protect(name)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"  {name} : {e}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{protected} CV rendu(s) privé(s), {len(names) - protected - failed} déjà privé(s) ou absent(s)"
+        ))
+        if failed:
+            raise CommandError(f"{failed} CV non traité(s)")
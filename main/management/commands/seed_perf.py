@@ -0,0 +1,177 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+
+from main import invalidation, perf_data
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+    # Connexions héritées du parent : jamais réutilisées dans l'enfant
+    for conn in connections.all(initialized_only=True):
+        conn.connection = None
+
+
+def _fill(key, chunk, start, count, context, batch_size):
+    model, rows = perf_data.build_rows(key, chunk, start, count, context)
+    perf_data.keep_given_dates(model)
+    with transaction.atomic():
+        model._base_manager.bulk_create(rows, batch_size=batch_size)
+    return key, len(rows)
+
+
+class Command(BaseCommand):
+    help = "Génère de gros volumes de données réalistes et reproductibles pour les mesures de performance"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help="Multiplie les volumes par défaut (1.0 ≈ 1 million de lignes)")
+        parser.add_argument('--counts', default='',
+                            help="Volumes explicites, ex. contact=5000,product=20000")
+        parser.add_argument('--only', default='', help="Ne générer que ces modèles (clés séparées par des virgules)")
+        parser.add_argument('--seed', type=int, default=42, help="Graine : mêmes données à graine égale")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Lignes par lot (et par tâche)")
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help="Processus d'insertion (1 forcé sur SQLite)")
+        parser.add_argument('--images', type=int, default=50, help="Fichiers image réels partagés par les lignes")
+        parser.add_argument('--cvs', type=int, default=50, help="CV PDF réels partagés par les candidatures")
+        parser.add_argument('--users', type=int, default=20, help="Comptes auteurs des activités du dashboard")
+        parser.add_argument('--clear', action='store_true',
+                            help="Supprime d'abord les lignes générées précédemment (modèles sélectionnés)")
+
+    def volumes(self, options):
+        volumes = {key: int(default * options['scale']) for key, _, _, default, _ in perf_data.PLAN}
+        explicit = set()
+        for item in filter(None, (part.strip() for part in options['counts'].split(','))):
+            key, _, value = item.partition('=')
+            if key not in volumes or not value.isdigit():
+                raise CommandError(f"Volume invalide : {item} (clés : {', '.join(volumes)})")
+            volumes[key] = int(value)
+            explicit.add(key)
+        # Petite échelle : un parent arrondi à 0 garde au moins une ligne si ses dépendants en ont
+        for key, _, _, _, parents in perf_data.PLAN:
+            if volumes[key]:
+                for parent in parents:
+                    if parent not in explicit:
+                        volumes[parent] = max(volumes[parent], 1)
+        if options['only']:
+            only = {key.strip() for key in options['only'].split(',')}
+            unknown = only - set(volumes)
+            if unknown:
+                raise CommandError(f"Modèles inconnus : {', '.join(sorted(unknown))}")
+            volumes = {key: value for key, value in volumes.items() if key in only}
+        return volumes
+
+    def clear(self, keys):
+        from django.db.models.deletion import Collector
+
+        # Ordre inverse du plan : les lignes dépendantes partent d'abord
+        for key, *_ in reversed(perf_data.PLAN):
+            if key not in keys:
+                continue
+            queryset = perf_data.marked(key)
+            # Suppression directe en SQL : les lignes générées n'ont pas de fichiers propres ni de signaux utiles
+            if Collector(using=queryset.db).can_fast_delete(queryset):
+                deleted = queryset._raw_delete(queryset.db)
+            else:
+                deleted, _ = queryset.delete()
+            if deleted:
+                self.stdout.write(f"{key:<24} {deleted:>10} lignes supprimées")
+
+    def users(self, count):
+        from django.contrib.auth.models import User
+
+        ids = []
+        for index in range(count):
+            user, _ = User.objects.get_or_create(
+                username=f'perf_user_{index}',
+                defaults={'email': f'perf_user_{index}@{perf_data.EMAIL_DOMAIN}', 'is_staff': True},
+            )
+            ids.append(user.pk)
+        return ids
+
+    def handle(self, *args, **options):
+        volumes = self.volumes(options)
+        processes = max(options['processes'], 1)
+        if connection.vendor == 'sqlite':
+            # Un seul écrivain à la fois sur SQLite
+            processes = 1
+
+        if options['clear']:
+            self.clear(volumes)
+
+        context = {
+            'seed': options['seed'],
+            'users': self.users(options['users']),
+            'files': perf_data.create_files(options['seed'], options['images'], options['cvs']),
+        }
+        phases, done = [], set()
+        remaining = [entry for entry in perf_data.PLAN if entry[0] in volumes]
+        while remaining:
+            ready = [entry for entry in remaining if all(dep in done or dep not in volumes for dep in entry[4])]
+            phases.append([entry[0] for entry in ready])
+            done.update(phases[-1])
+            remaining = [entry for entry in remaining if entry not in ready]
+
+        batch_size = options['batch_size']
+        executor = None
+        if processes > 1:
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                processes, mp_context=multiprocessing.get_context('fork'), initializer=_init_worker,
+            )
+        started = time.perf_counter()
+        try:
+            for phase in phases:
+                # Clés étrangères : identifiants existants des modèles parents
+                for key in ('service', 'formation', 'offre_emploi', 'category'):
+                    if key not in context:
+                        label, _ = perf_data.GENERATORS[key]
+                        context[key] = list(perf_data.resolve_model(label)._base_manager.values_list('pk', flat=True))
+                for key in phase:
+                    if key in ('candidature', 'product'):
+                        parent = 'offre_emploi' if key == 'candidature' else 'category'
+                        if not context[parent]:
+                            raise CommandError(f"{key} : aucune ligne {parent} à laquelle se rattacher")
+                tasks = [
+                    (key, chunk, start, min(batch_size, volumes[key] - start), context, batch_size)
+                    for key in phase
+                    for chunk, start in enumerate(range(0, volumes[key], batch_size))
+                ]
+                phase_start = time.perf_counter()
+                totals = dict.fromkeys(phase, 0)
+                if executor is not None:
+                    for key, count in executor.map(_fill, *zip(*tasks)) if tasks else ():
+                        totals[key] += count
+                else:
+                    for task in tasks:
+                        key, count = _fill(*task)
+                        totals[key] += count
+                elapsed = time.perf_counter() - phase_start
+                for key in phase:
+                    self.stdout.write(f"{key:<24} {totals[key]:>10} lignes")
+                    context.pop(key, None)
+                self.stdout.write(f"  phase terminée en {elapsed:.1f} s")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        # bulk_create n'émet pas post_save : invalider les caches des modèles remplis
+        for key in volumes:
+            label, _ = perf_data.GENERATORS[key]
+            if label not in perf_data.HISTORICAL:
+                invalidation.invalidate_model(perf_data.resolve_model(label))
+
+        total = sum(volumes.values())
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} lignes en {elapsed:.1f} s ({total / elapsed if elapsed else 0:.0f} lignes/s, {processes} processus)"
+        ))
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from globaltit_site import tracing
+
+
+def _duration_ms(item):
+    return (int(item['endTimeUnixNano']) - int(item['startTimeUnixNano'])) / 1e6
+
+
+def _attribute(item, key):
+    for attribute in item.get('attributes', []):
+        if attribute['key'] == key:
+            return next(iter(attribute['value'].values()))
+    return None
+
+
+class Command(BaseCommand):
+    help = "Liste les traces les plus lentes de TRACING_DIR ou affiche l'arbre des spans d'une trace"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trace', help="Identifiant de la trace à détailler (préfixe accepté)")
+        parser.add_argument('--name', help="Ne garder que les traces dont le span racine contient ce texte")
+        parser.add_argument('--limit', type=int, default=20)
+
+    def handle(self, *args, **options):
+        traces = tracing.load_traces()
+        if not traces:
+            self.stdout.write("Aucune trace enregistrée (TRACING=True pour les activer)")
+            return
+        if options['trace']:
+            matches = [trace_id for trace_id in traces if trace_id.startswith(options['trace'])]
+            if len(matches) != 1:
+                raise CommandError(f"{len(matches)} trace(s) correspondent à {options['trace']}")
+            self.print_tree(traces[matches[0]])
+            return
+
+        roots = []
+        for trace_id, spans in traces.items():
+            ids = {item['spanId'] for item in spans}
+            root = min((item for item in spans if item['parentSpanId'] not in ids), key=lambda item: int(item['startTimeUnixNano']))
+            if options['name'] and options['name'] not in root['name']:
+                continue
+            roots.append((_duration_ms(root), len(spans), trace_id, root['name']))
+
+        self.stdout.write(f"{'durée ms':>9} {'spans':>6}  {'trace':<32}  racine")
+        for duration, count, trace_id, name in sorted(roots, reverse=True)[:options['limit']]:
+            self.stdout.write(f"{duration:>9.1f} {count:>6}  {trace_id}  {name}")
+
+    def print_tree(self, spans):
+        children = {}
+        ids = {item['spanId'] for item in spans}
+        for item in sorted(spans, key=lambda item: int(item['startTimeUnixNano'])):
+            parent = item['parentSpanId'] if item['parentSpanId'] in ids else None
+            children.setdefault(parent, []).append(item)
+        origin = min(int(item['startTimeUnixNano']) for item in spans)
+
+        def walk(parent, depth):
+            for item in children.get(parent, []):
+                offset = (int(item['startTimeUnixNano']) - origin) / 1e6
+                detail = _attribute(item, 'db.statement') or _attribute(item, 'storage.name') or ''
+                error = ' [ERREUR]' if item.get('status', {}).get('code') == tracing.STATUS_ERROR else ''
+                self.stdout.write(
+                    f"{offset:>9.1f} {_duration_ms(item):>9.1f}  {'  ' * depth}{item['name']}{error}"
+                    + (f"  {detail[:100]}" if detail else '')
+                )
+                walk(item['spanId'], depth + 1)
+
+        self.stdout.write(f"{'début ms':>9} {'durée ms':>9}  span")
+        walk(None, 0)
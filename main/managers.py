@@ -0,0 +1,89 @@
+"""
+Cache des résultats de querysets versionné par table.
+
+`Service.objects.filter(est_actif=True).cached()` évalue le queryset une
+seule fois puis sert le résultat depuis le cache. La clé combine le SQL,
+ses paramètres et la version courante de chaque table lue par la requête :
+toute écriture sur l'une de ces tables (save, delete, mais aussi update(),
+bulk_create() et bulk_update()) change sa version au commit, ce qui rend
+les anciennes entrées inaccessibles sans avoir à les rechercher. Une
+lecture faite dans une transaction n'est pas mise en cache, car elle peut
+voir des lignes pas encore validées.
+
+Seules les tables des applications `main` et `dashboard` sont versionnées.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models
+
+from .invalidation import invalidate_model, table_versions
+
+DEFAULT_TIMEOUT = 300
+
+
+class CachedResult(list):
+    """Résultat mis en cache ; conserve count(), first() et exists() utilisés par les templates"""
+
+    def count(self, *args):
+        if args:
+            return super().count(*args)
+        return len(self)
+
+    def first(self):
+        return self[0] if self else None
+
+    def last(self):
+        return self[-1] if self else None
+
+    def exists(self):
+        return bool(self)
+
+
+class CachedQuerySet(models.QuerySet):
+
+    def cached(self, timeout=DEFAULT_TIMEOUT):
+        """Évalue le queryset via le cache (clé : SQL + paramètres + versions des tables)"""
+        if connections[self.db].in_atomic_block:
+            # Dans une transaction, les versions ne changent qu'au commit : rien n'est mis en cache
+            return CachedResult(self)
+        compiler = self.query.get_compiler(using=self.db)
+        try:
+            sql, params = compiler.as_sql()
+        except EmptyResultSet:
+            return CachedResult()
+        tables = {alias.table_name for alias in self.query.alias_map.values()}
+        tables.add(self.model._meta.db_table)
+        versions = table_versions(sorted(tables))
+        signature = repr((
+            self.db, sql, params, sorted(versions.items()),
+            self._iterable_class.__name__, self._fields, self._prefetch_related_lookups,
+        ))
+        key = 'qs:%s:%s' % (self.model._meta.db_table, hashlib.sha1(signature.encode()).hexdigest())
+        if self.db in settings.DATABASE_REPLICAS:
+            # Un réplica peut encore servir l'état d'avant la dernière écriture
+            timeout = min(timeout, settings.REPLICA_MAX_LAG)
+        return cache.get_or_set(key, lambda: CachedResult(self), timeout)
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        invalidate_model(self.model, using=self.db)
+        return rows
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        if created:
+            invalidate_model(self.model, using=self.db)
+        return created
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        rows = super().bulk_update(objs, fields, batch_size=batch_size)
+        invalidate_model(self.model, using=self.db)
+        return rows
+    bulk_update.alters_data = True
+
+
+CachedManager = models.Manager.from_queryset(CachedQuerySet)
@@ -0,0 +1,466 @@
+"""
+Rapprochement des candidatures spontanées et des offres d'emploi actives.
+
+Chaque document devient un vecteur TF-IDF creux (SciPy CSR) : le poste
+souhaité ou le titre de l'offre compte TITLE_WEIGHT fois, la lettre de
+motivation ou les missions et le profil recherché une fois. Les mots sont
+normalisés comme pour l'index des CV puis hachés sur FEATURES colonnes :
+l'espace des colonnes ne dépend pas du corpus, et une ligne modifiée se
+recalcule seule. Les matrices des termes sont tenues à jour de façon
+incrémentale : seules les lignes dont date_modification a changé sont
+revectorisées, les lignes disparues sont retirées.
+
+Les poids IDF, communs aux deux côtés, sont recalculés à chaque mise à
+jour à partir des matrices (un bincount des colonnes). Les scores
+(similarité cosinus) viennent d'un produit matriciel par blocs de
+candidatures, restreint aux colonnes présentes dans les offres (dense côté
+offres), dont on garde les k meilleures offres par candidature et les k
+meilleurs candidats par offre.
+
+Le résultat vaut pour une version des deux tables (versions du bus
+d'invalidation) : tant qu'aucune offre ni candidature spontanée ne change,
+les lectures ne coûtent qu'une recherche dichotomique. Après un changement,
+le recalcul part dans un thread d'arrière-plan et les lectures servent le
+résultat précédent en attendant. L'état complet est enregistré dans
+MATCHING_DIR, qu'un worker qui démarre, ou qui a pris du retard, recharge
+au lieu de tout recalculer. Un verrou de fichier garantit qu'un seul
+processus recalcule à la fois.
+"""
+import fcntl
+import functools
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+from scipy import sparse
+
+from globaltit_site import tracing
+
+from . import invalidation
+from .cv_index import normalize
+
+logger = logging.getLogger(__name__)
+
+FEATURES = 1 << 18
+TITLE_WEIGHT = 3
+BLOCK_ROWS = 4096
+FORMAT_VERSION = 1
+STOPWORDS = frozenset("""
+    a ai as au aux avec avoir bien c ce ces cet cette d dans de des du elle en est et etre ete il ils j je l la le
+    les leur leurs m ma mais me mes mon n ne nos notre nous on ou par pas plus pour qu que qui s sa se ses son sont
+    sur ta te tes ton tres tu un une vos votre vous y
+""".split())
+
+_TOKEN = re.compile(r'[a-z0-9][a-z0-9+#]*')
+
+
+def tokens(text):
+    return [token for token in _TOKEN.findall(normalize(text)) if token not in STOPWORDS]
+
+
+@functools.lru_cache(maxsize=FEATURES)
+def _feature(token):
+    # crc32 plutôt que hash() : identique d'un processus à l'autre
+    return zlib.crc32(token.encode()) & (FEATURES - 1)
+
+
+def vectorize(documents):
+    """Matrice CSR des fréquences (1 + log tf) pour des documents [(titre, corps)]"""
+    columns, lengths = [], []
+    for title, body in documents:
+        row = list(map(_feature, tokens(body)))
+        row += list(map(_feature, tokens(title))) * TITLE_WEIGHT
+        columns += row
+        lengths.append(len(row))
+    rows = np.repeat(np.arange(len(documents), dtype=np.int32), lengths)
+    # Les doublons (ligne, colonne) sont additionnés à la conversion : ce sont les fréquences
+    matrix = sparse.csr_matrix(
+        (np.ones(len(columns), dtype=np.float32), (rows, np.array(columns, dtype=np.int32))),
+        shape=(len(documents), FEATURES),
+    )
+    matrix.sum_duplicates()
+    matrix.data = 1.0 + np.log(matrix.data)
+    return matrix
+
+
+class Side:
+    """Lignes d'un côté du rapprochement : identifiants, dates de modification, fréquences"""
+
+    def __init__(self, ids=None, stamps=None, tf=None):
+        self.ids = np.empty(0, dtype=np.int64) if ids is None else ids
+        self.stamps = np.empty(0, dtype=np.float64) if stamps is None else stamps
+        self.tf = sparse.csr_matrix((0, FEATURES), dtype=np.float32) if tf is None else tf
+
+    def sync(self, rows, fetch):
+        """Aligne les lignes sur [(pk, date de modification)] ; fetch(pks) -> {pk: (titre, corps)}"""
+        ids = np.fromiter((pk for pk, _ in rows), dtype=np.int64, count=len(rows))
+        stamps = np.fromiter((stamp for _, stamp in rows), dtype=np.float64, count=len(rows))
+        known = dict(zip(self.ids.tolist(), self.stamps.tolist()))
+        fresh = np.fromiter(
+            (known.get(pk) != stamp for pk, stamp in zip(ids.tolist(), stamps.tolist())), dtype=bool, count=len(ids),
+        )
+        keep = np.isin(self.ids, ids[~fresh])
+        removed = len(self.ids) - int(np.isin(self.ids, ids).sum())
+        if not fresh.any() and not removed:
+            return 0, 0
+        texts = fetch(ids[fresh].tolist())
+        # Une ligne supprimée entre la liste et la lecture des textes reste vide jusqu'à la prochaine mise à jour
+        added = vectorize([texts.get(pk, ('', '')) for pk in ids[fresh].tolist()])
+        self.tf = sparse.vstack([self.tf[keep], added], format='csr')
+        self.ids = np.concatenate([self.ids[keep], ids[fresh]])
+        self.stamps = np.concatenate([self.stamps[keep], stamps[fresh]])
+        return int(fresh.sum()), removed
+
+
+def _weighted(tf, idf):
+    """Lignes TF-IDF de norme 1"""
+    matrix = tf @ sparse.diags(idf)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags((1.0 / norms).astype(np.float32)) @ matrix
+
+
+def _merge_columns(best, best_scores, rows, columns, scores):
+    """k meilleurs par colonne parmi les actuels (k x colonnes) et des entrées (ligne, colonne, score)"""
+    k, n_columns = best.shape
+    all_columns = np.concatenate([np.tile(np.arange(n_columns), k), columns])
+    all_rows = np.concatenate([best.ravel(), rows])
+    all_scores = np.concatenate([best_scores.ravel(), scores])
+    order = np.lexsort((-all_scores, all_columns))
+    sorted_columns = all_columns[order]
+    rank = np.arange(len(order)) - np.searchsorted(sorted_columns, np.arange(n_columns))[sorted_columns]
+    kept = order[rank < k]
+    return all_rows[kept].reshape(n_columns, k).T, all_scores[kept].reshape(n_columns, k).T
+
+
+def top_k(candidates, offers, k):
+    """(offres par candidature, candidats par offre) : indices de ligne et scores, triés par score décroissant"""
+    n_candidates, n_offers = candidates.shape[0], offers.shape[0]
+    k_offers, k_candidates = min(k, n_offers), min(k, n_candidates)
+    by_candidate = np.zeros((n_candidates, k_offers), dtype=np.int32)
+    by_candidate_scores = np.zeros((n_candidates, k_offers), dtype=np.float32)
+    by_offer = np.zeros((k_candidates, n_offers), dtype=np.int32)
+    by_offer_scores = np.full((k_candidates, n_offers), -1.0, dtype=np.float32)
+    if not k_offers or not k_candidates:
+        return by_candidate, by_candidate_scores, by_offer.T, by_offer_scores.T
+
+    # Seules les colonnes présentes dans les offres comptent : les offres tiennent alors en
+    # matrice dense, et chaque bloc est un produit creux x dense sans accumulateur creux
+    used = np.unique(offers.indices)
+    offers_t = np.ascontiguousarray(offers[:, used].T.toarray())
+    candidates = candidates[:, used].tocsr()
+    for start in range(0, n_candidates, BLOCK_ROWS):
+        scores = candidates[start:start + BLOCK_ROWS] @ offers_t
+        rows = scores.shape[0]
+
+        best = np.argpartition(scores, n_offers - k_offers, axis=1)[:, -k_offers:]
+        by_candidate[start:start + rows] = best
+        by_candidate_scores[start:start + rows] = np.take_along_axis(scores, best, axis=1)
+
+        # Candidats par offre : seuls les scores au-dessus du k-ième actuel de chaque offre comptent
+        above = scores > by_offer_scores.min(axis=0)
+        if np.count_nonzero(above) * 16 <= scores.size:
+            rows_above, columns = np.nonzero(above)
+            by_offer, by_offer_scores = _merge_columns(
+                by_offer, by_offer_scores, rows_above + start, columns, scores[rows_above, columns],
+            )
+        else:
+            depth = min(k_candidates, rows)
+            transposed = np.ascontiguousarray(scores.T)
+            best = np.argpartition(transposed, rows - depth, axis=1)[:, -depth:]
+            by_offer, by_offer_scores = _merge_columns(
+                by_offer, by_offer_scores, (best + start).ravel(), np.repeat(np.arange(n_offers), depth),
+                np.take_along_axis(transposed, best, axis=1).ravel(),
+            )
+
+    order = np.argsort(-by_candidate_scores, axis=1, kind='stable')
+    by_candidate = np.take_along_axis(by_candidate, order, axis=1)
+    by_candidate_scores = np.take_along_axis(by_candidate_scores, order, axis=1)
+    return by_candidate, by_candidate_scores, by_offer.T, by_offer_scores.T
+
+
+class Matches:
+    """Meilleurs rapprochements calculés pour une version des deux tables"""
+
+    def __init__(self, versions, candidate_ids, offer_ids, by_candidate, by_candidate_scores, by_offer,
+                 by_offer_scores):
+        self.versions = versions
+        self.candidate_ids = candidate_ids
+        self.offer_ids = offer_ids
+        self.by_candidate = by_candidate
+        self.by_candidate_scores = by_candidate_scores
+        self.by_offer = by_offer
+        self.by_offer_scores = by_offer_scores
+        self._candidate_order = np.argsort(candidate_ids, kind='stable')
+        self._offer_order = np.argsort(offer_ids, kind='stable')
+
+    @staticmethod
+    def _row(ids, order, pk):
+        position = np.searchsorted(ids, pk, sorter=order)
+        if position < len(ids) and ids[order[position]] == pk:
+            return order[position]
+        return None
+
+    def _pairs(self, targets, row_ids, row_scores, k):
+        pairs = [
+            (int(targets[index]), float(score))
+            for index, score in zip(row_ids, row_scores)
+            if score >= settings.MATCHING_MIN_SCORE
+        ]
+        return pairs[:k]
+
+    def offers_for(self, candidate_pk, k):
+        row = self._row(self.candidate_ids, self._candidate_order, candidate_pk)
+        if row is None:
+            return []
+        return self._pairs(self.offer_ids, self.by_candidate[row], self.by_candidate_scores[row], k)
+
+    def candidates_for(self, offer_pk, k):
+        row = self._row(self.offer_ids, self._offer_order, offer_pk)
+        if row is None:
+            return []
+        return self._pairs(self.candidate_ids, self.by_offer[row], self.by_offer_scores[row], k)
+
+
+def _offer_rows():
+    from .models import OffreEmploi
+
+    return list(OffreEmploi.objects.filter(est_actif=True).order_by('pk').values_list('pk', 'date_modification'))
+
+
+def _offer_texts(pks):
+    from .models import OffreEmploi
+
+    texts = {}
+    for start in range(0, len(pks), 2000):
+        for pk, titre, missions, profil in OffreEmploi.objects.filter(pk__in=pks[start:start + 2000]).values_list(
+            'pk', 'titre', 'missions', 'profil_recherche',
+        ):
+            texts[pk] = (titre, f'{missions}\n{profil}')
+    return texts
+
+
+def _candidate_rows():
+    from .models import CandidatureSpontanee
+
+    return list(
+        CandidatureSpontanee.objects.exclude(statut='rejetee').order_by('pk').values_list('pk', 'date_modification')
+    )
+
+
+def _candidate_texts(pks):
+    from .models import CandidatureSpontanee
+
+    texts = {}
+    for start in range(0, len(pks), 2000):
+        for pk, poste, motivation in CandidatureSpontanee.objects.filter(pk__in=pks[start:start + 2000]).values_list(
+            'pk', 'poste_souhaite', 'motivation',
+        ):
+            texts[pk] = (poste, motivation)
+    return texts
+
+
+def _stamped(rows):
+    return [(pk, modified.timestamp()) for pk, modified in rows]
+
+
+def current_versions():
+    from .models import CandidatureSpontanee, OffreEmploi
+
+    tables = [OffreEmploi._meta.db_table, CandidatureSpontanee._meta.db_table]
+    versions = invalidation.table_versions(tables)
+    return '|'.join(str(versions[table]) for table in tables)
+
+
+class Engine:
+    """État du rapprochement dans un processus"""
+
+    def __init__(self):
+        self.candidates = Side()
+        self.offers = Side()
+        self.matches = None
+        self.state_versions = None
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # --- Fichier partagé entre workers -------------------------------------
+
+    @staticmethod
+    def path():
+        return os.path.join(settings.MATCHING_DIR, 'matching.npz')
+
+    def save(self):
+        matches = self.matches
+        os.makedirs(settings.MATCHING_DIR, exist_ok=True)
+        temporary = f'{self.path()}.{os.getpid()}.tmp'
+        arrays = {
+            'format': np.array(FORMAT_VERSION),
+            'versions': np.array(self.state_versions),
+            'by_candidate': matches.by_candidate,
+            'by_candidate_scores': matches.by_candidate_scores,
+            'by_offer': matches.by_offer,
+            'by_offer_scores': matches.by_offer_scores,
+        }
+        for name, side in (('candidates', self.candidates), ('offers', self.offers)):
+            arrays.update({
+                f'{name}_ids': side.ids,
+                f'{name}_stamps': side.stamps,
+                f'{name}_data': side.tf.data,
+                f'{name}_indices': side.tf.indices,
+                f'{name}_indptr': side.tf.indptr,
+            })
+        with open(temporary, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(temporary, self.path())
+
+    def load(self):
+        """Reprend l'état enregistré ; False si absent ou illisible"""
+        try:
+            with np.load(self.path()) as arrays:
+                if int(arrays['format']) != FORMAT_VERSION:
+                    return False
+                sides = {}
+                for name in ('candidates', 'offers'):
+                    ids = arrays[f'{name}_ids']
+                    tf = sparse.csr_matrix(
+                        (arrays[f'{name}_data'], arrays[f'{name}_indices'], arrays[f'{name}_indptr']),
+                        shape=(len(ids), FEATURES),
+                    )
+                    sides[name] = Side(ids, arrays[f'{name}_stamps'], tf)
+                versions = str(arrays['versions'])
+                matches = Matches(
+                    versions, sides['candidates'].ids, sides['offers'].ids, arrays['by_candidate'],
+                    arrays['by_candidate_scores'], arrays['by_offer'], arrays['by_offer_scores'],
+                )
+        except (OSError, KeyError, ValueError):
+            return False
+        self.candidates, self.offers = sides['candidates'], sides['offers']
+        self.matches, self.state_versions = matches, versions
+        return True
+
+    def _saved_versions(self):
+        try:
+            with np.load(self.path()) as arrays:
+                return str(arrays['versions'])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    # --- Calcul ---------------------------------------------------------------
+
+    def refresh(self, versions=None, blocking=True):
+        """Met l'état à jour pour les versions courantes des tables ; renvoie les statistiques du calcul"""
+        versions = versions or current_versions()
+        if self.state_versions == versions:
+            return None
+        if self._saved_versions() == versions and self.load():
+            return None
+        os.makedirs(settings.MATCHING_DIR, exist_ok=True)
+        with open(os.path.join(settings.MATCHING_DIR, 'matching.lock'), 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                # Un autre processus recalcule : son résultat sera repris à la prochaine lecture
+                return None
+            if self._saved_versions() == versions and self.load():
+                return None
+            if self.matches is None:
+                self.load()
+            stats = self.compute(versions)
+            self.save()
+        return stats
+
+    def compute(self, versions):
+        started = time.perf_counter()
+        changed_candidates = self.candidates.sync(_stamped(_candidate_rows()), _candidate_texts)
+        changed_offers = self.offers.sync(_stamped(_offer_rows()), _offer_texts)
+        vectorized = time.perf_counter()
+
+        documents = self.candidates.tf.shape[0] + self.offers.tf.shape[0]
+        frequencies = (
+            np.bincount(self.candidates.tf.indices, minlength=FEATURES)
+            + np.bincount(self.offers.tf.indices, minlength=FEATURES)
+        )
+        idf = (np.log((1.0 + documents) / (1.0 + frequencies)) + 1.0).astype(np.float32)
+        results = top_k(
+            _weighted(self.candidates.tf, idf), _weighted(self.offers.tf, idf), settings.MATCHING_TOP_K,
+        )
+        self.matches = Matches(versions, self.candidates.ids, self.offers.ids, *results)
+        self.state_versions = versions
+        self.stats = {
+            'candidates': len(self.candidates.ids),
+            'offers': len(self.offers.ids),
+            'vectorized_candidates': changed_candidates[0],
+            'removed_candidates': changed_candidates[1],
+            'vectorized_offers': changed_offers[0],
+            'removed_offers': changed_offers[1],
+            'vectorize_s': vectorized - started,
+            'match_s': time.perf_counter() - vectorized,
+            'computed_at': time.time(),
+        }
+        return self.stats
+
+    def _run(self, versions):
+        close_old_connections()
+        try:
+            with tracing.span('job.matching'):
+                self.refresh(versions, blocking=False)
+        except Exception:
+            logger.exception("Impossible de recalculer le rapprochement candidatures / offres")
+        finally:
+            close_old_connections()
+
+    def current(self):
+        """Résultat disponible (éventuellement celui de la version précédente) ; recalcul lancé si besoin"""
+        versions = current_versions()
+        if self.matches is None:
+            # Worker qui démarre : l'état enregistré par un autre processus, même ancien, vaut mieux que rien
+            with self._lock:
+                if self.matches is None:
+                    self.load()
+        if self.state_versions != versions:
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(
+                        target=self._run, args=(versions,), name='matching', daemon=True,
+                    )
+                    self._thread.start()
+        return self.matches, self.state_versions == versions
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine():
+    """Moteur du processus courant (un nouveau après un fork)"""
+    pid = os.getpid()
+    engine = _engines.get(pid)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(pid)
+            if engine is None:
+                engine = _engines[pid] = Engine()
+    return engine
+
+
+def offers_for_candidate(pk, k=None):
+    """([(pk de l'offre, score)], à jour) pour une candidature spontanée"""
+    matches, fresh = get_engine().current()
+    if matches is None:
+        return None, False
+    return matches.offers_for(pk, k or settings.MATCHING_TOP_K), fresh
+
+
+def candidates_for_offer(pk, k=None):
+    """([(pk de la candidature spontanée, score)], à jour) pour une offre active"""
+    matches, fresh = get_engine().current()
+    if matches is None:
+        return None, False
+    return matches.candidates_for(pk, k or settings.MATCHING_TOP_K), fresh
@@ -0,0 +1,136 @@
+"""
+Export des métriques au format texte Prometheus (/metrics).
+
+Les valeurs viennent des fichiers partagés de globaltit_site.metrics et
+couvrent donc tous les workers, quel que soit celui qui répond. L'accès
+est réservé au porteur de METRICS_TOKEN (en-tête Authorization: Bearer)
+ou aux adresses de METRICS_ALLOWED_IPS.
+"""
+import hmac
+import ipaddress
+
+import psutil
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from globaltit_site import metrics
+
+PREFIX = 'globaltit_'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Bornes exportées : une classe sur quatre de l'histogramme interne suffit
+# aux requêtes histogram_quantile() et garde la sortie compacte
+EXPORTED_BUCKETS = [index for index in range(len(metrics.BUCKET_BOUNDS)) if index % 4 == 3]
+
+COUNTERS = {
+    'requests_total': "Requêtes traitées, par vue et classe de statut",
+    'db_queries_total': "Requêtes SQL exécutées, par vue",
+    'db_time_ms_total': "Temps passé en SQL (ms), par vue",
+    'template_time_ms_total': "Temps de rendu des templates (ms), par vue",
+    'cache_hits_total': "Succès du cache, par vue",
+    'cache_misses_total': "Défauts du cache, par vue",
+    'emails_sent_total': "E-mails envoyés",
+    'emails_failed_total': "E-mails en échec",
+}
+HISTOGRAMS = {
+    'request_duration_ms': ('request_duration_seconds', 1000, "Durée des requêtes, par vue"),
+    'email_send_duration_ms': ('email_send_duration_seconds', 1000, "Durée d'envoi des e-mails"),
+    'upload_duration_ms': ('upload_duration_seconds', 1000, "Durée de réception des envois de fichiers"),
+    'upload_size_kb': ('upload_size_bytes', 1 / 1024, "Taille des fichiers envoyés"),
+}
+
+
+def _allowed(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if supplied and hmac.compare_digest(supplied, token):
+            return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False) for network in settings.METRICS_ALLOWED_IPS)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render_metrics():
+    totals = metrics.collect()
+    lines = []
+
+    for name, description in COUNTERS.items():
+        series = [(labels, value) for (metric, labels, _), value in totals.items() if metric == name]
+        if not series:
+            continue
+        lines += [f'# HELP {PREFIX}{name} {description}', f'# TYPE {PREFIX}{name} counter']
+        lines += [f'{PREFIX}{name}{_labels(labels)} {_number(value)}' for labels, value in sorted(series)]
+
+    for source, (name, divisor, description) in HISTOGRAMS.items():
+        series = metrics.histograms(source, totals)
+        if not series:
+            continue
+        lines += [f'# HELP {PREFIX}{name} {description}', f'# TYPE {PREFIX}{name} histogram']
+        for entry in sorted(series, key=lambda e: sorted(e['labels'].items())):
+            labels = sorted(entry['labels'].items())
+            cumulative, buckets = 0, entry['buckets']
+            for index in range(len(metrics.BUCKET_BOUNDS)):
+                cumulative += buckets.get(index, 0)
+                if index in EXPORTED_BUCKETS:
+                    bound = _number(round(metrics.BUCKET_BOUNDS[index] / divisor, 9))
+                    lines.append(f'{PREFIX}{name}_bucket{_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{PREFIX}{name}_bucket{_labels(labels, le="+Inf")} {entry["count"]}')
+            lines.append(f'{PREFIX}{name}_sum{_labels(labels)} {_number(entry["sum"] / divisor)}')
+            lines.append(f'{PREFIX}{name}_count{_labels(labels)} {entry["count"]}')
+
+    hits = sum(v for (metric, _, _), v in totals.items() if metric == 'cache_hits_total')
+    misses = sum(v for (metric, _, _), v in totals.items() if metric == 'cache_misses_total')
+    if hits + misses:
+        lines += [
+            f'# HELP {PREFIX}cache_hit_ratio Part des lectures du cache servies sans défaut',
+            f'# TYPE {PREFIX}cache_hit_ratio gauge',
+            f'{PREFIX}cache_hit_ratio {hits / (hits + misses):.4f}',
+        ]
+
+    gauges = metrics.collect('gauge', live_only=True)
+    lines += [
+        f'# HELP {PREFIX}email_outbox Messages en cours d\'envoi, tous workers confondus',
+        f'# TYPE {PREFIX}email_outbox gauge',
+        f'{PREFIX}email_outbox {_number(max(gauges.get(("email_outbox", (), ""), 0.0), 0))}',
+    ]
+
+    lines += [
+        f'# HELP {PREFIX}worker_resident_memory_bytes Mémoire résidente de chaque worker',
+        f'# TYPE {PREFIX}worker_resident_memory_bytes gauge',
+    ]
+    for pid in sorted(metrics.process_files('live', live_only=True)):
+        try:
+            rss = psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            continue
+        lines.append(f'{PREFIX}worker_resident_memory_bytes{_labels([("pid", pid)])} {rss}')
+
+    return '\n'.join(lines) + '\n'
+
+
+@require_GET
+def metrics_endpoint(request):
+    if not _allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_alter_product_reference'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvalidationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=200)),
+                ('origin', models.CharField(help_text='Processus émetteur (hôte:pid)', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': "Événement d'invalidation",
+                'verbose_name_plural': "Événements d'invalidation",
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_invalidationevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CVDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fichier', models.CharField(help_text="Nom du fichier CV au moment de l'extraction", max_length=255)),
+                ('sha256', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('indexe', 'Indexé'), ('echec', 'Échec')], db_index=True, default='en_attente', max_length=20)),
+                ('texte', models.TextField(blank=True, help_text='Texte normalisé (minuscules, sans accents)')),
+                ('competences', models.CharField(blank=True, help_text='Compétences détectées, séparées par des virgules', max_length=500)),
+                ('erreur', models.CharField(blank=True, max_length=300)),
+                ('date_extraction', models.DateTimeField(blank=True, null=True)),
+                ('candidature', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cv_document', to='main.candidature')),
+                ('candidature_spontanee', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cv_document', to='main.candidaturespontanee')),
+            ],
+            options={
+                'verbose_name': 'CV indexé',
+                'verbose_name_plural': 'CV indexés',
+            },
+        ),
+        migrations.CreateModel(
+            name='CandidateSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('skill', models.CharField(max_length=50)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skill_rows', to='main.cvdocument')),
+            ],
+            options={
+                'verbose_name': 'Compétence de candidat',
+                'verbose_name_plural': 'Compétences de candidats',
+                'indexes': [models.Index(fields=['skill', 'document'], name='main_candskill_skill_doc')],
+                'unique_together': {('document', 'skill')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_cvdocument_candidateskill'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('service', 'Service'), ('formation', 'Formation'), ('offre', "Offre d'emploi")], max_length=20)),
+                ('source_id', models.PositiveIntegerField()),
+                ('target_id', models.PositiveIntegerField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+            ],
+            options={
+                'verbose_name': 'Contenu associé',
+                'verbose_name_plural': 'Contenus associés',
+                'unique_together': {('kind', 'source_id', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:20
+
+import django.core.validators
+from django.db import migrations, models
+import globaltit_site.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_relateditem'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='candidature',
+            name='cv',
+            field=models.FileField(help_text='Formats acceptés: PDF, DOC, DOCX (max 5MB)', storage=globaltit_site.storage.cv_storage, upload_to='cv/', validators=[django.core.validators.FileExtensionValidator(['pdf', 'doc', 'docx'])], verbose_name='CV'),
+        ),
+        migrations.AlterField(
+            model_name='candidaturespontanee',
+            name='cv',
+            field=models.FileField(help_text='Formats acceptés: PDF, DOC, DOCX (max 5MB)', storage=globaltit_site.storage.cv_storage, upload_to='cv/', validators=[django.core.validators.FileExtensionValidator(['pdf', 'doc', 'docx'])], verbose_name='CV'),
+        ),
+    ]
@@ -1,7 +1,13 @@
+from datetime import timedelta
+
 from django.db import models
 from django.utils import timezone
 from django.core.validators import FileExtensionValidator
 
+from globaltit_site.storage import cv_storage
+
+from .managers import CachedManager
+
 
 class Service(models.Model):
     CATEGORIE_CHOICES = [
@@ -23,6 +29,8 @@ class Service(models.Model):
     date_creation = models.DateTimeField(auto_now_add=True)
     date_modification = models.DateTimeField(auto_now=True)
     
+    objects = CachedManager()
+    
     class Meta:
         ordering = ['ordre', 'titre']
         verbose_name = 'Service'
@@ -61,6 +69,8 @@ class Formation(models.Model):
     date_creation = models.DateTimeField(auto_now_add=True)
     date_modification = models.DateTimeField(auto_now=True)
     
+    objects = CachedManager()
+    
     class Meta:
         ordering = ['categorie', 'titre']
         verbose_name = 'Formation'
@@ -153,6 +163,8 @@ class CarouselImage(models.Model):
     date_creation = models.DateTimeField(auto_now_add=True)
     date_modification = models.DateTimeField(auto_now=True)
     
+    objects = CachedManager()
+    
     class Meta:
         ordering = ['ordre', 'titre']
         verbose_name = 'Image Carousel'
@@ -174,6 +186,8 @@ class AboutImage(models.Model):
     date_creation = models.DateTimeField(auto_now_add=True)
     date_modification = models.DateTimeField(auto_now=True)
     
+    objects = CachedManager()
+    
     class Meta:
         ordering = ['ordre', 'titre']
         verbose_name = 'Image About'
@@ -207,6 +221,8 @@ class CustomerReview(models.Model):
     date_creation = models.DateTimeField(auto_now_add=True)
     date_modification = models.DateTimeField(auto_now=True)
     
+    objects = CachedManager()
+    
     class Meta:
         ordering = ['ordre', '-date_creation']
         verbose_name = 'Avis client'
@@ -234,6 +250,8 @@ class Partner(models.Model):
     date_creation = models.DateTimeField(auto_now_add=True)
     date_modification = models.DateTimeField(auto_now=True)
     
+    objects = CachedManager()
+    
     class Meta:
         ordering = ['ordre', 'nom']
         verbose_name = 'Partenaire'
@@ -257,6 +275,8 @@ class Brand(models.Model):
     date_creation = models.DateTimeField(auto_now_add=True)
     date_modification = models.DateTimeField(auto_now=True)
     
+    objects = CachedManager()
+    
     class Meta:
         ordering = ['ordre', 'nom']
         verbose_name = 'Marque'
@@ -297,6 +317,8 @@ class OffreEmploi(models.Model):
     date_creation = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
     date_modification = models.DateTimeField(auto_now=True, verbose_name="Date de modification")
     
+    objects = CachedManager()
+    
     class Meta:
         ordering = ['-urgent', '-date_creation']
         verbose_name = 'Offre d\'emploi'
@@ -327,6 +349,7 @@ class Candidature(models.Model):
     telephone = models.CharField(max_length=20, blank=True, verbose_name="Téléphone")
     motivation = models.TextField(verbose_name="Lettre de motivation")
     cv = models.FileField(upload_to='cv/', 
+                         storage=cv_storage,
                          validators=[FileExtensionValidator(['pdf', 'doc', 'docx'])],
                          verbose_name="CV",
                          help_text="Formats acceptés: PDF, DOC, DOCX (max 5MB)")
@@ -366,6 +389,7 @@ class CandidatureSpontanee(models.Model):
     poste_souhaite = models.CharField(max_length=200, verbose_name="Poste souhaité")
     motivation = models.TextField(verbose_name="Lettre de motivation")
     cv = models.FileField(upload_to='cv/', 
+                         storage=cv_storage,
                          validators=[FileExtensionValidator(['pdf', 'doc', 'docx'])],
                          verbose_name="CV",
                          help_text="Formats acceptés: PDF, DOC, DOCX (max 5MB)")
@@ -386,3 +410,104 @@ class CandidatureSpontanee(models.Model):
         """Retourne le nom du fichier CV"""
         import os
         return os.path.basename(self.cv.name) if self.cv else ''
+
+
+class CVDocument(models.Model):
+    """Texte extrait du CV d'une candidature et compétences détectées (main/cv_index.py)"""
+
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('indexe', 'Indexé'),
+        ('echec', 'Échec'),
+    ]
+
+    candidature = models.OneToOneField(Candidature, on_delete=models.CASCADE, null=True, blank=True,
+                                       related_name='cv_document')
+    candidature_spontanee = models.OneToOneField(CandidatureSpontanee, on_delete=models.CASCADE, null=True, blank=True,
+                                                 related_name='cv_document')
+    fichier = models.CharField(max_length=255, help_text="Nom du fichier CV au moment de l'extraction")
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='en_attente', db_index=True)
+    texte = models.TextField(blank=True, help_text="Texte normalisé (minuscules, sans accents)")
+    competences = models.CharField(max_length=500, blank=True, help_text="Compétences détectées, séparées par des virgules")
+    erreur = models.CharField(max_length=300, blank=True)
+    date_extraction = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'CV indexé'
+        verbose_name_plural = 'CV indexés'
+
+    def __str__(self):
+        return self.fichier
+
+    @property
+    def application(self):
+        return self.candidature or self.candidature_spontanee
+
+    def competences_list(self):
+        return [skill for skill in self.competences.split(',') if skill]
+
+
+class CandidateSkill(models.Model):
+    """Une compétence détectée dans un CV : table étroite indexée pour la recherche"""
+
+    document = models.ForeignKey(CVDocument, on_delete=models.CASCADE, related_name='skill_rows')
+    skill = models.CharField(max_length=50)
+
+    class Meta:
+        unique_together = [('document', 'skill')]
+        indexes = [models.Index(fields=['skill', 'document'], name='main_candskill_skill_doc')]
+        verbose_name = 'Compétence de candidat'
+        verbose_name_plural = 'Compétences de candidats'
+
+    def __str__(self):
+        return self.skill
+
+
+class RelatedItem(models.Model):
+    """Voisin précalculé d'un service, d'une formation ou d'une offre (main/related.py)"""
+
+    KIND_CHOICES = [
+        ('service', 'Service'),
+        ('formation', 'Formation'),
+        ('offre', "Offre d'emploi"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    source_id = models.PositiveIntegerField()
+    target_id = models.PositiveIntegerField()
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    objects = CachedManager()
+
+    class Meta:
+        # L'unicité sert aussi d'index à la lecture (kind, source_id) triée par rang
+        unique_together = [('kind', 'source_id', 'rank')]
+        verbose_name = 'Contenu associé'
+        verbose_name_plural = 'Contenus associés'
+
+    def __str__(self):
+        return f"{self.kind} {self.source_id} -> {self.target_id}"
+
+
+class InvalidationEvent(models.Model):
+    """Événements du bus d'invalidation (repli quand la base ne gère pas LISTEN/NOTIFY)"""
+    
+    topic = models.CharField(max_length=200)
+    origin = models.CharField(max_length=100, help_text="Processus émetteur (hôte:pid)")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Événement d'invalidation"
+        verbose_name_plural = "Événements d'invalidation"
+    
+    def __str__(self):
+        return self.topic
+    
+    @classmethod
+    def prune(cls, max_age_seconds=600):
+        """Supprime les événements déjà consommés par tous les workers"""
+        limit = timezone.now() - timedelta(seconds=max_age_seconds)
+        return cls.objects.filter(created_at__lt=limit).delete()[0]
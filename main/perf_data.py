@@ -0,0 +1,411 @@
+"""
+Génération de volumes de données réalistes pour les mesures de performance.
+
+Chaque modèle est rempli par lots de taille fixe ; le contenu d'un lot ne
+dépend que de la graine, du modèle et du numéro du lot, pas du nombre de
+processus : deux exécutions avec la même graine produisent les mêmes lignes.
+
+Les lignes portent une marque (MARKER en tête d'un champ texte, adresses en
+EMAIL_DOMAIN) qui permet de les retrouver et de les supprimer sans toucher
+aux vraies données.
+
+Product, Category et News n'existent plus dans main/models.py mais leurs
+tables sont créées par les migrations 0013 à 0015 : on passe par les
+modèles historiques de l'état des migrations.
+"""
+import io
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.apps import apps
+from django.utils import timezone
+
+MARKER = '[perf]'
+EMAIL_DOMAIN = 'perf.example.com'
+FILES_PREFIX = 'perf'
+START_DATE = timezone.make_aware(datetime(2023, 1, 1))
+DATE_SPAN_DAYS = 3 * 365
+
+FIRST_NAMES = [
+    'Camille', 'Léa', 'Louis', 'Hugo', 'Chloé', 'Nathan', 'Manon', 'Lucas', 'Inès', 'Jules', 'Sarah', 'Adam',
+    'Emma', 'Gabriel', 'Jade', 'Arthur', 'Lina', 'Raphaël', 'Zoé', 'Mohamed', 'Awa', 'Yanis', 'Fatou', 'Théo',
+]
+LAST_NAMES = [
+    'Martin', 'Bernard', 'Dubois', 'Thomas', 'Robert', 'Richard', 'Petit', 'Durand', 'Leroy', 'Moreau', 'Diallo',
+    'Simon', 'Laurent', 'Lefebvre', 'Michel', 'Garcia', 'David', 'Bertrand', 'Roux', 'Vincent', 'Traoré', 'Fournier',
+]
+SKILLS = [
+    'Python', 'Django', 'JavaScript', 'React', 'SQL', 'PostgreSQL', 'Linux', 'Docker', 'Kubernetes', 'Cisco',
+    'Windows Server', 'Active Directory', 'Cybersécurité', 'Pentest', 'Réseaux', 'Java', 'PHP', 'Azure', 'AWS',
+    'Support utilisateur', 'ITIL', 'Virtualisation', 'VMware', 'Git', 'Gestion de projet', 'Excel', 'Power BI',
+]
+WORDS = (
+    "solution infrastructure réseau sécurité serveur accompagnement expertise formation client projet "
+    "déploiement maintenance support audit cloud données performance qualité équipe entreprise service "
+    "installation migration sauvegarde supervision développement application logiciel conseil analyse"
+).split()
+CITIES = ['Paris', 'Lyon', 'Marseille', 'Toulouse', 'Lille', 'Nantes', 'Bordeaux', 'Abidjan', 'Dakar', 'Télétravail']
+POSITIONS = [
+    'Technicien support', 'Administrateur systèmes', 'Développeur web', 'Ingénieur réseau', 'Analyste sécurité',
+    'Chef de projet IT', 'Consultant cloud', 'Formateur informatique',
+]
+
+
+_historical_apps = None
+
+
+def historical_model(name):
+    """Modèle de main tel que décrit par les migrations (tables toujours présentes)"""
+    global _historical_apps
+    if _historical_apps is None:
+        from django.db import connection
+        from django.db.migrations.loader import MigrationLoader
+
+        _historical_apps = MigrationLoader(connection, ignore_no_migrations=True).project_state().apps
+    return _historical_apps.get_model('main', name)
+
+
+def resolve_model(label):
+    app_label, name = label.split('.')
+    if label in HISTORICAL:
+        return historical_model(name)
+    return apps.get_model(app_label, name)
+
+
+def keep_given_dates(model):
+    """
+    Désactive auto_now/auto_now_add sur le modèle, dans ce processus
+    uniquement, pour garder les dates générées (réparties sur trois ans).
+    """
+    for field in model._meta.concrete_fields:
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            field.auto_now = field.auto_now_add = False
+
+
+# ---------------------------------------------------------------------------
+# Fichiers réels partagés par les lignes générées
+
+def make_image(rng, index):
+    from PIL import Image, ImageDraw
+
+    width, height = rng.choice([(64, 48), (96, 64), (120, 80)])
+    start = [rng.randrange(256) for _ in range(3)]
+    end = [rng.randrange(256) for _ in range(3)]
+    image = Image.new('RGB', (width, height))
+    draw = ImageDraw.Draw(image)
+    for x in range(width):
+        color = tuple(int(a + (b - a) * x / width) for a, b in zip(start, end))
+        draw.line([(x, 0), (x, height)], fill=color)
+    draw.text((4, 4), str(index), fill=(255, 255, 255))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def make_pdf(lines):
+    """PDF d'une page contenant `lines` en texte (Helvetica), extractible par les outils usuels"""
+    def escape(text):
+        return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+    content = 'BT /F1 11 Tf 50 790 Td 14 TL\n' + ''.join(
+        f'({escape(line)}) Tj T*\n' for line in lines
+    ) + 'ET'
+    stream = content.encode('cp1252', 'replace')
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 4 0 R >> >> '
+        b'/Contents 5 0 R >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream',
+    ]
+    output = io.BytesIO()
+    output.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(output.tell())
+        output.write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+    xref = output.tell()
+    output.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    for offset in offsets:
+        output.write(b'%010d 00000 n \n' % offset)
+    output.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    return output.getvalue()
+
+
+def make_cv(rng, index):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    skills = rng.sample(SKILLS, rng.randint(4, 9))
+    lines = [
+        f'{first} {last}',
+        f'{rng.choice(POSITIONS)} - {rng.randint(1, 15)} ans d\'expérience',
+        '',
+        'Compétences : ' + ', '.join(skills),
+        '',
+        'Expériences',
+        *(f'- {rng.choice(POSITIONS)} chez {rng.choice(LAST_NAMES)} Informatique ({rng.randint(2008, 2024)})'
+          for _ in range(3)),
+        '',
+        'Formation : ' + rng.choice(['BTS SIO', 'Licence informatique', 'Master réseaux', 'Diplôme d\'ingénieur']),
+    ]
+    return make_pdf(lines)
+
+
+def create_files(seed, images, cvs):
+    """Écrit (ou retrouve) les fichiers partagés ; renvoie leurs noms dans le stockage"""
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import default_storage
+
+    from globaltit_site.storage import cv_storage
+
+    names = {'images': [], 'cvs': []}
+    for kind, count, builder, extension, storage in (
+        ('images', images, make_image, 'png', default_storage),
+        ('cvs', cvs, make_cv, 'pdf', cv_storage()),
+    ):
+        for index in range(count):
+            name = f'{FILES_PREFIX}/{seed}/{kind}/{index:04d}.{extension}'
+            if not storage.exists(name):
+                rng = random.Random(f'{seed}:{kind}:{index}')
+                name = storage.save(name, ContentFile(builder(rng, index)))
+            names[kind].append(name)
+    return names
+
+
+# ---------------------------------------------------------------------------
+# Générateurs : (rng, index global, contexte) -> dict des champs
+
+def _date(rng):
+    return START_DATE + timedelta(seconds=rng.randrange(DATE_SPAN_DAYS * 86400))
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+# Phrases tirées une fois pour toutes : assembler des paragraphes à partir de
+# ce réservoir coûte dix fois moins cher que de les tirer mot à mot
+_SENTENCES = [_sentence(random.Random(f'sentence:{index}'), 8 + index % 9) for index in range(2000)]
+
+
+def _paragraphs(rng, count=3):
+    return '\n\n'.join(' '.join(rng.choices(_SENTENCES, k=4)) for _ in range(count))
+
+
+def _person(rng, index):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return {
+        'nom': last,
+        'prenom': first,
+        'email': f'{first.lower()}.{last.lower()}{index}@{EMAIL_DOMAIN}',
+        'telephone': f'06{rng.randrange(10 ** 8):08d}',
+    }
+
+
+def service(rng, index, context):
+    created = _date(rng)
+    return {
+        'titre': f'{MARKER} Service {index}',
+        'categorie': rng.choice(['developpement', 'infrastructure', 'securite', 'consulting', 'support']),
+        'description': _paragraphs(rng),
+        'description_courte': _sentence(rng, 10)[:200],
+        'icone': rng.choice(['fa-code', 'fa-server', 'fa-shield-alt', 'fa-headset', 'fa-cloud']),
+        'ordre': index,
+        'est_actif': rng.random() < 0.9,
+        'date_creation': created,
+        'date_modification': created,
+    }
+
+
+def formation(rng, index, context):
+    created = _date(rng)
+    return {
+        'titre': f'{MARKER} Formation {index}',
+        'categorie': rng.choice(['programmation', 'reseaux', 'securite', 'cloud', 'data', 'autre']),
+        'niveau': rng.choice(['debutant', 'intermediaire', 'avance']),
+        'description': _paragraphs(rng),
+        'objectifs': _paragraphs(rng, 1),
+        'programme': '\n'.join(f'Module {n} : {_sentence(rng, 5)}' for n in range(1, 6)),
+        'duree': rng.choice(['2 jours', '3 jours', '5 jours', '35h']),
+        'prix': Decimal(rng.randrange(300, 3000)),
+        'disponible': rng.random() < 0.9,
+        'date_creation': created,
+        'date_modification': created,
+    }
+
+
+def contact(rng, index, context):
+    person = _person(rng, index)
+    return {
+        'nom': f"{person['prenom']} {person['nom']}",
+        'email': person['email'],
+        'telephone': person['telephone'],
+        'sujet': f'{MARKER} ' + _sentence(rng, 5)[:180],
+        'message': _paragraphs(rng, 1),
+        'service_interesse_id': rng.choice(context['service']) if context['service'] and rng.random() < 0.4 else None,
+        'formation_interessee_id': (
+            rng.choice(context['formation']) if context['formation'] and rng.random() < 0.3 else None
+        ),
+        'date_creation': _date(rng),
+        'traite': rng.random() < 0.6,
+    }
+
+
+def offre_emploi(rng, index, context):
+    created = _date(rng)
+    return {
+        'titre': f'{MARKER} {rng.choice(POSITIONS)} {index}',
+        'description': _paragraphs(rng),
+        'type_contrat': rng.choice(['cdi', 'cdd', 'stage', 'alternance', 'freelance']),
+        'lieu': rng.choice(CITIES),
+        'missions': _paragraphs(rng, 1),
+        'profil_recherche': 'Compétences : ' + ', '.join(rng.sample(SKILLS, 5)),
+        'experience_min': rng.choice(['Débutant accepté', '2 ans', '5 ans']),
+        'date_limite': (created + timedelta(days=rng.randint(15, 120))).date(),
+        'urgent': rng.random() < 0.1,
+        'est_actif': rng.random() < 0.7,
+        'date_creation': created,
+        'date_modification': created,
+    }
+
+
+def _application(rng, index, context):
+    person = _person(rng, index)
+    created = _date(rng)
+    return {
+        'nom': person['nom'],
+        'prenom': person['prenom'],
+        'email': person['email'],
+        'telephone': person['telephone'],
+        'motivation': f'{MARKER} ' + _paragraphs(rng, 2),
+        'cv': rng.choice(context['files']['cvs']),
+        'statut': rng.choices(['nouvelle', 'en_cours', 'acceptee', 'rejetee'], [5, 3, 1, 3])[0],
+        'date_candidature': created,
+        'date_modification': created,
+    }
+
+
+def candidature(rng, index, context):
+    return {**_application(rng, index, context), 'offre_emploi_id': rng.choice(context['offre_emploi'])}
+
+
+def candidature_spontanee(rng, index, context):
+    return {**_application(rng, index, context), 'poste_souhaite': rng.choice(POSITIONS)}
+
+
+def category(rng, index, context):
+    created = _date(rng)
+    return {
+        'nom': f'{MARKER} Catégorie {index}',
+        'description': _sentence(rng, 12),
+        'image': rng.choice(context['files']['images']),
+        'ordre': index,
+        'est_actif': True,
+        'date_creation': created,
+        'date_modification': created,
+    }
+
+
+def product(rng, index, context):
+    created = _date(rng)
+    price = Decimal(rng.randrange(1000, 500000)) / 100
+    promotion = rng.random() < 0.15
+    return {
+        'nom': f'{MARKER} Produit {index}',
+        'description': _paragraphs(rng, 2),
+        'description_courte': _sentence(rng, 8)[:200],
+        'prix': price,
+        'image_principale': rng.choice(context['files']['images']),
+        'stock': rng.randrange(0, 500),
+        'reference': f'PERF-{context["seed"]}-{index:08d}',
+        'est_en_promotion': promotion,
+        'prix_promotionnel': (price * Decimal('0.8')).quantize(Decimal('0.01')) if promotion else None,
+        'est_actif': rng.random() < 0.95,
+        'ordre': index,
+        'categorie_id': rng.choice(context['category']),
+        'date_creation': created,
+        'date_modification': created,
+    }
+
+
+def news(rng, index, context):
+    published = _date(rng)
+    return {
+        'titre': f'{MARKER} Actualité {index}',
+        'description': _paragraphs(rng),
+        'description_courte': _sentence(rng, 10)[:200],
+        'image': rng.choice(context['files']['images']) if rng.random() < 0.8 else None,
+        'date_publication': published,
+        'ordre': index,
+        'est_actif': rng.random() < 0.9,
+        'date_creation': published,
+        'date_modification': published,
+    }
+
+
+def static_image(rng, index, context):
+    created = _date(rng)
+    return {
+        'name': f'{MARKER} image {index}',
+        'image_type': rng.choice(['carousel', 'service', 'formation', 'about', 'contact', 'other']),
+        'file': rng.choice(context['files']['images']),
+        'description': _sentence(rng, 8),
+        'is_active': rng.random() < 0.8,
+        'position': index,
+        'created_at': created,
+        'updated_at': created,
+        'uploaded_by_id': rng.choice(context['users']),
+    }
+
+
+def dashboard_activity(rng, index, context):
+    action = rng.choice(['create', 'update', 'delete', 'upload', 'activate', 'deactivate'])
+    object_type = rng.choice(['Service', 'Formation', 'StaticImage', 'OffreEmploi', 'Partner'])
+    return {
+        'user_id': rng.choice(context['users']),
+        'action': action,
+        'object_type': object_type,
+        'object_id': str(rng.randrange(1, 10000)),
+        'description': f'{MARKER} {object_type} {action}',
+        'timestamp': _date(rng),
+        'ip_address': f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}',
+    }
+
+
+# (clé, modèle, générateur, volume par défaut, clés dont dépend le modèle)
+PLAN = [
+    ('service', 'main.Service', service, 1_000, []),
+    ('formation', 'main.Formation', formation, 1_000, []),
+    ('offre_emploi', 'main.OffreEmploi', offre_emploi, 5_000, []),
+    ('category', 'main.Category', category, 100, []),
+    ('static_image', 'dashboard.StaticImage', static_image, 5_000, []),
+    ('news', 'main.News', news, 20_000, []),
+    ('dashboard_activity', 'dashboard.DashboardActivity', dashboard_activity, 250_000, []),
+    ('contact', 'main.Contact', contact, 250_000, ['service', 'formation']),
+    ('candidature', 'main.Candidature', candidature, 250_000, ['offre_emploi']),
+    ('candidature_spontanee', 'main.CandidatureSpontanee', candidature_spontanee, 67_900, []),
+    ('product', 'main.Product', product, 150_000, ['category']),
+]
+HISTORICAL = {'main.Product', 'main.Category', 'main.News'}
+GENERATORS = {key: (label, generator) for key, label, generator, _, _ in PLAN}
+
+# Champ portant la marque, pour retrouver les lignes générées
+MARKED_FIELDS = {
+    'service': 'titre', 'formation': 'titre', 'offre_emploi': 'titre', 'category': 'nom', 'static_image': 'name',
+    'news': 'titre', 'dashboard_activity': 'description', 'contact': 'sujet', 'candidature': 'motivation',
+    'candidature_spontanee': 'motivation', 'product': 'nom',
+}
+
+
+def marked(key):
+    label, _ = GENERATORS[key]
+    return resolve_model(label)._base_manager.filter(**{f'{MARKED_FIELDS[key]}__startswith': MARKER})
+
+
+def build_rows(key, chunk, start, count, context):
+    """Lignes du lot `chunk` (index globaux start..start+count), identiques d'une exécution à l'autre"""
+    label, generator = GENERATORS[key]
+    model = resolve_model(label)
+    rng = random.Random(f"{context['seed']}:{key}:{chunk}")
+    return model, [model(**generator(rng, index, context)) for index in range(start, start + count)]
@@ -0,0 +1,145 @@
+"""
+Contenus associés des pages de détail (services, formations, offres d'emploi).
+
+La similarité entre deux éléments d'un même type additionne :
+- le cosinus de leurs textes en TF-IDF (mêmes vecteurs hachés que le
+  rapprochement des candidatures, main/matching.py), pondéré par TEXT_WEIGHT ;
+- un bonus par attribut partagé (catégorie, niveau, type de contrat, lieu).
+
+Les attributs sont encodés en colonnes indicatrices ajoutées à la matrice
+des textes, avec la racine de leur poids : un seul produit matriciel de la
+matrice par sa transposée, par blocs de BLOCK_ROWS lignes, donne tous les
+scores. Les RELATED_ITEMS_COUNT meilleurs voisins de chaque élément publié
+sont rangés dans la table RelatedItem par la commande `build_related`, à
+lancer périodiquement. Une page de détail ne fait plus qu'une lecture
+indexée (kind, source_id), servie par le cache versionné des querysets.
+"""
+import logging
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse
+
+from . import invalidation
+from .cv_index import normalize
+from .matching import FEATURES, _weighted, vectorize
+from .models import Formation, OffreEmploi, RelatedItem, Service
+
+logger = logging.getLogger(__name__)
+
+TEXT_WEIGHT = 1.0
+BLOCK_ROWS = 1024
+
+
+class Kind:
+    """Description d'un type d'élément : textes comparés et attributs bonifiés"""
+
+    def __init__(self, name, model, published, title, body, attributes):
+        self.name = name
+        self.model = model
+        self.published = published
+        self.title = title
+        self.body = body
+        self.attributes = attributes  # {champ: poids}
+
+    def queryset(self):
+        return self.model.objects.filter(**self.published)
+
+
+KINDS = {
+    'service': Kind(
+        'service', Service, {'est_actif': True},
+        title='titre', body=('description_courte', 'description'),
+        attributes={'categorie': 0.5},
+    ),
+    'formation': Kind(
+        'formation', Formation, {'disponible': True},
+        title='titre', body=('description', 'objectifs', 'programme'),
+        attributes={'categorie': 0.5, 'niveau': 0.2},
+    ),
+    'offre': Kind(
+        'offre', OffreEmploi, {'est_actif': True},
+        title='titre', body=('description', 'missions', 'profil_recherche'),
+        attributes={'type_contrat': 0.3, 'lieu': 0.2},
+    ),
+}
+
+
+def features(kind, rows):
+    """Matrice des éléments : TF-IDF des textes puis une colonne indicatrice par valeur d'attribut"""
+    texts = vectorize([(row[kind.title], '\n'.join(row[field] or '' for field in kind.body)) for row in rows])
+    df = np.bincount(texts.indices, minlength=FEATURES)
+    idf = (np.log((1.0 + len(rows)) / (1.0 + df)) + 1.0).astype(np.float32)
+    blocks = [_weighted(texts, idf) * np.float32(np.sqrt(TEXT_WEIGHT))]
+    for field, weight in kind.attributes.items():
+        values = [normalize(str(row[field] or '')) for row in rows]
+        codes = {value: code for code, value in enumerate(sorted(set(values)))}
+        columns = np.array([codes[value] for value in values], dtype=np.int32)
+        # Une valeur vide ne rapproche pas deux éléments
+        data = np.array([np.sqrt(weight) if value else 0.0 for value in values], dtype=np.float32)
+        blocks.append(sparse.csr_matrix(
+            (data, (np.arange(len(rows)), columns)), shape=(len(rows), len(codes)),
+        ))
+    return sparse.hstack(blocks, format='csr')
+
+
+def neighbours(matrix, count):
+    """(voisins, scores) : les count meilleurs voisins de chaque ligne, du plus proche au moins proche"""
+    n = matrix.shape[0]
+    count = min(count, n - 1)
+    if count <= 0:
+        return np.empty((n, 0), dtype=np.int64), np.empty((n, 0), dtype=np.float32)
+    best = np.empty((n, count), dtype=np.int64)
+    best_scores = np.empty((n, count), dtype=np.float32)
+    transposed = matrix.T.tocsc()
+    for start in range(0, n, BLOCK_ROWS):
+        stop = min(start + BLOCK_ROWS, n)
+        scores = (matrix[start:stop] @ transposed).toarray()
+        # Un élément n'est pas son propre voisin
+        scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        top = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        best[start:stop] = np.take_along_axis(top, order, axis=1)
+        best_scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+    return best, best_scores
+
+
+def build(kind, count=None):
+    """Recalcule les voisins d'un type d'élément et remplace ses lignes RelatedItem"""
+    count = settings.RELATED_ITEMS_COUNT if count is None else count
+    started = time.perf_counter()
+    fields = ['pk', kind.title, *kind.body, *kind.attributes]
+    rows = list(kind.queryset().order_by('pk').values(*fields))
+    ids = [row['pk'] for row in rows]
+    links = []
+    if rows:
+        best, best_scores = neighbours(features(kind, rows), count)
+        for source, targets, scores in zip(ids, best.tolist(), best_scores.tolist()):
+            links += [
+                RelatedItem(kind=kind.name, source_id=source, target_id=ids[target], rank=rank, score=score)
+                for rank, (target, score) in enumerate(zip(targets, scores))
+            ]
+    with transaction.atomic():
+        RelatedItem.objects.filter(kind=kind.name).delete()
+        RelatedItem.objects.bulk_create(links, batch_size=2000)
+    # RelatedItem est hors du bus des signaux : une seule invalidation pour tout le remplacement
+    invalidation.invalidate_model(RelatedItem)
+    elapsed = time.perf_counter() - started
+    logger.info("Contenus associés %s : %d éléments, %d liens en %.2f s", kind.name, len(rows), len(links), elapsed)
+    return {'items': len(rows), 'links': len(links), 'seconds': elapsed}
+
+
+def related(kind_name, pk, count=3):
+    """Voisins publiés de l'élément pk, dans l'ordre de similarité ; None si l'index ne le connaît pas"""
+    kind = KINDS[kind_name]
+    targets = list(
+        RelatedItem.objects.filter(kind=kind_name, source_id=pk).order_by('rank').values_list('target_id', flat=True).cached()
+    )
+    if not targets:
+        return None
+    # Les voisins dépubliés depuis le dernier calcul sont sautés
+    items = {item.pk: item for item in kind.queryset().filter(pk__in=targets).cached()}
+    return [items[target] for target in targets if target in items][:count]
@@ -0,0 +1,274 @@
+"""
+Banc d'essai du rendu des templates de templates/.
+
+Chaque template est rendu avec un contexte synthétique : toute variable
+utilisée par le template existe, ses attributs aussi, et toute séquence
+contient `size` éléments (les séquences imbriquées, `inner` éléments). Les
+noms suivent quelques conventions pour produire des valeurs plausibles :
+dates pour *_at / date*, entiers pour pk / id / *_count, FieldFile du
+stockage par défaut pour image / file / logo… (leur .url appelle vraiment
+le stockage).
+
+Pendant un rendu instrumenté, on compte les appels à storage.url() et les
+requêtes SQL. L'analyse statique de l'arbre des nœuds signale les
+constructions coûteuses : boucles imbriquées, .url, {% url %} ou
+{% include %} répétés dans une boucle, méthodes de queryset appelées depuis
+le template.
+"""
+import re
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, models
+from django.db.models.fields.files import FieldFile
+from django.template import TemplateSyntaxError, defaulttags, loader, loader_tags
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+FILE_ATTRIBUTES = {
+    'image', 'file', 'logo', 'photo', 'cv', 'favicon', 'image_principale', 'hero_image', 'about_image', 'thumbnail',
+}
+INT_ATTRIBUTES = {'pk', 'id', 'count', 'total', 'number', 'num_pages', 'position', 'ordre', 'order', 'size'}
+QUERYSET_METHODS = {'all', 'count', 'filter', 'exclude', 'exists', 'first', 'last', 'order_by', 'values'}
+TEMPLATE_KEYWORDS = {
+    'if', 'elif', 'else', 'endif', 'for', 'in', 'empty', 'endfor', 'and', 'or', 'not', 'is', 'None', 'True',
+    'False', 'with', 'endwith', 'as', 'block', 'endblock', 'extends', 'include', 'load', 'url', 'static',
+    'csrf_token', 'comment', 'endcomment', 'spaceless', 'endspaceless', 'only', 'reversed', 'cycle', 'firstof',
+    'now', 'widthratio', 'templatetag', 'verbatim', 'endverbatim', 'autoescape', 'endautoescape', 'on', 'off',
+    'filter', 'endfilter', 'ifchanged', 'endifchanged', 'regroup', 'by', 'silent',
+}
+_QUOTED = re.compile(r'"[^"]*"|\'[^\']*\'')
+_FILTERS = re.compile(r'\|\s*\w+(?::\S+)?')
+_NAMES = re.compile(r'(?<![\w.])([A-Za-z_]\w*)')
+_LOOKUPS = re.compile(r'(?<![\w.])([A-Za-z_][\w.]*)')
+
+_bench_field = models.FileField(name='file', upload_to='bench')
+_bench_date = timezone.make_aware(datetime(2024, 6, 1, 9, 30))
+
+
+class Synthetic:
+    """Valeur de remplacement : attributs, éléments et itération toujours disponibles"""
+
+    def __init__(self, name, size, inner, index=0):
+        self._name = name
+        self._size = size
+        self._inner = inner
+        self._index = index
+        self._children = {}
+        self._items = None
+
+    def _child(self, attribute):
+        child = self._children.get(attribute)
+        if child is None:
+            child = self._children[attribute] = _leaf(attribute, self) or Synthetic(
+                attribute, self._size, self._inner, self._index,
+            )
+        return child
+
+    def __getattr__(self, attribute):
+        if attribute.startswith('_'):
+            raise AttributeError(attribute)
+        return self._child(attribute)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._list()[key]
+        if isinstance(key, int):
+            items = self._list()
+            if key >= len(items):
+                raise IndexError(key)
+            return items[key]
+        if not isinstance(key, str) or key.startswith('_'):
+            raise KeyError(key)
+        return self._child(key)
+
+    def _list(self):
+        if self._items is None:
+            self._items = [Synthetic(f'{self._name} {i}', self._inner, self._inner, i) for i in range(self._size)]
+        return self._items
+
+    def __iter__(self):
+        return iter(self._list())
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return True
+
+    def __call__(self):
+        return self
+
+    def __int__(self):
+        return self._index + 1
+
+    def __float__(self):
+        return float(self._index + 1)
+
+    def __str__(self):
+        return f'{self._name.replace("_", " ")} exemple'
+
+    def items(self):
+        return [(f'{self._name}_{i}', item) for i, item in enumerate(self._list())]
+
+
+def _leaf(attribute, parent):
+    """Valeur réelle pour les attributs dont le nom annonce le type"""
+    if attribute in INT_ATTRIBUTES or attribute.endswith(('_id', '_count')):
+        return parent._index + 1
+    if attribute.startswith(('is_', 'est_', 'has_')):
+        return True
+    if attribute.startswith('date') or attribute.endswith(('_at', '_date', 'timestamp', 'last_seen', 'first_seen')):
+        return _bench_date - timedelta(days=parent._index)
+    if attribute in FILE_ATTRIBUTES:
+        return FieldFile(None, _bench_field, f'bench/{attribute}_{parent._index}.png')
+    if attribute == 'items':
+        return parent.items
+    return None
+
+
+def template_names(pattern='*'):
+    """Templates de templates/ (chemins relatifs), filtrés par motif glob"""
+    root = Path(settings.BASE_DIR) / 'templates'
+    return sorted(str(path.relative_to(root)) for path in root.rglob('*.html') if path.relative_to(root).match(pattern))
+
+
+def _walk(nodelist, loop_depth=0):
+    """(nœud, profondeur de boucle) pour tout l'arbre d'un template, sans suivre les include"""
+    for node in nodelist:
+        yield node, loop_depth
+        if isinstance(node, defaulttags.IfNode):
+            for _, child in node.conditions_nodelists:
+                yield from _walk(child, loop_depth)
+            continue
+        for attribute in node.child_nodelists:
+            child = getattr(node, attribute, None)
+            if child:
+                inner = loop_depth + 1 if isinstance(node, defaulttags.ForNode) and attribute == 'nodelist_loop' else loop_depth
+                yield from _walk(child, inner)
+
+
+def _contents(node):
+    token = getattr(node, 'token', None)
+    return token.contents if token is not None else ''
+
+
+def analyse(template):
+    """(noms de variables de premier niveau, constructions coûteuses [(ligne, message)])"""
+    names, flags = set(), []
+    for node, loop_depth in _walk(template.nodelist):
+        contents = _contents(node)
+        line = node.token.lineno if getattr(node, 'token', None) is not None else 0
+        code = _FILTERS.sub('', _QUOTED.sub('', contents))
+        names.update(name for name in _NAMES.findall(code) if name not in TEMPLATE_KEYWORDS)
+
+        if isinstance(node, defaulttags.ForNode) and loop_depth >= 1:
+            flags.append((line, f"boucle imbriquée (profondeur {loop_depth + 1}) : {contents}"))
+        for lookup in _LOOKUPS.findall(code):
+            parts = lookup.split('.')
+            if parts[0] == 'forloop' or 'paginator' in parts:
+                continue
+            if len(parts) > 1 and parts[-1] == 'url' and loop_depth:
+                flags.append((line, f"{lookup} dans une boucle : un appel au stockage par itération"))
+            methods = QUERYSET_METHODS.intersection(parts[1:])
+            if methods:
+                flags.append((line, f"{lookup} : queryset évalué depuis le template"))
+        if loop_depth and isinstance(node, defaulttags.URLNode):
+            flags.append((line, f"{{% {contents} %}} dans une boucle : reverse() par itération"))
+        if loop_depth and isinstance(node, loader_tags.IncludeNode):
+            flags.append((line, f"{{% {contents} %}} dans une boucle : rendu du sous-template par itération"))
+    return names, sorted(set(flags))
+
+
+def bench_request():
+    from django.contrib.auth.models import User
+    from django.test import RequestFactory
+
+    request = RequestFactory().get('/')
+    request.user = User(username='bench', is_staff=True, is_superuser=True)
+    request.session = {}
+    return request
+
+
+def processor_names(request):
+    """Variables fournies par les context processors : on ne les remplace pas"""
+    from django.template import engines
+
+    names = {'request', 'csrf_token', 'block', 'forloop'}
+    for processor in engines['django'].engine.template_context_processors:
+        names.update(processor(request))
+    return names
+
+
+class _StorageCalls:
+    """Compte les appels à storage.url() de la classe du stockage par défaut"""
+
+    def __init__(self):
+        self.count = 0
+        self.storage_class = _bench_field.storage.__class__
+        self.original = None
+
+    def __enter__(self):
+        self.original = self.storage_class.url
+        original = self.original
+
+        def url(storage, name, *args, **kwargs):
+            self.count += 1
+            return original(storage, name, *args, **kwargs)
+
+        self.storage_class.url = url
+        return self
+
+    def __exit__(self, *exc_info):
+        self.storage_class.url = self.original
+
+
+def bench(name, sizes, inner, min_time, request, reserved):
+    """Mesures d'un template : {size: {ms, peak_kb}}, appels au stockage, SQL, constructions coûteuses"""
+    path = Path(settings.BASE_DIR) / 'templates' / name
+    lines = len(path.read_text(encoding='utf-8').splitlines()) if path.exists() else 0
+    result = {'template': name, 'lines': lines, 'flags': [], 'sizes': {}, 'error': None}
+    try:
+        template = loader.get_template(name)
+    except TemplateSyntaxError as e:
+        result['error'] = f'TemplateSyntaxError: {e}'[:200]
+        return result
+    names, result['flags'] = analyse(template.template)
+
+    for size in sizes:
+        context = {key: Synthetic(key, size, inner) for key in names - reserved}
+        try:
+            template.render(context, request)
+        except Exception as e:
+            result['error'] = f'{type(e).__name__}: {e}'[:200]
+            return result
+
+        renders, start = 0, time.perf_counter()
+        while True:
+            template.render(context, request)
+            renders += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time or renders >= 1000:
+                break
+
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        with _StorageCalls() as storage, CaptureQueriesContext(connection) as queries:
+            template.render(context, request)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        if not tracing:
+            tracemalloc.stop()
+
+        result['sizes'][size] = {
+            'ms': round(elapsed * 1000 / renders, 3),
+            'peak_kb': round(peak / 1024, 1),
+            'storage_urls': storage.count,
+            'queries': len(queries),
+        }
+    return result
@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from main import managers
+from main.invalidation import table_version_key, table_versions
+from main.models import Service
+
+# Cache isolé par test : L2 en mémoire plutôt que le cache fichiers partagé
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'globaltit_site.cache.TieredCache',
+        'LOCATION': 'tests-default',
+        'OPTIONS': {'L2': 'shared'},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests-shared',
+    },
+}
+
+TABLE = Service._meta.db_table
+
+
+def make_service(titre, **fields):
+    return Service(titre=titre, description="Description", description_courte="Courte", icone='fa-code', **fields)
+
+
+def cached_titles():
+    return [service.titre for service in Service.objects.order_by('titre').cached()]
+
+
+@override_settings(CACHES=TEST_CACHES, INVALIDATION_BUS_ENABLED=False)
+class CachedQuerySetWriteTests(TransactionTestCase):
+    """Hors transaction (autocommit) : chaque écriture rend la lecture suivante fraîche"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        make_service("A").save()
+
+    def test_save_invalidates(self):
+        self.assertEqual(cached_titles(), ["A"])
+        make_service("B").save()
+        self.assertEqual(cached_titles(), ["A", "B"])
+
+    def test_update_invalidates(self):
+        self.assertEqual(cached_titles(), ["A"])
+        Service.objects.filter(titre="A").update(titre="C")
+        self.assertEqual(cached_titles(), ["C"])
+
+    def test_bulk_create_invalidates(self):
+        self.assertEqual(cached_titles(), ["A"])
+        Service.objects.bulk_create([make_service("B"), make_service("C")])
+        self.assertEqual(cached_titles(), ["A", "B", "C"])
+
+    def test_bulk_update_invalidates(self):
+        self.assertEqual(cached_titles(), ["A"])
+        service = Service.objects.get()
+        service.titre = "D"
+        Service.objects.bulk_update([service], ['titre'])
+        self.assertEqual(cached_titles(), ["D"])
+
+    def test_rollback_keeps_version(self):
+        self.assertEqual(cached_titles(), ["A"])
+        version = table_versions([TABLE])[TABLE]
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            make_service("B").save()
+            Service.objects.update(titre="C")
+            raise RuntimeError
+        self.assertEqual(table_versions([TABLE])[TABLE], version)
+        self.assertEqual(cached_titles(), ["A"])
+
+    def test_read_in_atomic_is_not_stored(self):
+        with mock.patch.object(managers.cache, 'get_or_set', wraps=managers.cache.get_or_set) as get_or_set:
+            with transaction.atomic():
+                make_service("B").save()
+                self.assertEqual(cached_titles(), ["A", "B"])
+            get_or_set.assert_not_called()
+            self.assertEqual(cached_titles(), ["A", "B"])
+            get_or_set.assert_called_once()
+
+
+@override_settings(CACHES=TEST_CACHES, INVALIDATION_BUS_ENABLED=False)
+class InvalidateOnCommitTests(TestCase):
+    """Dans une transaction, la version de la table ne change qu'au commit"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+
+    def test_version_bumped_on_commit_only(self):
+        from django.core.cache import cache
+
+        version = table_versions([TABLE])[TABLE]
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            make_service("A").save()
+            Service.objects.update(ordre=1)
+        self.assertEqual(cache.get(table_version_key(TABLE)), version)
+        self.assertTrue(callbacks)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(table_versions([TABLE])[TABLE], version)
@@ -1,21 +1,29 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 from . import admin_views
+from . import metrics_views
+
+# Vues publiques asynchrones en mode ASGI (ASYNC_VIEWS=True)
+if settings.ASYNC_VIEWS:
+    from . import async_views as public_views
+else:
+    public_views = views
 
 urlpatterns = [
-    path('', views.home, name='home'),
-    path('services/', views.services, name='services'),
+    path('', public_views.home, name='home'),
+    path('services/', public_views.services, name='services'),
     path('service/<int:pk>/', views.service_detail, name='service_detail'),
-    path('formations/', views.formations, name='formations'),
+    path('formations/', public_views.formations, name='formations'),
     path('formation/<int:pk>/', views.formation_detail, name='formation_detail'),
     path('contact/', views.contact, name='contact'),
-    path('a-propos/', views.about, name='about'),
-    path('partenaires/', views.partners, name='partners'),
+    path('a-propos/', public_views.about, name='about'),
+    path('partenaires/', public_views.partners, name='partners'),
     
     # URLs Soumission formulaires
-    path('contact/submit-service/', views.submit_service_request, name='submit_service_request'),
-    path('contact/submit-formation/', views.submit_formation_request, name='submit_formation_request'),
-    path('contact/submit-quick/', views.submit_quick_request, name='submit_quick_request'),
+    path('contact/submit-service/', public_views.submit_service_request, name='submit_service_request'),
+    path('contact/submit-formation/', public_views.submit_formation_request, name='submit_formation_request'),
+    path('contact/submit-quick/', public_views.submit_quick_request, name='submit_quick_request'),
     
     # URLs Recrutement
     path('recrutement/', views.job_offers, name='job_offers'),
@@ -26,4 +34,7 @@ urlpatterns = [
     path('admin/system-info/', admin_views.system_info, name='system_info'),
     path('admin/contacts/', admin_views.contact_management, name='contact_management'),
     path('admin/quick-actions/', admin_views.quick_actions, name='quick_actions'),
+
+    # Export Prometheus
+    path('metrics', metrics_views.metrics_endpoint, name='metrics'),
 ]
\ No newline at end of file
@@ -6,52 +6,98 @@ from django.conf import settings
 from django.utils import timezone
 from .models import Service, Formation, Contact, CarouselImage, AboutImage, CustomerReview, Partner, Brand
 from .forms import QuickContactForm, ContactForm
+from .related import related
+
+
+def notify_team(subject, body):
+    """Envoie une notification à l'adresse de contact sans faire échouer la requête"""
+    try:
+        send_mail(subject, body, settings.DEFAULT_FROM_EMAIL, [settings.CONTACT_EMAIL], fail_silently=True)
+    except Exception:
+        pass
+
+
+def save_quick_request(data):
+    """Enregistre une demande rapide et prévient l'équipe"""
+    contact = Contact.objects.create(
+        nom=data['nom'],
+        email=data['email'],
+        telephone=data['telephone'],
+        sujet=f"Demande rapide: {data['besoin']}",
+        message=f"Demande rapide reçue via le formulaire de contact rapide.\n\nBesoin: {data['besoin']}"
+    )
+    notify_team(
+        f'Nouvelle demande rapide - {contact.nom}',
+        f'Nom: {contact.nom}\nEmail: {contact.email}\nTéléphone: {contact.telephone}\n\nBesoin: {data["besoin"]}',
+    )
+    return contact
+
+
+def save_service_request(form):
+    """Enregistre une demande de devis service et prévient l'équipe"""
+    contact = form.save()
+    service = contact.service_interesse.titre if contact.service_interesse else ''
+    notify_team(
+        f'Nouvelle demande de devis - {contact.nom}',
+        f'Nom: {contact.nom}\nEmail: {contact.email}\nTéléphone: {contact.telephone}\nService: {service}\n\nSujet: {contact.sujet}\n\nMessage:\n{contact.message}',
+    )
+    return contact
+
+
+def save_formation_request(form):
+    """Enregistre une demande de formation et prévient l'équipe"""
+    contact = form.save()
+    formation = contact.formation_interessee.titre if contact.formation_interessee else ''
+    notify_team(
+        f'Nouvelle demande de formation - {contact.nom}',
+        f'Nom: {contact.nom}\nEmail: {contact.email}\nTéléphone: {contact.telephone}\nFormation: {formation}\n\nSujet: {contact.sujet}\n\nMessage:\n{contact.message}',
+    )
+    return contact
+
+
+def home_querysets():
+    """Requêtes indépendantes de la page d'accueil (partagées avec main.async_views)"""
+    return {
+        'services': Service.objects.filter(est_actif=True)[:6],
+        'formations': Formation.objects.filter(disponible=True)[:3],
+        'carousel_images': CarouselImage.objects.filter(est_actif=True).order_by('ordre'),
+    }
+
+
+def about_querysets():
+    """Requêtes indépendantes de la page À propos"""
+    return {
+        'services': Service.objects.filter(est_actif=True)[:6],
+        'about_images': AboutImage.objects.filter(est_actif=True).order_by('ordre'),
+        'customer_reviews': CustomerReview.objects.filter(est_actif=True).order_by('-ordre', '-date_creation')[:6],
+    }
+
+
+def partners_querysets():
+    """Requêtes indépendantes de la page Partenaires"""
+    return {
+        'partners': Partner.objects.filter(est_actif=True).order_by('ordre', 'nom'),
+        'brands': Brand.objects.filter(est_actif=True).order_by('ordre', 'nom'),
+    }
 
 
 def home(request):
-    services = Service.objects.filter(est_actif=True)[:6]
-    formations = Formation.objects.filter(disponible=True)[:3]
-    carousel_images = CarouselImage.objects.filter(est_actif=True).order_by('ordre')
-    
     if request.method == 'POST':
         quick_form = QuickContactForm(request.POST)
         if quick_form.is_valid():
-            contact = Contact.objects.create(
-                nom=quick_form.cleaned_data['nom'],
-                email=quick_form.cleaned_data['email'],
-                telephone=quick_form.cleaned_data['telephone'],
-                sujet=f"Demande rapide: {quick_form.cleaned_data['besoin']}",
-                message=f"Demande rapide reçue via le formulaire de contact rapide.\n\nBesoin: {quick_form.cleaned_data['besoin']}"
-            )
-            
-            # Envoyer un email
-            try:
-                send_mail(
-                    f'Nouvelle demande rapide - {contact.nom}',
-                    f'Nom: {contact.nom}\nEmail: {contact.email}\nTéléphone: {contact.telephone}\n\nBesoin: {quick_form.cleaned_data["besoin"]}',
-                    settings.DEFAULT_FROM_EMAIL,
-                    [settings.CONTACT_EMAIL],
-                    fail_silently=True,
-                )
-            except:
-                pass
-            
+            save_quick_request(quick_form.cleaned_data)
             messages.success(request, 'Votre demande a été envoyée avec succès ! Nous vous contacterons rapidement.')
             return redirect('home')
     else:
         quick_form = QuickContactForm()
     
-    context = {
-        'services': services,
-        'formations': formations,
-        'carousel_images': carousel_images,
-        'quick_form': quick_form,
-    }
+    context = {name: queryset.cached() for name, queryset in home_querysets().items()}
+    context['quick_form'] = quick_form
     return render(request, 'main/home.html', context)
 
 
 def services(request):
-    services = Service.objects.filter(est_actif=True)
+    services = Service.objects.filter(est_actif=True).cached()
     context = {
         'services': services,
     }
@@ -60,7 +106,10 @@ def services(request):
 
 def service_detail(request, pk):
     service = Service.objects.get(pk=pk, est_actif=True)
-    autres_services = Service.objects.filter(est_actif=True).exclude(pk=pk)[:3]
+    autres_services = (
+        related('service', pk)
+        or Service.objects.filter(est_actif=True).exclude(pk=pk)[:3].cached()
+    )
     
     context = {
         'service': service,
@@ -69,28 +118,35 @@ def service_detail(request, pk):
     return render(request, 'main/service_detail.html', context)
 
 
-def formations(request):
+def formations_queryset(params):
+    """Formations disponibles filtrées selon les paramètres GET"""
     formations = Formation.objects.filter(disponible=True)
     
     # Filtrage par catégorie
-    categorie = request.GET.get('categorie')
+    categorie = params.get('categorie')
     if categorie:
         formations = formations.filter(categorie=categorie)
     
     # Filtrage par niveau
-    niveau = request.GET.get('niveau')
+    niveau = params.get('niveau')
     if niveau:
         formations = formations.filter(niveau=niveau)
-    
+    return formations
+
+
+def formations(request):
     context = {
-        'formations': formations,
+        'formations': formations_queryset(request.GET).cached(),
     }
     return render(request, 'main/formations.html', context)
 
 
 def formation_detail(request, pk):
     formation = Formation.objects.get(pk=pk, disponible=True)
-    autres_formations = Formation.objects.filter(disponible=True).exclude(pk=pk)[:3]
+    autres_formations = (
+        related('formation', pk)
+        or Formation.objects.filter(disponible=True).exclude(pk=pk)[:3].cached()
+    )
     
     context = {
         'formation': formation,
@@ -142,24 +198,12 @@ def contact(request):
 
 
 def about(request):
-    services = Service.objects.filter(est_actif=True)[:6]
-    about_images = AboutImage.objects.filter(est_actif=True).order_by('ordre')
-    customer_reviews = CustomerReview.objects.filter(est_actif=True).order_by('-ordre', '-date_creation')[:6]
-    context = {
-        'services': services,
-        'about_images': about_images,
-        'customer_reviews': customer_reviews,
-    }
+    context = {name: queryset.cached() for name, queryset in about_querysets().items()}
     return render(request, 'main/about.html', context)
 
 
 def partners(request):
-    partners = Partner.objects.filter(est_actif=True).order_by('ordre', 'nom')
-    brands = Brand.objects.filter(est_actif=True).order_by('ordre', 'nom')
-    context = {
-        'partners': partners,
-        'brands': brands,
-    }
+    context = {name: queryset.cached() for name, queryset in partners_querysets().items()}
     return render(request, 'main/partners.html', context)
 
 
@@ -192,7 +236,7 @@ def job_offers(request):
                 return JsonResponse({'success': False, 'errors': spontaneous_form.errors.as_json()}, status=400)
     
     context = {
-        'job_offers': offres,
+        'job_offers': offres.cached(),
         'spontaneous_form': spontaneous_form,
         'type_contrat_choices': OffreEmploi.TYPE_CONTRAT_CHOICES,
     }
@@ -223,11 +267,11 @@ def job_offer_detail(request, pk):
     else:
         form = CandidatureForm()
     
-    # Autres offres similaires
-    autres_offres = OffreEmploi.objects.filter(
+    # Autres offres similaires (précalculées par build_related, sinon même type de contrat)
+    autres_offres = related('offre', pk) or OffreEmploi.objects.filter(
         est_actif=True,
         type_contrat=offre.type_contrat
-    ).exclude(pk=pk)[:3]
+    ).exclude(pk=pk)[:3].cached()
     
     context = {
         'job_offer': offre,
@@ -240,24 +284,10 @@ def job_offer_detail(request, pk):
 
 def submit_service_request(request):
     """Traitement AJAX de la demande de devis service"""
-    from .forms import ContactForm
     if request.method == 'POST' and request.headers.get('x-requested-with') == 'XMLHttpRequest':
         form = ContactForm(request.POST)
         if form.is_valid():
-            contact = form.save()
-            # Send email (omitted for brevity, covered by save signal or general logic)
-             # Envoyer un email
-            try:
-                send_mail(
-                    f'Nouvelle demande de devis - {contact.nom}',
-                    f'Nom: {contact.nom}\nEmail: {contact.email}\nTéléphone: {contact.telephone}\nService: {contact.service_interesse.titre}\n\nSujet: {contact.sujet}\n\nMessage:\n{contact.message}',
-                    settings.DEFAULT_FROM_EMAIL,
-                    [settings.CONTACT_EMAIL],
-                    fail_silently=True,
-                )
-            except:
-                pass
-            
+            save_service_request(form)
             return JsonResponse({'success': True, 'message': 'Votre demande de devis a été envoyée avec succès.'})
         else:
             return JsonResponse({'success': False, 'errors': form.errors.as_json()}, status=400)
@@ -265,30 +295,10 @@ def submit_service_request(request):
 
 def submit_quick_request(request):
     """Traitement AJAX du formulaire de devis rapide"""
-    from .forms import QuickContactForm
     if request.method == 'POST' and request.headers.get('x-requested-with') == 'XMLHttpRequest':
         form = QuickContactForm(request.POST)
         if form.is_valid():
-            contact = Contact.objects.create(
-                nom=form.cleaned_data['nom'],
-                email=form.cleaned_data['email'],
-                telephone=form.cleaned_data['telephone'],
-                sujet=f"Demande rapide: {form.cleaned_data['besoin']}",
-                message=f"Demande rapide reçue via le formulaire de contact rapide.\n\nBesoin: {form.cleaned_data['besoin']}"
-            )
-            
-            # Envoyer un email
-            try:
-                send_mail(
-                    f'Nouvelle demande rapide - {contact.nom}',
-                    f'Nom: {contact.nom}\nEmail: {contact.email}\nTéléphone: {contact.telephone}\n\nBesoin: {form.cleaned_data["besoin"]}',
-                    settings.DEFAULT_FROM_EMAIL,
-                    [settings.CONTACT_EMAIL],
-                    fail_silently=True,
-                )
-            except:
-                pass
-            
+            save_quick_request(form.cleaned_data)
             return JsonResponse({'success': True, 'message': 'Votre demande a été envoyée avec succès ! Nous vous contacterons rapidement.'})
         else:
             return JsonResponse({'success': False, 'errors': form.errors.as_json()}, status=400)
@@ -296,23 +306,10 @@ def submit_quick_request(request):
 
 def submit_formation_request(request):
     """Traitement AJAX de la demande de formation"""
-    from .forms import ContactForm
     if request.method == 'POST' and request.headers.get('x-requested-with') == 'XMLHttpRequest':
         form = ContactForm(request.POST)
         if form.is_valid():
-            contact = form.save()
-             # Envoyer un email
-            try:
-                send_mail(
-                    f'Nouvelle demande de formation - {contact.nom}',
-                    f'Nom: {contact.nom}\nEmail: {contact.email}\nTéléphone: {contact.telephone}\nFormation: {contact.formation_interessee.titre}\n\nSujet: {contact.sujet}\n\nMessage:\n{contact.message}',
-                    settings.DEFAULT_FROM_EMAIL,
-                    [settings.CONTACT_EMAIL],
-                    fail_silently=True,
-                )
-            except:
-                pass
-            
+            save_formation_request(form)
             return JsonResponse({'success': True, 'message': 'Votre inscription a été envoyée avec succès.'})
         else:
             return JsonResponse({'success': False, 'errors': form.errors.as_json()}, status=400)